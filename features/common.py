@@ -1,28 +1,9 @@
 import os
-import sys
 import json
 from tkinter import messagebox
 
-if getattr(sys, "frozen", False):
-    _BASE_DIR = os.path.dirname(sys.executable)
-else:
-    _BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-
-PRIVATE_DIR = os.path.join(_BASE_DIR, "private")
-
-DB_FILE = os.path.join(PRIVATE_DIR, "contacts.db")
-SETTINGS_FILE = os.path.join(PRIVATE_DIR, "settings.json")
-COLUMN_WIDTHS_FILE = os.path.join(PRIVATE_DIR, "column_widths.json")
-
-# --- Settings Management ---
-def get_settings():
-    if not os.path.exists(SETTINGS_FILE):
-        return {}
-    try:
-        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+from services import db
+from services.config import PRIVATE_DIR, DB_FILE, SETTINGS_FILE, COLUMN_WIDTHS_FILE, get_settings
 
 def save_settings(settings):
     try:
@@ -40,6 +21,14 @@ def center_window(window, width, height):
     y = int((screen_height / 2) - (height / 2))
     window.geometry(f"{width}x{height}+{x}+{y}")
 
+def ask_resume(parent, campaign_name, left):
+    """Ask whether to resume an interrupted send that has `left` recipients to go."""
+    return messagebox.askyesno(
+        "Resume Campaign",
+        f"An earlier send of '{campaign_name}' stopped with {left} recipient(s) left.\n\n"
+        "Resume it with its original message? Choose No to start a new send.",
+        parent=parent)
+
 def load_column_widths(list_name, columns):
     if not os.path.exists(COLUMN_WIDTHS_FILE):
         return {col: None for col in columns}
@@ -72,19 +61,19 @@ def save_column_widths(list_name, tree):
         json.dump(data, f)
 
 def get_all_group_names():
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     c.execute("SELECT short_name FROM groups ORDER BY short_name")
-    groups = [row[0] for row in c.fetchall()]
-    conn.close()
-    return groups
+    return [row[0] for row in c.fetchall()]
 
 # --- UI Helpers ---
 def apply_striped_rows(tree):
     """Apply alternating background colors to a Treeview."""
     tree.tag_configure("evenrow", background="#f2f2f2")
     tree.tag_configure("oddrow", background="#ffffff")
+    if hasattr(tree, "enable_stripes"):
+        # VirtualTreeview stripes the visible rows itself
+        tree.enable_stripes()
+        return
     for idx, iid in enumerate(tree.get_children()):
         tags = list(tree.item(iid, "tags"))
         tags = [t for t in tags if t not in ("evenrow", "oddrow")]
@@ -1,6 +1,6 @@
 import tkinter as tk
 from tkinter import ttk
-import sqlite3
+from services import db
 from .common import DB_FILE
 
 class AddContactDialog:
@@ -70,16 +70,15 @@ class AddContactDialog:
         self.dialog.wait_window()
     
     def populate_groups(self):
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect(DB_FILE)
         c = conn.cursor()
         c.execute("SELECT short_name FROM groups ORDER BY short_name")
         self.group_names = [row[0] for row in c.fetchall()]
         for g in self.group_names:
             self.groups_listbox.insert(tk.END, g)
-        conn.close()
     
     def preselect_groups(self, contact_id):
-        conn = sqlite3.connect(DB_FILE)
+        conn = db.connect(DB_FILE)
         c = conn.cursor()
         c.execute("""
             SELECT groups.short_name FROM groups
@@ -90,7 +89,6 @@ class AddContactDialog:
         for idx, g in enumerate(self.group_names):
             if g in contact_groups:
                 self.groups_listbox.selection_set(idx)
-        conn.close()
     
     def save(self):
         name = self.name_var.get().strip()
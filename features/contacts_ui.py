@@ -3,11 +3,13 @@ from tkinter import ttk, messagebox, simpledialog, filedialog, Toplevel, Listbox
 import sqlite3
 from datetime import datetime
 import pandas as pd
-import time
-import random
 import threading
 from .contact_dialog import AddContactDialog
 from .common import DB_FILE, load_column_widths, save_column_widths, get_settings, get_all_group_names, apply_striped_rows, center_window
+from .progress import ProgressBus
+from .virtual_table import VirtualTreeview
+from services import db
+from services.history import now_ms
 
 
 
@@ -83,7 +85,7 @@ def show_contacts(parent):
     columns = ("Select", "S.No.", "Name", "Email", "Mobile", "Groups")
     tree_frame = ttk.Frame(parent)
     tree_frame.pack(fill=tk.BOTH, expand=True)
-    tree = ttk.Treeview(tree_frame, columns=columns, show="headings")
+    tree = VirtualTreeview(tree_frame, columns=columns)
     # Load saved widths
     col_widths = load_column_widths("contacts", columns)
     tree.heading("Select", text="✔")
@@ -95,13 +97,9 @@ def show_contacts(parent):
         tree.column(col, width=col_widths.get(col) or 120)
     tree.heading("Groups", text="Groups")
     tree.column("Groups", width=col_widths.get("Groups") or 180)
+    # VirtualTreeview brings its own vertical scrollbar
     tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-    # Scrollbar (vertical, to the right of the tree)
-    scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
-    scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    tree.configure(yscrollcommand=scrollbar.set)
-
     # Row count label
     count_var = tk.StringVar(value="Total: 0 | Selected: 0")
     count_label = ttk.Label(parent, textvariable=count_var)
@@ -109,16 +107,13 @@ def show_contacts(parent):
 
     def update_counts(event=None):
         total = len(tree.get_children())
-        selected = len([iid for iid in tree.get_children()
-                        if "checked" in tree.item(iid, "tags")])
+        selected = len(tree.tag_has("checked"))
         count_var.set(f"Total: {total} | Selected: {selected}")
 
     # Add checkboxes and serial number to each row
     def insert_with_checkbox(values, sn):
-        iid = tree.insert("", tk.END, values=("", sn) + values)
-        tree.set(iid, "Select", " ")  # Placeholder for checkbox
-        tree.item(iid, tags=("unchecked",))
-        return iid
+        # " " is the placeholder for the checkbox
+        return tree.insert("", tk.END, values=(" ", sn) + values, tags=("unchecked",))
 
     # expose loader so other functions can refresh correctly
     tree.insert_with_checkbox = insert_with_checkbox
@@ -154,11 +149,8 @@ def show_contacts(parent):
     tree.bind("<ButtonRelease-1>", on_column_resize)
 
 def load_contacts_with_checkboxes(tree, insert_with_checkbox, group="All"):
-    for item in tree.get_children():
-        tree.delete(item)
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    tree.delete(*tree.get_children())
+    c = db.connect(DB_FILE).cursor()
     if group == "All":
         c.execute("""
             SELECT contacts.id, contacts.name, contacts.email, contacts.mobile,
@@ -183,7 +175,6 @@ def load_contacts_with_checkboxes(tree, insert_with_checkbox, group="All"):
             ORDER BY contacts.id
         """, (group,))
     rows = c.fetchall()
-    conn.close()
     for idx, row in enumerate(rows, 1):
         # row: (id, name, email, mobile, groupnames)
         insert_with_checkbox((row[1], row[2], row[3], row[4] or ""), idx)
@@ -195,37 +186,33 @@ def add_contact(tree):
     dialog = AddContactDialog(tree.master)
     if dialog.result:
         name, email, mobile, selected_groups = dialog.result
-        import sqlite3
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
         try:
-            c.execute("INSERT INTO contacts (name, email, mobile) VALUES (?, ?, ?)", 
-                     (name, email, mobile))
-            conn.commit()
-            # Get the new contact's id
-            c.execute("SELECT id FROM contacts WHERE email=?", (email,))
-            row = c.fetchone()
-            contact_id = row[0] if row else None
-            # Assign to groups
-            if contact_id and selected_groups:
-                for group_name in selected_groups:
-                    c.execute("SELECT id FROM groups WHERE short_name=?", (group_name,))
-                    group_row = c.fetchone()
-                    if group_row:
-                        group_id = group_row[0]
-                        c.execute("INSERT OR IGNORE INTO group_members (group_id, contact_id) VALUES (?, ?)", (group_id, contact_id))
-            conn.commit()
-            # Fetch group names for display
-            groupnames = ", ".join(selected_groups) if selected_groups else ""
-            sn = len(tree.get_children()) + 1
-            tree.insert("", tk.END, values=("", sn, name, email, mobile, groupnames), tags=("unchecked",))
-            apply_striped_rows(tree)
-            if hasattr(tree, 'update_counts'):
-                tree.update_counts()
+            with db.transaction(DB_FILE) as conn:
+                c = conn.cursor()
+                c.execute("INSERT INTO contacts (name, email, mobile) VALUES (?, ?, ?)", 
+                         (name, email, mobile))
+                # Get the new contact's id
+                c.execute("SELECT id FROM contacts WHERE email=?", (email,))
+                row = c.fetchone()
+                contact_id = row[0] if row else None
+                # Assign to groups
+                if contact_id and selected_groups:
+                    for group_name in selected_groups:
+                        c.execute("SELECT id FROM groups WHERE short_name=?", (group_name,))
+                        group_row = c.fetchone()
+                        if group_row:
+                            group_id = group_row[0]
+                            c.execute("INSERT OR IGNORE INTO group_members (group_id, contact_id) VALUES (?, ?)", (group_id, contact_id))
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", "Email address already exists!")
-        finally:
-            conn.close()
+            return
+        # Fetch group names for display
+        groupnames = ", ".join(selected_groups) if selected_groups else ""
+        sn = len(tree.get_children()) + 1
+        tree.insert("", tk.END, values=("", sn, name, email, mobile, groupnames), tags=("unchecked",))
+        apply_striped_rows(tree)
+        if hasattr(tree, 'update_counts'):
+            tree.update_counts()
 
 def edit_contact(tree):
     selected = tree.selection()
@@ -238,32 +225,24 @@ def edit_contact(tree):
     name = values[2]
     email = values[3]
     mobile = values[4]
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id FROM contacts WHERE email=?", (email,))
-    row = c.fetchone()
+    row = db.connect(DB_FILE).execute("SELECT id FROM contacts WHERE email=?", (email,)).fetchone()
     contact_id = row[0] if row else None
-    conn.close()
     dialog = AddContactDialog(tree.master, name=name, email=email, mobile=mobile, contact_id=contact_id)
     if dialog.result and contact_id is not None:
         new_name, new_email, new_mobile, selected_groups = dialog.result
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
         try:
-            c.execute("UPDATE contacts SET name=?, email=?, mobile=? WHERE id=?", (new_name, new_email, new_mobile, contact_id))
-            c.execute("DELETE FROM group_members WHERE contact_id=?", (contact_id,))
-            for group_name in selected_groups:
-                c.execute("SELECT id FROM groups WHERE short_name=?", (group_name,))
-                grp_row = c.fetchone()
-                if grp_row:
-                    group_id = grp_row[0]
-                    c.execute("INSERT OR IGNORE INTO group_members (group_id, contact_id) VALUES (?, ?)", (group_id, contact_id))
-            conn.commit()
+            with db.transaction(DB_FILE) as conn:
+                c = conn.cursor()
+                c.execute("UPDATE contacts SET name=?, email=?, mobile=? WHERE id=?", (new_name, new_email, new_mobile, contact_id))
+                c.execute("DELETE FROM group_members WHERE contact_id=?", (contact_id,))
+                for group_name in selected_groups:
+                    c.execute("SELECT id FROM groups WHERE short_name=?", (group_name,))
+                    grp_row = c.fetchone()
+                    if grp_row:
+                        group_id = grp_row[0]
+                        c.execute("INSERT OR IGNORE INTO group_members (group_id, contact_id) VALUES (?, ?)", (group_id, contact_id))
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", "Email address already exists!")
-        finally:
-            conn.close()
         insert_cb = getattr(tree, 'insert_with_checkbox', None)
         if insert_cb:
             load_contacts_with_checkboxes(tree, insert_cb, group='All')
@@ -272,30 +251,22 @@ def edit_contact(tree):
             show_contacts(parent)
 
 def delete_contacts(tree):
-    selected = []
-    for iid in tree.get_children():
-        if "checked" in tree.item(iid, "tags"):
-            selected.append(iid)
+    selected = list(tree.tag_has("checked"))
     if not selected:
         messagebox.showinfo("Delete Contact(s)", "Please select at least one contact to delete.")
         return
     if not messagebox.askyesno("Delete Contact(s)", f"Are you sure you want to delete {len(selected)} contact(s)?"):
         return
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    # values layout: (Select, S.No., Name, Email, Mobile, Groups)
+    # indexes 2,3,4 correspond to name, email and mobile respectively
+    keys = []
     for iid in selected:
         values = tree.item(iid, "values")
-        # values layout: (Select, S.No., Name, Email, Mobile, Groups)
-        # indexes 2,3,4 correspond to name, email and mobile respectively
-        name, email, mobile = values[2], values[3], values[4]
-        c.execute(
-            "DELETE FROM contacts WHERE name=? AND email=? AND mobile=?",
-            (name, email, mobile),
-        )
-        tree.delete(iid)
-    conn.commit()
-    conn.close()
+        keys.append((values[2], values[3], values[4]))
+    with db.transaction(DB_FILE) as conn:
+        conn.executemany("DELETE FROM contacts WHERE name=? AND email=? AND mobile=?", keys)
+    # One delete call; the table re-renders once instead of per row
+    tree.delete(*selected)
     apply_striped_rows(tree)
     if hasattr(tree, 'update_counts'):
         tree.update_counts()
@@ -306,12 +277,8 @@ def load_contacts(tree):
         tree.delete(item)
 
     # Load from database
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    for row in c.execute("SELECT name, email, mobile FROM contacts"):
+    for row in db.connect(DB_FILE).execute("SELECT name, email, mobile FROM contacts"):
         tree.insert("", tk.END, values=row)
-    conn.close()
     apply_striped_rows(tree)
 
 def show_groups(parent):
@@ -373,12 +340,8 @@ def show_groups(parent):
 def load_groups(tree):
     for item in tree.get_children():
         tree.delete(item)
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    for row in c.execute("SELECT short_name, name, description FROM groups ORDER BY short_name"):
+    for row in db.connect(DB_FILE).execute("SELECT short_name, name, description FROM groups ORDER BY short_name"):
         tree.insert("", tk.END, values=row)
-    conn.close()
     apply_striped_rows(tree)
     if hasattr(tree, 'update_counts'):
         tree.update_counts()
@@ -388,17 +351,11 @@ def add_group(tree):
     dialog = GroupDialog(tree.master)
     if dialog.result:
         short_name, name, description = dialog.result
-        import sqlite3
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
         try:
-            c.execute("INSERT INTO groups (short_name, name, description) VALUES (?, ?, ?)", (short_name, name, description))
-            conn.commit()
+            db.connect(DB_FILE).execute("INSERT INTO groups (short_name, name, description) VALUES (?, ?, ?)", (short_name, name, description))
             load_groups(tree)
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", "Short name must be unique and not empty!")
-        finally:
-            conn.close()
 
 def edit_group(tree):
     from tkinter import simpledialog, messagebox
@@ -411,17 +368,11 @@ def edit_group(tree):
     dialog = GroupDialog(tree.master, short_name=old_short_name, name=old_name, description=old_description)
     if dialog.result:
         new_short_name, new_name, new_description = dialog.result
-        import sqlite3
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
         try:
-            c.execute("UPDATE groups SET short_name=?, name=?, description=? WHERE short_name=?", (new_short_name, new_name, new_description, old_short_name))
-            conn.commit()
+            db.connect(DB_FILE).execute("UPDATE groups SET short_name=?, name=?, description=? WHERE short_name=?", (new_short_name, new_name, new_description, old_short_name))
             load_groups(tree)
         except sqlite3.IntegrityError:
             messagebox.showerror("Error", "Short name must be unique and not empty!")
-        finally:
-            conn.close()
 
 def delete_group(tree):
     from tkinter import messagebox
@@ -433,13 +384,10 @@ def delete_group(tree):
     name = tree.item(iid, "values")[0]
     if not messagebox.askyesno("Delete Group", f"Are you sure you want to delete group '{name}'?"):
         return
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("DELETE FROM groups WHERE name=?", (name,))
-    c.execute("DELETE FROM group_members WHERE group_id IN (SELECT id FROM groups WHERE name=?)", (name,))
-    conn.commit()
-    conn.close()
+    with db.transaction(DB_FILE) as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM groups WHERE name=?", (name,))
+        c.execute("DELETE FROM group_members WHERE group_id IN (SELECT id FROM groups WHERE name=?)", (name,))
     load_groups(tree)
 
 # GroupDialog for add/edit group
@@ -481,14 +429,13 @@ class GroupDialog(simpledialog.Dialog):
 # --- Send Emails Dialog ---
 def send_emails_dialog(tree):
     checked_contacts = []
-    for iid in tree.get_children():
-        if "checked" in tree.item(iid, "tags"):
-            values = tree.item(iid, "values")
-            checked_contacts.append({
-                "name": values[1],
-                "email": values[2],
-                "mobile": values[3]
-            })
+    for iid in tree.tag_has("checked"):
+        values = tree.item(iid, "values")
+        checked_contacts.append({
+            "name": values[1],
+            "email": values[2],
+            "mobile": values[3]
+        })
     if not checked_contacts:
         messagebox.showinfo("Send Emails", "Please select at least one contact to send emails.")
         return
@@ -525,11 +472,12 @@ def send_emails_dialog(tree):
     status_label.pack(anchor="w", padx=10, pady=5)
 
     def send_all_emails():
+        from services import email_utils, smtp_pool, rate_limit
         send_btn.config(state=tk.DISABLED)
         subject = subject_var.get()
         body = body_text.get("1.0", tk.END).strip()        # Load settings
         settings = get_settings()
-        email_method = settings.get('email_method', 'SMTP').lower()
+        email_method = email_utils.normalize_method(settings.get('email_method', 'SMTP'))
         sender = settings.get('sender_email', '')
         sender_name = settings.get('sender_name', '')
         password = settings.get('sender_pwd', '')
@@ -555,10 +503,17 @@ def send_emails_dialog(tree):
             status_var.set("Amazon SES credentials missing in Settings.")
             send_btn.config(state=tk.NORMAL)
             return
-        from services import email_utils
+        limiter = rate_limit.get_limiter(email_method, settings, host=smtp_server if email_method == 'smtp' else None)
+        smtp_settings = {"server": smtp_server, "port": smtp_port}
+        pool = None
+        if email_method == 'smtp':
+            pool = smtp_pool.get_smtp_pool(
+                smtp_settings, sender, password,
+                size=int(settings.get('smtp_pool_size', 4)),
+                max_messages=int(settings.get('smtp_max_messages_per_connection', 100)),
+            )
         def send_thread():
-            history_conn = sqlite3.connect(DB_FILE)
-            hc = history_conn.cursor()
+            hc = db.connect(DB_FILE).cursor()
             hc.execute('''CREATE TABLE IF NOT EXISTS email_history (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 timestamp TEXT,
@@ -567,39 +522,43 @@ def send_emails_dialog(tree):
                 email TEXT,
                 status TEXT
             )''')
-            history_conn.commit()
             sent_count = 0
             for idx, contact in enumerate(checked_contacts):
-                personalized_subject = subject.replace("{{name}}", contact['name']).replace("{{email}}", contact['email']).replace("{{mobile}}", contact['mobile'])
-                personalized_body = body.replace("{{name}}", contact['name']).replace("{{email}}", contact['email']).replace("{{mobile}}", contact['mobile'])
+                try:
+                    limiter.acquire()
+                except rate_limit.DailyCapExceeded as e:
+                    bus.post("status", str(e))
+                    break
+                personalized_subject = email_utils.personalize(subject, contact['name'], contact['email'], contact['mobile'])
+                personalized_body = email_utils.personalize(body, contact['name'], contact['email'], contact['mobile'])
                 try:
                     if email_method == 'smtp':
-                        smtp_settings = {"server": smtp_server, "port": smtp_port}
-                        email_utils.send_email_with_connection_check('smtp', smtp_settings, sender, password, contact['email'], personalized_subject, personalized_body, sender_name)
+                        email_utils.send_email_with_connection_check('smtp', smtp_settings, sender, password, contact['email'], personalized_subject, personalized_body, sender_name, pool=pool)
                     elif email_method == 'sendgrid':
                         email_utils.send_email_with_connection_check('sendgrid', {"sendgrid_api_key": sendgrid_api_key}, sender, None, contact['email'], personalized_subject, personalized_body, sender_name)
                     elif email_method == 'ses':
                         email_utils.send_email_with_connection_check('ses', {"ses_access_key": ses_access_key, "ses_secret_key": ses_secret_key, "ses_region": ses_region}, sender, None, contact['email'], personalized_subject, personalized_body, sender_name)
-                    status_var.set(f"Sent to {contact['email']}")
-                    hc.execute("INSERT INTO email_history (timestamp, subject, body, email, status) VALUES (?, ?, ?, ?, ?)",
-                               (datetime.now().isoformat(), personalized_subject, personalized_body, contact['email'], "Sent"))
-                    history_conn.commit()
+                    bus.post("status", f"Sent to {contact['email']}")
+                    hc.execute("INSERT INTO email_history (timestamp, ts_ms, subject, body, email, status) VALUES (?, ?, ?, ?, ?, ?)",
+                               (datetime.now().isoformat(), now_ms(), personalized_subject, personalized_body, contact['email'], "Sent"))
                 except Exception as e:
-                    status_var.set(f"Failed to {contact['email']}: {e}")
-                    hc.execute("INSERT INTO email_history (timestamp, subject, body, email, status) VALUES (?, ?, ?, ?, ?)",
-                               (datetime.now().isoformat(), personalized_subject, personalized_body, contact['email'], f"Failed: {e}"))
-                    history_conn.commit()
+                    bus.post("status", f"Failed to {contact['email']}: {e}")
+                    hc.execute("INSERT INTO email_history (timestamp, ts_ms, subject, body, email, status) VALUES (?, ?, ?, ?, ?, ?)",
+                               (datetime.now().isoformat(), now_ms(), personalized_subject, personalized_body, contact['email'], f"Failed: {e}"))
                 sent_count += 1
-                # Add small random delay between emails to avoid being flagged as spam
-                delay = random.uniform(1, 3)
-                time.sleep(delay)  # Delay between emails
-                if sent_count % 50 == 0:
-                    batch_delay = random.randint(5, 60)
-                    status_var.set(f"Batch delay: {batch_delay} seconds...")
-                    time.sleep(batch_delay)
-            history_conn.close()
-            status_var.set("All emails processed.")
-            send_btn.config(state=tk.NORMAL)
+            db.close_connections()
+            if pool is not None:
+                pool.close_idle()
+            bus.post("status", "All emails processed.")
+            bus.close()
+        # The send thread only posts to the bus; Tk is updated from the main loop
+        def apply_progress(updates, closing):
+            if "status" in updates:
+                status_var.set(updates["status"])
+            if closing:
+                send_btn.config(state=tk.NORMAL)
+        bus = ProgressBus(dialog, apply_progress)
+        bus.start()
         threading.Thread(target=send_thread, daemon=True).start()
 
     send_btn = ttk.Button(dialog, text="Send", command=send_all_emails)
@@ -607,12 +566,13 @@ def send_emails_dialog(tree):
 
 def import_contacts_dialog(tree):
     from tkinter import filedialog, messagebox, simpledialog, Toplevel, Listbox, MULTIPLE, Button, Label, END
-    from services.contacts import import_contacts_from_csv
-    import sqlite3
+    from services.contacts import import_contacts
     # Step 1: File selection
     filename = filedialog.askopenfilename(
-        title="Select CSV File",
-        filetypes=[("CSV Files", "*.csv"), ("All Files", "*")]
+        title="Select Contacts File",
+        filetypes=[("Contact Files", "*.csv *.xlsx *.jsonl *.ndjson *.parquet"), ("CSV Files", "*.csv"),
+                   ("Excel Workbooks", "*.xlsx"), ("JSON Lines", "*.jsonl *.ndjson"),
+                   ("Parquet Files", "*.parquet"), ("All Files", "*")]
     )
     if not filename:
         return
@@ -623,11 +583,7 @@ def import_contacts_dialog(tree):
     group_listbox = Listbox(group_win, selectmode=MULTIPLE, width=40, height=8)
     group_listbox.pack(padx=10, pady=10)
     # Fetch group names
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT short_name FROM groups ORDER BY short_name")
-    group_names = [row[0] for row in c.fetchall()]
-    conn.close()
+    group_names = get_all_group_names()
     for g in group_names:
         group_listbox.insert(END, g)
     result = {'done': False}
@@ -648,32 +604,71 @@ def import_contacts_dialog(tree):
     if not result.get('done'):
         return
     selected_groups = result.get('selected', [])
-    # Step 3: Import and assign groups
-    try:
-        imported = import_contacts_from_csv(filename)
-        # Assign to groups
-        if selected_groups and imported > 0:
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            # Get ids of imported contacts (assume new ones have no group assignment yet)
-            c.execute("SELECT id, email FROM contacts")
-            all_contacts = {row[1]: row[0] for row in c.fetchall()}
-            import pandas as pd
-            data = pd.read_csv(filename)
-            for _, row in data.iterrows():
-                email = row.get('email')
-                if not email or email not in all_contacts:
-                    continue
-                contact_id = all_contacts[email]
-                for group_name in selected_groups:
-                    c.execute("SELECT id FROM groups WHERE short_name=?", (group_name,))
-                    group_row = c.fetchone()
-                    if group_row:
-                        group_id = group_row[0]
-                        c.execute("INSERT OR IGNORE INTO group_members (group_id, contact_id) VALUES (?, ?)", (group_id, contact_id))
-            conn.commit()
-            conn.close()
-        messagebox.showinfo("Import Contacts", f"Imported {imported} contacts from CSV.")
+    # Step 3: Import and assign groups in one pass, on a worker thread
+    import os
+    from services.utils import format_seconds
+    progress_win = Toplevel()
+    progress_win.title("Importing Contacts")
+    Label(progress_win, text=f"Importing {os.path.basename(filename)}").pack(padx=20, pady=(15, 5))
+    progress_bar = ttk.Progressbar(progress_win, length=320, maximum=1000)
+    progress_bar.pack(padx=20, pady=5)
+    status_var = tk.StringVar(value="Starting...")
+    ttk.Label(progress_win, textvariable=status_var).pack(padx=20, pady=5)
+    stop = threading.Event()
+
+    def cancel():
+        stop.set()
+        cancel_btn.config(state=tk.DISABLED)
+        status_var.set("Cancelling...")
+    cancel_btn = ttk.Button(progress_win, text="Cancel", command=cancel)
+    cancel_btn.pack(pady=(5, 15))
+    progress_win.protocol("WM_DELETE_WINDOW", cancel)
+    center_window(progress_win, 380, 150)
+    progress_win.grab_set()
+
+    def import_thread():
+        try:
+            report = import_contacts(filename, selected_groups, on_progress=lambda p: bus.post("progress", p),
+                                     stop_event=stop)
+            bus.post("report", report)
+        except Exception as e:
+            bus.post("error", e)
+        finally:
+            db.close_connections()
+            bus.close()
+
+    # The worker only posts to the bus; Tk is updated from the main loop.
+    # The report or error can arrive a frame before the close, so keep it.
+    outcome = {}
+
+    def apply_progress(updates, closing):
+        outcome.update((key, updates[key]) for key in ("report", "error") if key in updates)
+        if "progress" in updates and not stop.is_set():
+            p = updates["progress"]
+            progress_bar['value'] = p.done * 1000
+            eta = f" | ETA {format_seconds(int(p.eta))}" if p.eta is not None else ""
+            status_var.set(f"{p.rows:,} rows | {p.rate:,.0f} rows/s{eta}")
+        if not closing:
+            return
+        progress_win.grab_release()
+        progress_win.destroy()
+        if "error" in outcome:
+            messagebox.showerror("Import Contacts", f"Failed to import contacts: {outcome['error']}")
+            return
+        report = outcome["report"]
+        if report.cancelled:
+            message = f"Import cancelled. {report.inserted} contacts were imported before it stopped."
+        else:
+            message = f"Imported {report.inserted} contacts from {os.path.basename(filename)}."
+        if report.duplicate:
+            message += f"\n{report.duplicate} row(s) repeated an existing email."
+        if report.invalid:
+            message += f"\n{report.invalid} row(s) rejected as invalid."
+        if report.rejects:
+            message += f"\nRejected rows were saved to:\n{report.rejects}"
+        if selected_groups:
+            message += f"\n{report.assigned} contact(s) added to the selected group(s)."
+        messagebox.showinfo("Import Contacts", message)
         # Always refresh contacts list using loader to ensure correct columns
         insert_cb = getattr(tree, 'insert_with_checkbox', None)
         if insert_cb:
@@ -681,7 +676,9 @@ def import_contacts_dialog(tree):
         else:
             parent = getattr(tree.master, 'master', tree.master)
             show_contacts(parent)
-    except Exception as e:
-        messagebox.showerror("Import Contacts", f"Failed to import contacts: {e}")
+
+    bus = ProgressBus(progress_win, apply_progress)
+    bus.start()
+    threading.Thread(target=import_thread, daemon=True).start()
 
 
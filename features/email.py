@@ -1,12 +1,13 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
-import time
-import threading
-import random
-from datetime import datetime
-from .common import DB_FILE, get_settings, center_window, get_all_group_names, apply_striped_rows
-from services import email_utils
+from .common import DB_FILE, get_settings, center_window, get_all_group_names, apply_striped_rows, ask_resume
+from .progress import SendProgress
+from .search import DebouncedSearch
+from .virtual_table import VirtualTreeview
+from services import db, outbox
+from services.contact_index import ContactIndex, ContactSelection
+from services.campaigns import EmailCampaignSender, end_run, open_run, skip_invalid_recipients
+from services.history_writer import HistoryWriter
 
 
 def show_email_campaigns(parent):
@@ -53,9 +54,7 @@ def show_email_campaigns(parent):
 def load_email_campaigns(tree):
     for item in tree.get_children():
         tree.delete(item)
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS email_campaigns (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -66,7 +65,6 @@ def load_email_campaigns(tree):
     """)
     for row in c.execute("SELECT name, subject, body FROM email_campaigns ORDER BY id DESC"):
         tree.insert("", tk.END, values=row)
-    conn.close()
     apply_striped_rows(tree)
     if hasattr(tree, 'update_counts'):
         tree.update_counts()
@@ -81,18 +79,14 @@ def edit_email_campaign(tree):
         return
     iid = selected[0]
     old_name, old_subject, old_body = tree.item(iid, "values")
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     c.execute("SELECT id FROM email_campaigns WHERE name=?", (old_name,))
     row = c.fetchone()
     if not row:
-        conn.close()
         return
     campaign_id = row[0]
     c.execute("SELECT contact_id FROM email_campaign_contacts WHERE campaign_id=?", (campaign_id,))
     contact_ids = [r[0] for r in c.fetchall()]
-    conn.close()
     open_email_campaign_wizard(tree, mode="edit", campaign={
         'id': campaign_id,
         'name': old_name,
@@ -108,18 +102,14 @@ def send_selected_email_campaign(tree):
         return
     iid = selected[0]
     name, subject, body = tree.item(iid, "values")
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     c.execute("SELECT id FROM email_campaigns WHERE name=?", (name,))
     row = c.fetchone()
     if not row:
-        conn.close()
         return
     campaign_id = row[0]
     c.execute("SELECT contact_id FROM email_campaign_contacts WHERE campaign_id=?", (campaign_id,))
     contact_ids = [r[0] for r in c.fetchall()]
-    conn.close()
     open_email_campaign_wizard(tree, mode="edit", campaign={
         'id': campaign_id,
         'name': name,
@@ -137,27 +127,18 @@ def delete_email_campaign(tree):
     name = tree.item(iid, "values")[0]
     if not messagebox.askyesno("Delete Email Campaign", f"Are you sure you want to delete campaign '{name}'?"):
         return
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id FROM email_campaigns WHERE name=?", (name,))
-    row = c.fetchone()
-    campaign_id = row[0] if row else None
-    if campaign_id:
-        c.execute("DELETE FROM email_campaign_contacts WHERE campaign_id=?", (campaign_id,))
-        c.execute("DELETE FROM email_campaigns WHERE id=?", (campaign_id,))
-    else:
-        conn.close()
-        load_email_campaigns(tree)
-        return
-    conn.commit()
-    conn.close()
+    with db.transaction(DB_FILE) as conn:
+        c = conn.cursor()
+        c.execute("SELECT id FROM email_campaigns WHERE name=?", (name,))
+        row = c.fetchone()
+        if row:
+            c.execute("DELETE FROM email_campaign_contacts WHERE campaign_id=?", (row[0],))
+            c.execute("DELETE FROM email_campaigns WHERE id=?", (row[0],))
     load_email_campaigns(tree)
 
 def open_email_campaign_wizard(tree, mode="add", campaign=None):
     import tkinter as tk
     from tkinter import ttk, messagebox
-    import sqlite3
     
     # Get default content from settings for new campaigns
     settings = get_settings()
@@ -219,80 +200,66 @@ def open_email_campaign_wizard(tree, mode="add", campaign=None):
     ttk.Label(step2, text="Selected Contacts:").grid(row=1, column=2, columnspan=2, sticky=tk.W, padx=10)
     sel_list = tk.Listbox(step2, selectmode=tk.MULTIPLE, width=40, height=18)
     sel_list.grid(row=2, column=2, columnspan=2, padx=10, pady=5, sticky=tk.N)
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id, name, email, mobile FROM contacts ORDER BY name")
-    all_contacts = c.fetchall()
-    conn.close()
-    contact_id_map = {idx: cid for idx, (cid, _, _, _) in enumerate(all_contacts)}
+    # Loaded once; search and group filtering below never hit the database
+    contact_index = ContactIndex.load(DB_FILE)
+    all_contacts = [contact_index.contacts[cid] for cid in contact_index.ids]
     contact_display_map = {cid: f"{name} <{email}>" for cid, name, email, _ in all_contacts}
-    sel_contact_ids = []
-    if campaign and campaign.get('contact_ids'):
-        # Filter out contact IDs that no longer exist in the database
-        all_contact_ids = {cid for cid, _, _, _ in all_contacts}
-        valid_contact_ids = [cid for cid in campaign['contact_ids'] if cid in all_contact_ids]
-        sel_contact_ids = valid_contact_ids
-    def refresh_avail_list():
+    # Chosen ids in order; contacts deleted since the campaign was saved are dropped
+    sel_contact_ids = ContactSelection((campaign.get('contact_ids') or ()) if campaign else ())
+    sel_contact_ids.retain(contact_index)
+    # Listbox row -> contact id, rebuilt with each refresh
+    avail_ids = []
+    sel_ids = []
+    def show_avail(ids):
+        avail_ids[:] = ids
         avail_list.delete(0, tk.END)
-        filter_text = search_var.get().lower()
-        group_filter = group_var.get()
-        selected_ids = set(sel_contact_ids)
-        for idx, (cid, name, email, mobile) in enumerate(all_contacts):
-            if cid in selected_ids:
-                continue
-            if (not filter_text or filter_text in name.lower() or filter_text in email.lower() or filter_text in (mobile or "")):
-                if group_filter == "All" or contact_in_group(cid, group_filter):
-                    avail_list.insert(tk.END, f"{name} <{email}>")
+        if avail_ids:
+            avail_list.insert(tk.END, *(contact_display_map[cid] for cid in avail_ids))
+    # Typing searches once the user pauses, off the Tk thread
+    avail_search = DebouncedSearch(
+        dialog,
+        lambda text, group, within: contact_index.search(text, group, exclude=sel_contact_ids, within=within),
+        show_avail,
+    )
+    def refresh_avail_list():
+        avail_search.run_now(search_var.get().lower(), group_var.get())
     def refresh_sel_list():
         sel_list.delete(0, tk.END)
-        # Filter out contact IDs that no longer exist
-        valid_contact_ids = []
-        for cid in sel_contact_ids:
-            if cid in contact_display_map:
-                sel_list.insert(tk.END, contact_display_map[cid])
-                valid_contact_ids.append(cid)
-        # Update the list to only include valid contacts
-        sel_contact_ids[:] = valid_contact_ids
-    def contact_in_group(cid, group_short_name):
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            SELECT 1 FROM group_members
-            JOIN groups ON group_members.group_id = groups.id
-            WHERE group_members.contact_id=? AND groups.short_name=?
-        """, (cid, group_short_name))
-        found = c.fetchone()
-        conn.close()
-        return bool(found)
+        sel_ids[:] = sel_contact_ids
+        if sel_ids:
+            sel_list.insert(tk.END, *(contact_display_map[cid] for cid in sel_ids))
     refresh_avail_list()
     refresh_sel_list()
+    def add_ids(ids):
+        if sel_contact_ids.add(ids):
+            refresh_avail_list()
+            refresh_sel_list()
     def add_selected():
-        selected = avail_list.curselection()
-        for idx in selected:
-            display = avail_list.get(idx)
-            for cid, disp in contact_display_map.items():
-                if disp == display and cid not in sel_contact_ids:
-                    sel_contact_ids.append(cid)
-        refresh_avail_list()
-        refresh_sel_list()
+        add_ids(avail_ids[idx] for idx in avail_list.curselection())
+    def add_all_matching():
+        add_ids(list(avail_ids))
+    def add_whole_group():
+        if group_var.get() != "All":
+            add_ids(contact_index.search("", group_var.get()))
     def remove_selected():
-        selected = sel_list.curselection()
-        to_remove = [sel_contact_ids[idx] for idx in selected]
-        for cid in to_remove:
-            sel_contact_ids.remove(cid)
+        sel_contact_ids.remove([sel_ids[idx] for idx in sel_list.curselection()])
         refresh_avail_list()
         refresh_sel_list()
     add_btn = ttk.Button(step2, text=">>", command=add_selected)
     add_btn.grid(row=3, column=0, pady=5)
+    bulk_frame = ttk.Frame(step2)
+    bulk_frame.grid(row=3, column=1, pady=5)
+    ttk.Button(bulk_frame, text="Add All Matching", command=add_all_matching).pack(side=tk.LEFT, padx=2)
+    ttk.Button(bulk_frame, text="Add Whole Group", command=add_whole_group).pack(side=tk.LEFT, padx=2)
     remove_btn = ttk.Button(step2, text="<<", command=remove_selected)
     remove_btn.grid(row=3, column=2, pady=5)
-    search_entry.bind("<KeyRelease>", lambda e: refresh_avail_list())
+    search_entry.bind("<KeyRelease>", lambda e: avail_search.trigger(search_var.get().lower(), group_var.get()))
     group_dropdown.bind("<<ComboboxSelected>>", lambda e: refresh_avail_list())
     # Step 3: Send Preview
     step3 = ttk.Frame(notebook)
     notebook.add(step3, text="3. Send Preview")
     send_columns = ("S.No.", "Name", "Email", "Status")
-    send_tree = ttk.Treeview(step3, columns=send_columns, show="headings", height=18)
+    send_tree = VirtualTreeview(step3, columns=send_columns, height=18)
     for col in send_columns:
         send_tree.heading(col, text=col)
         send_tree.column(col, width=180 if col!="S.No." else 60, anchor="center")
@@ -320,8 +287,7 @@ def open_email_campaign_wizard(tree, mode="add", campaign=None):
         current_step[0] = idx
         prev_btn.config(state=tk.NORMAL if idx > 0 else tk.DISABLED)
         if idx == 2:
-            for item in send_tree.get_children():
-                send_tree.delete(item)
+            rows = []
             for i, cid in enumerate(sel_contact_ids, 1):
                 name_mobile = contact_display_map.get(cid, "")
                 if "<" in name_mobile:
@@ -329,7 +295,8 @@ def open_email_campaign_wizard(tree, mode="add", campaign=None):
                     mobile = mobile.rstrip(">")
                 else:
                     name, mobile = name_mobile, ""
-                send_tree.insert("", tk.END, values=(i, name, mobile, "Pending"))
+                rows.append((i, name, mobile, "Pending"))
+            send_tree.set_rows(rows)
             apply_striped_rows(send_tree)
             progress['value'] = 0
             progress['maximum'] = len(sel_contact_ids)
@@ -357,7 +324,7 @@ def open_email_campaign_wizard(tree, mode="add", campaign=None):
                 return
             show_step(2)
         elif idx == 2:
-            send_email_campaign(dialog, send_tree, sel_contact_ids, name_var.get(), subject_var.get(), body_text.get("1.0", tk.END), progress, counter_var, timer_var)
+            send_email_campaign(dialog, send_tree, list(sel_contact_ids), name_var.get(), subject_var.get(), body_text.get("1.0", tk.END), progress, counter_var, timer_var)
     def go_prev():
         idx = current_step[0]
         if idx > 0:
@@ -369,9 +336,7 @@ def open_email_campaign_wizard(tree, mode="add", campaign=None):
         if not cname:
             messagebox.showerror("Error", "Campaign name is required!", parent=dialog)
             return
-        import sqlite3
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
+        c = db.connect(DB_FILE).cursor()
         c.execute("""
             CREATE TABLE IF NOT EXISTS email_campaigns (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -389,27 +354,21 @@ def open_email_campaign_wizard(tree, mode="add", campaign=None):
                 UNIQUE(campaign_id, contact_id)
             )
         """)
-        if mode == "add":
-            c.execute("SELECT id FROM email_campaigns WHERE name=?", (cname,))
-            if c.fetchone():
-                messagebox.showerror("Error", "A campaign with this name already exists!", parent=dialog)
-                conn.close()
-                return
-            c.execute("INSERT INTO email_campaigns (name, subject, body) VALUES (?, ?, ?)", (cname, csubject, cbody))
-            campaign_id = c.lastrowid
-        else:
-            campaign_id = campaign['id']
-            c.execute("SELECT id FROM email_campaigns WHERE name=? AND id!=?", (cname, campaign_id))
-            if c.fetchone():
-                messagebox.showerror("Error", "A campaign with this name already exists!", parent=dialog)
-                conn.close()
-                return
-            c.execute("UPDATE email_campaigns SET name=?, subject=?, body=? WHERE id=?", (cname, csubject, cbody, campaign_id))
-            c.execute("DELETE FROM email_campaign_contacts WHERE campaign_id=?", (campaign_id,))
-        for cid in sel_contact_ids:
-            c.execute("INSERT OR IGNORE INTO email_campaign_contacts (campaign_id, contact_id) VALUES (?, ?)", (campaign_id, cid))
-        conn.commit()
-        conn.close()
+        campaign_id = None if mode == "add" else campaign['id']
+        c.execute("SELECT id FROM email_campaigns WHERE name=? AND id IS NOT ?", (cname, campaign_id))
+        if c.fetchone():
+            messagebox.showerror("Error", "A campaign with this name already exists!", parent=dialog)
+            return
+        with db.transaction(DB_FILE) as conn:
+            c = conn.cursor()
+            if mode == "add":
+                c.execute("INSERT INTO email_campaigns (name, subject, body) VALUES (?, ?, ?)", (cname, csubject, cbody))
+                campaign_id = c.lastrowid
+            else:
+                c.execute("UPDATE email_campaigns SET name=?, subject=?, body=? WHERE id=?", (cname, csubject, cbody, campaign_id))
+                c.execute("DELETE FROM email_campaign_contacts WHERE campaign_id=?", (campaign_id,))
+            c.executemany("INSERT OR IGNORE INTO email_campaign_contacts (campaign_id, contact_id) VALUES (?, ?)",
+                          ((campaign_id, cid) for cid in sel_contact_ids))
         load_email_campaigns(tree)
         messagebox.showinfo("Saved", "Email Campaign saved for later!", parent=dialog)
         dialog.destroy()
@@ -420,23 +379,12 @@ def open_email_campaign_wizard(tree, mode="add", campaign=None):
 
 def send_email_campaign(dialog, send_tree, contact_ids, campaign_name, subject, body, progress, counter_var, timer_var, scroll_to_row=None):
     """Send an email campaign to the provided contact IDs."""
-    import sqlite3, time, threading
+    import threading
     settings = get_settings()
-    email_method = settings.get('email_method', 'SMTP').lower()
-    sender = settings.get('sender_email', '')
-    sender_name = settings.get('sender_name', '')
-    password = settings.get('sender_pwd', '')
-    smtp_server = settings.get('smtp_server', 'smtp.gmail.com')
-    smtp_port = int(settings.get('smtp_port', '587'))
-    sendgrid_api_key = settings.get('sendgrid_api_key', '')
-    ses_access_key = settings.get('ses_access_key', '')
-    ses_secret_key = settings.get('ses_secret_key', '')
-    ses_region = settings.get('ses_region', '')
-    if not sender:
+    if not settings.get('sender_email'):
         messagebox.showerror("Email Settings Missing", "Sender email not set in settings.", parent=dialog)
         return
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
 
     c.execute("""
         CREATE TABLE IF NOT EXISTS email_campaigns (
@@ -466,114 +414,87 @@ def send_email_campaign(dialog, send_tree, contact_ids, campaign_name, subject,
         )
     """)
 
-    c.execute("SELECT id FROM email_campaigns WHERE name=?", (campaign_name,))
-    row = c.fetchone()
-    if row:
-        campaign_id = row[0]
-        c.execute(
-            "UPDATE email_campaigns SET subject=?, body=? WHERE id=?",
-            (subject, body, campaign_id),
-        )
-        c.execute("DELETE FROM email_campaign_contacts WHERE campaign_id=?", (campaign_id,))
-    else:
-        c.execute(
-            "INSERT INTO email_campaigns (name, subject, body) VALUES (?, ?, ?)",
-            (campaign_name, subject, body),
-        )
-        campaign_id = c.lastrowid
+    with db.transaction(DB_FILE) as conn:
+        c = conn.cursor()
+        c.execute("SELECT id FROM email_campaigns WHERE name=?", (campaign_name,))
+        row = c.fetchone()
+        if row:
+            campaign_id = row[0]
+            c.execute(
+                "UPDATE email_campaigns SET subject=?, body=? WHERE id=?",
+                (subject, body, campaign_id),
+            )
+            c.execute("DELETE FROM email_campaign_contacts WHERE campaign_id=?", (campaign_id,))
+        else:
+            c.execute(
+                "INSERT INTO email_campaigns (name, subject, body) VALUES (?, ?, ?)",
+                (campaign_name, subject, body),
+            )
+            campaign_id = c.lastrowid
 
-    for cid in contact_ids:
-        c.execute(
+        c.executemany(
             "INSERT OR IGNORE INTO email_campaign_contacts (campaign_id, contact_id) VALUES (?, ?)",
-            (campaign_id, cid),
+            ((campaign_id, cid) for cid in contact_ids),
         )
 
-    placeholders = ",".join(["?"] * len(contact_ids))
-    c.execute(
-        f"SELECT id, name, email, mobile FROM contacts WHERE id IN ({placeholders})",
-        contact_ids,
-    )
-    contacts = c.fetchall()
-
-    conn.commit()
-    conn.close()
+    # Recipients go through a persistent outbox so an interrupted send can resume
+    run, payload = open_run('email', campaign_name, contact_ids, {'subject': subject, 'body': body},
+                            resume=lambda left: ask_resume(dialog, campaign_name, left))
+    subject, body = payload['subject'], payload['body']
+    # Malformed addresses fail up front instead of going through send retries
+    skip_invalid_recipients(run, 'email')
 
     success = 0
     failed = 0
-    sending = [True]
-    start_time = time.time()
+    sender = EmailCampaignSender(settings, subject, body)
 
-    def update_timer():
-        while sending[0]:
-            elapsed = int(time.time() - start_time)
-            timer_var.set(f"Elapsed: {elapsed}s")
-            dialog.update_idletasks()
-            time.sleep(1)
+    # Rows of send_tree follow contact_ids order; the outbox may not
+    row_index = {cid: i for i, cid in enumerate(contact_ids)}
+    view = SendProgress(dialog, send_tree, progress, counter_var, timer_var, scroll_to_row)
 
-    def default_scroll(idx):
-        children = send_tree.get_children()
-        if 0 <= idx < len(children):
-            send_tree.see(children[idx])
-            send_tree.selection_set(children[idx])
-
-    scroll = scroll_to_row or default_scroll
-
-    def send_thread():
-        nonlocal success, failed
-        conn_th = sqlite3.connect(DB_FILE)
-        c_th = conn_th.cursor()
-        for idx, (cid, cname, cemail, cmobile) in enumerate(contacts):
-            scroll(idx)
-            iid = send_tree.get_children()[idx]
-            tags = [t for t in send_tree.item(iid, "tags") if t not in ("evenrow", "oddrow", "current")]
-            tags.append("current")
-            tags.append("evenrow" if idx % 2 == 0 else "oddrow")
-            send_tree.item(iid, tags=tuple(tags))
-            dialog.update_idletasks()
-            personalized_subject = subject.replace("{{name}}", cname).replace("{{email}}", cemail).replace("{{mobile}}", cmobile)
-            personalized_body = body.replace("{{name}}", cname).replace("{{email}}", cemail).replace("{{mobile}}", cmobile)
-            try:
-                if email_method == 'smtp':
-                    smtp_settings = {"server": smtp_server, "port": smtp_port}
-                    email_utils.send_email_with_connection_check('smtp', smtp_settings, sender, password, cemail, personalized_subject, personalized_body, sender_name)
-                elif email_method == 'sendgrid':
-                    email_utils.send_email_with_connection_check('sendgrid', {"sendgrid_api_key": sendgrid_api_key}, sender, None, cemail, personalized_subject, personalized_body, sender_name)
-                elif email_method == 'ses':
-                    email_utils.send_email_with_connection_check('ses', {"ses_access_key": ses_access_key, "ses_secret_key": ses_secret_key, "ses_region": ses_region}, sender, None, cemail, personalized_subject, personalized_body, sender_name)
-                send_tree.set(send_tree.get_children()[idx], column="Status", value="✔️")
-                c_th.execute(
-                    "INSERT INTO email_campaign_history (campaign_id, contact_id, timestamp, status, error, personalized_subject, personalized_body) VALUES (?, ?, datetime('now'), ?, '', ?, ?)",
-                    (campaign_id, cid, 'Sent', personalized_subject, personalized_body)
-                )
-                conn_th.commit()
+    # Show what an earlier, interrupted send of this run already did
+    for cid, (state, error) in run.contact_states().items():
+        if cid in row_index and state in (outbox.SENT, outbox.FAILED):
+            view.row(row_index[cid], "✔️" if state == outbox.SENT else f"❌ {error}")
+            if state == outbox.SENT:
                 success += 1
-            except Exception as e:
-                send_tree.set(send_tree.get_children()[idx], column="Status", value=f"❌ {e}")
-                c_th.execute(
-                    "INSERT INTO email_campaign_history (campaign_id, contact_id, timestamp, status, error, personalized_subject, personalized_body) VALUES (?, ?, datetime('now'), ?, ?, ?, ?)",
-                    (campaign_id, cid, 'Failed', str(e), personalized_subject, personalized_body)
-                )
-                conn_th.commit()
+            else:
                 failed += 1
-            counter_var.set(f"Total: {success+failed} | Success: {success} | Failed: {failed}")
-            dialog.update_idletasks()
-            progress['value'] = idx + 1
-            
-            # Add small random delay between emails to avoid being flagged as spam
-            delay = random.uniform(1, 3)
-            time.sleep(delay)
+    view.counts(success, failed)
 
-        conn_th.commit()
-        conn_th.close()
-        sending[0] = False
+    def send_thread():
+        writer = HistoryWriter(run.run_id)
+
+        def on_result(result):
+            nonlocal success, failed
+            for contact, ok, error in sender.outcomes(result):
+                if contact[0] in row_index:
+                    view.row(row_index[contact[0]], "✔️" if ok else f"❌ {error}")
+                writer.email_result(campaign_id, contact, subject, body, ok, error)
+                if ok:
+                    success += 1
+                else:
+                    failed += 1
+            view.counts(success, failed)
+
+        dispatcher = None
+        try:
+            dispatcher = sender.dispatch(run.iter_contacts(sender.lease_size), on_result)
+        finally:
+            try:
+                if end_run(run, writer) and dispatcher is not None and dispatcher.stop_reason:
+                    view.counts(success, failed, f"{dispatcher.stop_reason}; send again to resume")
+            finally:
+                db.close_connections()
+                sender.close()
+                view.done()
 
-    threading.Thread(target=update_timer, daemon=True).start()
+    view.start()
     threading.Thread(target=send_thread, daemon=True).start()
     # --- Email Campaign History Dialog ---
 def show_email_campaign_history(tree):
     import tkinter as tk
     from tkinter import ttk
-    import sqlite3
     hist_win = tk.Toplevel()
     hist_win.title("Email Campaign History")
     hist_win.geometry("900x500")
@@ -594,8 +515,7 @@ def show_email_campaign_history(tree):
         count_var.set(f"Total: {total} | Selected: {selected}")
 
     treeview.bind("<<TreeviewSelect>>", update_counts)
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS email_campaign_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
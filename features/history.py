@@ -1,9 +1,11 @@
 import tkinter as tk
 from tkinter import ttk
-import sqlite3
 from datetime import datetime, timedelta
 import calendar
-from .common import DB_FILE, apply_striped_rows, center_window
+from .common import apply_striped_rows, center_window
+from .search import DebouncedSearch
+from .virtual_table import VirtualTreeview
+from services import history as history_service
 
 class DateTimePicker(tk.Toplevel):
     """Custom date and time picker dialog"""
@@ -320,28 +322,30 @@ def show_history_dialog():
     search_entry.pack(side=tk.LEFT)
     
     # Bind datetime entry changes to load_history
-    from_datetime_entry.bind("<KeyRelease>", lambda e: load_history())
-    to_datetime_entry.bind("<KeyRelease>", lambda e: load_history())
+    from_datetime_entry.bind("<KeyRelease>", lambda e: load_history(typing=True))
+    to_datetime_entry.bind("<KeyRelease>", lambda e: load_history(typing=True))
 
     # Treeview with scrollbars in left panel
     tree_frame = ttk.Frame(left_panel)
     tree_frame.pack(fill=tk.BOTH, expand=True)
 
-    tree = ttk.Treeview(tree_frame, columns=(), show="headings")
+    # Only the visible rows are real Treeview items; it has its own vertical scrollbar
+    tree = VirtualTreeview(tree_frame, columns=())
     tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-    # Scrollbars for treeview
-    v_scrollbar = ttk.Scrollbar(tree_frame, orient=tk.VERTICAL, command=tree.yview)
-    v_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-    tree.configure(yscrollcommand=v_scrollbar.set)
-
     h_scrollbar = ttk.Scrollbar(left_panel, orient=tk.HORIZONTAL, command=tree.xview)
     h_scrollbar.pack(side=tk.BOTTOM, fill=tk.X, pady=(5, 0))
     tree.configure(xscrollcommand=h_scrollbar.set)
 
-    # Count label
+    # Count label and paging
+    paging_row = ttk.Frame(left_panel)
+    paging_row.pack(fill=tk.X, pady=(5, 0))
     count_var = tk.StringVar(value="Total: 0 | Selected: 0")
-    ttk.Label(left_panel, textvariable=count_var).pack(anchor="w", pady=(5, 0))
+    ttk.Label(paging_row, textvariable=count_var).pack(side=tk.LEFT)
+    older_btn = ttk.Button(paging_row, text="Older ▶", state=tk.DISABLED)
+    older_btn.pack(side=tk.RIGHT)
+    newer_btn = ttk.Button(paging_row, text="◀ Newer", state=tk.DISABLED)
+    newer_btn.pack(side=tk.RIGHT, padx=(0, 5))
 
     # Details panel widgets
     details_widgets = {}
@@ -447,229 +451,71 @@ def show_history_dialog():
             details_widgets['content'].insert(1.0, full_content or "No message content")
             details_widgets['content'].configure(state=tk.DISABLED)
 
+    # Total of the current view and the page shown (None while searching)
+    view = {"total": 0, "page": None}
+
     def update_counts(event=None):
-        total = len(tree.get_children())
+        shown = len(tree.get_children())
         selected = len(tree.selection())
-        count_var.set(f"Total: {total} | Selected: {selected}")
+        if view["page"] is not None and shown < view["total"]:
+            count_var.set(f"Total: {view['total']} | Showing: {shown} | Selected: {selected}")
+        else:
+            count_var.set(f"Total: {view['total']} | Selected: {selected}")
         update_details()
 
     tree.bind("<<TreeviewSelect>>", update_counts)
 
-    def load_history():
+    column_widths = {
+        "Email": {"Timestamp": 150, "Recipient": 250, "Subject": 300, "Body": 200, "Status": 80, "Type": 80},
+        # Larger body preview for SMS
+        "SMS": {"Timestamp": 150, "Recipient": 250, "Body": 400, "Status": 100},
+    }
+
+    def search_history(query, context, within):
+        # Runs on a worker thread: no Tk calls here. Ranked full-text
+        # matches are not narrowed locally (within), each query asks the index.
+        option, dates, before, after = context
+        if query:
+            fetch = history_service.email_history if option == "Email" else history_service.sms_history
+            entries = fetch(query, dates)
+            return option, entries, None, len(entries)
+        channel = "email" if option == "Email" else "sms"
+        page = history_service.history_page(channel, dates, before=before, after=after)
+        return option, page.entries, page, history_service.history_total(channel, dates)
+
+    def show_history(results):
+        option, entries, page, total = results
+        view["total"], view["page"] = total, page
+        older_btn.config(state=tk.NORMAL if page is not None and page.has_older else tk.DISABLED)
+        newer_btn.config(state=tk.NORMAL if page is not None and page.has_newer else tk.DISABLED)
         for col in tree["columns"]:
             tree.heading(col, text="")
-        tree.configure(columns=())
-        for item in tree.get_children():
-            tree.delete(item)
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        if option_var.get() == "Email":
-            # Ensure email_history table exists
-            c.execute("""CREATE TABLE IF NOT EXISTS email_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                subject TEXT,
-                body TEXT,
-                email TEXT,
-                status TEXT
-            )""")
-            # Note: email_campaign_history table already exists with schema:
-            # id, campaign_id, contact_id, timestamp, status, error
-            
-            columns = ("Timestamp", "Recipient", "Subject", "Body", "Status", "Type")
-            tree.configure(columns=columns)
-            for col in columns:
-                tree.heading(col, text=col)
-                if col == "Timestamp":
-                    tree.column(col, width=150)
-                elif col == "Recipient":
-                    tree.column(col, width=250)  # Wider for email addresses
-                elif col == "Subject":
-                    tree.column(col, width=300)  # Much wider for subject
-                elif col == "Body":
-                    tree.column(col, width=200)  # Preview only, details in right panel
-                elif col == "Status":
-                    tree.column(col, width=80)
-                elif col == "Type":
-                    tree.column(col, width=80)
-            
-            query = search_var.get().strip().lower()
-            
-            # Build datetime filter conditions
-            date_conditions = ""
-            date_params = []
-            if date_filter_enabled.get():
-                try:
-                    from_datetime_str = from_datetime_var.get()
-                    to_datetime_str = to_datetime_var.get()
-                    # Validate datetime format
-                    from_dt = datetime.strptime(from_datetime_str, "%Y-%m-%d %H:%M")
-                    to_dt = datetime.strptime(to_datetime_str, "%Y-%m-%d %H:%M")
-                    # Convert to strings for SQL comparison
-                    from_timestamp = from_dt.strftime("%Y-%m-%d %H:%M:%S")
-                    to_timestamp = to_dt.strftime("%Y-%m-%d %H:%M:%S")
-                    date_conditions = " AND timestamp BETWEEN ? AND ?"
-                    date_params = [from_timestamp, to_timestamp]
-                except ValueError:
-                    # Invalid datetime format, ignore date filter
-                    date_conditions = ""
-                    date_params = []
-            
-            # Get data from both tables and combine them
-            if query:
-                # Direct emails with date filter
-                direct_query = f"SELECT timestamp, email, subject, body, status FROM email_history WHERE 1=1{date_conditions}"
-                c.execute(direct_query, date_params)
-                direct_data = c.fetchall()
-                direct_rows = []
-                for row in direct_data:
-                    if any(query in str(field).lower() for field in row):
-                        timestamp, email, subject, body, status = row
-                        # Truncate body for list view
-                        body_preview = (body[:50] + "...") if body and len(body) > 50 else (body or "")
-                        direct_rows.append((timestamp, email, subject, body_preview, status, "Direct", body))  # Store full body
-                
-                # Campaign emails with JOIN and date filter
-                campaign_query = f"""
-                    SELECT h.timestamp, ct.email, c.name, 
-                           COALESCE(h.personalized_body, c.body) as body_content, 
-                           h.status 
-                    FROM email_campaign_history h
-                    LEFT JOIN email_campaigns c ON h.campaign_id = c.id
-                    LEFT JOIN contacts ct ON h.contact_id = ct.id
-                    WHERE 1=1{date_conditions}
-                """
-                c.execute(campaign_query, date_params)
-                campaign_data = c.fetchall()
-                campaign_rows = []
-                for row in campaign_data:
-                    if any(query in str(field).lower() for field in row):
-                        timestamp, email, campaign_name, body, status = row
-                        # Truncate body for list view
-                        body_preview = (body[:50] + "...") if body and len(body) > 50 else (body or "")
-                        campaign_rows.append((timestamp, email, f"Campaign: {campaign_name}", body_preview, status, "Campaign", body))  # Store full body
-                
-                rows = direct_rows + campaign_rows
-            else:
-                # Direct emails with date filter
-                direct_query = f"SELECT timestamp, email, subject, body, status FROM email_history WHERE 1=1{date_conditions} ORDER BY timestamp DESC"
-                c.execute(direct_query, date_params)
-                direct_data = c.fetchall()
-                direct_rows = []
-                for row in direct_data:
-                    timestamp, email, subject, body, status = row
-                    # Truncate body for list view
-                    body_preview = (body[:50] + "...") if body and len(body) > 50 else (body or "")
-                    direct_rows.append((timestamp, email, subject, body_preview, status, "Direct", body))  # Store full body
-                
-                # Campaign emails with JOIN and date filter
-                campaign_query = f"""
-                    SELECT h.timestamp, ct.email, c.name, 
-                           COALESCE(h.personalized_body, c.body) as body_content, 
-                           h.status 
-                    FROM email_campaign_history h
-                    LEFT JOIN email_campaigns c ON h.campaign_id = c.id
-                    LEFT JOIN contacts ct ON h.contact_id = ct.id
-                    WHERE 1=1{date_conditions}
-                    ORDER BY h.timestamp DESC
-                """
-                c.execute(campaign_query, date_params)
-                campaign_data = c.fetchall()
-                campaign_rows = []
-                for row in campaign_data:
-                    timestamp, email, campaign_name, body, status = row
-                    # Truncate body for list view
-                    body_preview = (body[:50] + "...") if body and len(body) > 50 else (body or "")
-                    campaign_rows.append((timestamp, email, f"Campaign: {campaign_name}", body_preview, status, "Campaign", body))  # Store full body
-                
-                # Combine and sort by timestamp (newest first)
-                all_rows = direct_rows + campaign_rows
-                rows = sorted(all_rows, key=lambda x: x[0], reverse=True)[:500]
-        else:
-            c.execute("""CREATE TABLE IF NOT EXISTS sms_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT,
-                body TEXT,
-                recipient TEXT,
-                status TEXT
-            )""")
-            columns = ("Timestamp", "Recipient", "Body", "Status")
-            tree.configure(columns=columns)
-            for col in columns:
-                tree.heading(col, text=col)
-                if col == "Timestamp":
-                    tree.column(col, width=150)
-                elif col == "Recipient":
-                    tree.column(col, width=250)
-                elif col == "Body":
-                    tree.column(col, width=400)  # Larger preview for SMS
-                elif col == "Status":
-                    tree.column(col, width=100)
-            query = search_var.get().strip().lower()
-            
-            # Build datetime filter conditions for SMS
-            sms_date_conditions = ""
-            sms_date_params = []
-            if date_filter_enabled.get():
-                try:
-                    from_datetime_str = from_datetime_var.get()
-                    to_datetime_str = to_datetime_var.get()
-                    # Validate datetime format
-                    from_dt = datetime.strptime(from_datetime_str, "%Y-%m-%d %H:%M")
-                    to_dt = datetime.strptime(to_datetime_str, "%Y-%m-%d %H:%M")
-                    # Convert to strings for SQL comparison
-                    from_timestamp = from_dt.strftime("%Y-%m-%d %H:%M:%S")
-                    to_timestamp = to_dt.strftime("%Y-%m-%d %H:%M:%S")
-                    sms_date_conditions = " AND timestamp BETWEEN ? AND ?"
-                    sms_date_params = [from_timestamp, to_timestamp]
-                except ValueError:
-                    # Invalid datetime format, ignore date filter
-                    sms_date_conditions = ""
-                    sms_date_params = []
-            
-            if query:
-                sms_query = f"SELECT timestamp, recipient, body, status FROM sms_history WHERE 1=1{sms_date_conditions}"
-                c.execute(sms_query, sms_date_params)
-                sms_data = c.fetchall()
-                rows = []
-                for row in sms_data:
-                    if any(query in str(field).lower() for field in row):
-                        timestamp, recipient, body, status = row
-                        # Truncate body for list view
-                        body_preview = (body[:50] + "...") if body and len(body) > 50 else (body or "")
-                        rows.append((timestamp, recipient, body_preview, status, body))  # Store full body
-            else:
-                sms_query = f"SELECT timestamp, recipient, body, status FROM sms_history WHERE 1=1{sms_date_conditions} ORDER BY id DESC LIMIT 500"
-                c.execute(sms_query, sms_date_params)
-                sms_data = c.fetchall()
-                rows = []
-                for row in sms_data:
-                    timestamp, recipient, body, status = row
-                    # Truncate body for list view
-                    body_preview = (body[:50] + "...") if body and len(body) > 50 else (body or "")
-                    rows.append((timestamp, recipient, body_preview, status, body))  # Store full body
-        
-        # Clear previous data and insert new rows
+        columns = history_service.EMAIL_COLUMNS if option == "Email" else history_service.SMS_COLUMNS
+        tree.configure(columns=columns)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=column_widths[option][col])
+        iids = tree.set_rows([display_row for display_row, _ in entries])
+        # Full content for the details panel
         full_content_data.clear()
-        for row in rows:
-            if len(row) > 6:  # Email with full content
-                display_row = row[:6]  # First 6 elements for display
-                full_content = row[6]  # Full content
-                item = tree.insert("", tk.END, values=display_row)
-                full_content_data[item] = full_content
-            elif len(row) > 4:  # SMS with full content
-                display_row = row[:4]  # First 4 elements for display
-                full_content = row[4]  # Full content
-                item = tree.insert("", tk.END, values=display_row)
-                full_content_data[item] = full_content
-            else:
-                # Fallback for any other format
-                item = tree.insert("", tk.END, values=row)
-                full_content_data[item] = ""
+        full_content_data.update(zip(iids, (body for _, body in entries)))
         apply_striped_rows(tree)
-        conn.close()
         update_counts()
 
-    search_entry.bind("<KeyRelease>", lambda e: load_history())
+    history_search = DebouncedSearch(hist_win, search_history, show_history)
+
+    def load_history(typing=False, before=None, after=None):
+        dates = None
+        if date_filter_enabled.get():
+            # Invalid datetime format: ignore the date filter
+            dates = history_service.parse_date_range(from_datetime_var.get(), to_datetime_var.get())
+        # Keystrokes wait for a pause in typing; other changes reload at once
+        history_search.trigger(search_var.get().strip().lower(), (option_var.get(), dates, before, after),
+                               delay_ms=None if typing else 0)
+
+    older_btn.config(command=lambda: view["page"] and load_history(before=view["page"].last))
+    newer_btn.config(command=lambda: view["page"] and load_history(after=view["page"].first))
+
+    search_entry.bind("<KeyRelease>", lambda e: load_history(typing=True))
     load_history()
 
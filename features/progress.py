@@ -0,0 +1,117 @@
+import queue
+import time
+import tkinter as tk
+
+# Sentinel posted by close(); the drain loop stops after applying it.
+_CLOSED = object()
+
+
+class ProgressBus:
+    """
+    Hands progress from sender threads to the Tk main loop.
+
+    Threads call post(key, value), which only puts onto a queue and never
+    touches Tk. The main loop drains the queue every `interval_ms` with
+    after(), keeps the latest value per key (a row updated twice in one
+    frame is drawn once) and passes them in posting order to `apply`.
+    """
+
+    def __init__(self, widget, apply, interval_ms=100):
+        self.widget = widget
+        self.apply = apply
+        self.interval_ms = interval_ms
+        self._queue = queue.SimpleQueue()
+
+    def post(self, key, value):
+        self._queue.put((key, value))
+
+    def close(self):
+        """Stop after the events posted so far are applied."""
+        self._queue.put((_CLOSED, None))
+
+    def start(self):
+        self.widget.after(self.interval_ms, self._drain)
+
+    def _drain(self):
+        updates = {}
+        closing = False
+        try:
+            while True:
+                key, value = self._queue.get_nowait()
+                if key is _CLOSED:
+                    closing = True
+                    break
+                updates.pop(key, None)
+                updates[key] = value
+        except queue.Empty:
+            pass
+        try:
+            self.apply(updates, closing)
+            if not closing:
+                self.widget.after(self.interval_ms, self._drain)
+        except tk.TclError:
+            # The dialog was closed while sending; stop drawing
+            pass
+
+
+class SendProgress:
+    """
+    Progress display of a campaign send dialog: per-row status in the send
+    tree, the Success/Failed counter, the progress bar and the elapsed timer.
+    All methods except start() may be called from any thread.
+    """
+
+    def __init__(self, dialog, send_tree, progress, counter_var, timer_var, scroll_to_row=None,
+                 highlight_current=False, interval_ms=100):
+        self.send_tree = send_tree
+        self.progress = progress
+        self.counter_var = counter_var
+        self.timer_var = timer_var
+        self.scroll_to_row = scroll_to_row or self._default_scroll
+        self.highlight_current = highlight_current
+        self.row_iids = send_tree.get_children()
+        self.start_time = time.time()
+        self._shown_seconds = None
+        self.bus = ProgressBus(dialog, self._apply, interval_ms)
+
+    def start(self):
+        self.timer_var.set("Elapsed: 0s")
+        self.bus.start()
+
+    def row(self, idx, status):
+        self.bus.post(("row", idx), status)
+
+    def counts(self, success, failed, note=""):
+        self.bus.post("counts", (success, failed, note))
+
+    def done(self):
+        self.bus.close()
+
+    def _default_scroll(self, idx):
+        self.send_tree.see(self.row_iids[idx])
+        self.send_tree.selection_set(self.row_iids[idx])
+
+    def _apply(self, updates, closing):
+        last_row = None
+        for key, value in updates.items():
+            if key == "counts":
+                success, failed, note = value
+                text = f"Total: {success+failed} | Success: {success} | Failed: {failed}"
+                self.counter_var.set(f"{text} | {note}" if note else text)
+                self.progress['value'] = success + failed
+            elif 0 <= key[1] < len(self.row_iids):
+                last_row = key[1]
+                iid = self.row_iids[last_row]
+                self.send_tree.set(iid, column="Status", value=value)
+                if self.highlight_current:
+                    tags = [t for t in self.send_tree.item(iid, "tags") if t not in ("evenrow", "oddrow", "current")]
+                    tags.append("current")
+                    tags.append("evenrow" if last_row % 2 == 0 else "oddrow")
+                    self.send_tree.item(iid, tags=tuple(tags))
+        # Scroll once per frame, to the newest row
+        if last_row is not None:
+            self.scroll_to_row(last_row)
+        elapsed = int(time.time() - self.start_time)
+        if elapsed != self._shown_seconds:
+            self._shown_seconds = elapsed
+            self.timer_var.set(f"Elapsed: {elapsed}s")
@@ -0,0 +1,97 @@
+import queue
+import threading
+import tkinter as tk
+
+
+class DebouncedSearch:
+    """
+    Runs a search box's query once typing pauses, off the Tk thread.
+
+    trigger() (re)starts a `delay_ms` timer; when it fires, the latest query
+    runs as search(query, context, within) on a worker thread and
+    apply(results) is called with the whole result on the Tk thread.
+    `context` carries the other filters, read on the Tk thread. When the
+    query only extends the previous one under the same context, `within`
+    is the previous results so the search can narrow them instead of
+    starting over; otherwise it is None.
+
+    Results of a superseded query are dropped, and queries typed while a
+    search runs collapse into one run of the newest.
+    """
+
+    def __init__(self, widget, search, apply, delay_ms=250, poll_ms=20):
+        self.widget = widget
+        self.search = search
+        self.apply = apply
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+        self._timer = None
+        self._generation = 0
+        self._running = False
+        self._pending = None      # (generation, query, context) not started yet
+        self._last = None         # (query, context, results) last applied
+        self._done = queue.SimpleQueue()
+
+    def trigger(self, query, context=None, delay_ms=None):
+        self._generation += 1
+        self._pending = (self._generation, query, context)
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+        self._timer = self.widget.after(self.delay_ms if delay_ms is None else delay_ms, self._start)
+
+    def run_now(self, query, context=None):
+        """Search on the Tk thread right away, e.g. after the searched data changed."""
+        self.cancel()
+        results = self.search(query, context, None)
+        self._last = (query, context, results)
+        self.apply(results)
+
+    def cancel(self):
+        """Forget the pending query; a search already running is left to finish and dropped."""
+        self._generation += 1
+        self._pending = None
+        if self._timer is not None:
+            self.widget.after_cancel(self._timer)
+            self._timer = None
+
+    def _start(self):
+        self._timer = None
+        if self._running or self._pending is None:
+            return
+        generation, query, context = self._pending
+        self._pending = None
+        within = None
+        if self._last is not None:
+            last_query, last_context, last_results = self._last
+            if last_query and query.startswith(last_query) and last_context == context:
+                within = last_results
+        self._running = True
+        threading.Thread(target=self._work, args=(generation, query, context, within), daemon=True).start()
+        self.widget.after(self.poll_ms, self._poll)
+
+    def _work(self, generation, query, context, within):
+        try:
+            self._done.put((generation, query, context, self.search(query, context, within), None))
+        except Exception as e:
+            self._done.put((generation, query, context, None, e))
+
+    def _poll(self):
+        try:
+            try:
+                generation, query, context, results, error = self._done.get_nowait()
+            except queue.Empty:
+                self.widget.after(self.poll_ms, self._poll)
+                return
+            self._running = False
+            if generation == self._generation:
+                if error is not None:
+                    print(f"Search failed: {error}")
+                else:
+                    self._last = (query, context, results)
+                    self.apply(results)
+            # A newer query arrived while this one ran and its timer has fired
+            if self._pending is not None and self._timer is None:
+                self._start()
+        except tk.TclError:
+            # The window was closed
+            pass
@@ -1,6 +1,7 @@
 import tkinter as tk
 from tkinter import ttk, simpledialog
 from .common import get_settings, save_settings, center_window
+from services.rate_limit import get_profile
 
 def open_settings_dialog(parent):
     settings = get_settings()
@@ -127,6 +128,35 @@ def open_settings_dialog(parent):
         ses_vars[key] = var
         CreateToolTip(var, tooltip)
 
+    # Sending throughput settings, shared by all providers
+    sending_frame = ttk.LabelFrame(left_panel, text="Sending", padding=10)
+    sending_frame.pack(fill="x", pady=(0, 10))
+
+    frame = ttk.Frame(sending_frame)
+    frame.pack(fill="x", pady=3)
+    ttk.Label(frame, text="Workers:", width=15).pack(side="left")
+    workers_var = ttk.Entry(frame, width=10)
+    workers_var.insert(0, str(settings.get('send_workers', "4")))
+    workers_var.pack(side="left", padx=(5, 0))
+    CreateToolTip(workers_var, "Number of messages sent in parallel")
+
+    # Per-provider rate limits: messages/second, burst size and daily cap
+    limits_grid = ttk.Frame(sending_frame)
+    limits_grid.pack(fill="x", pady=(5, 0))
+    for col, heading in enumerate(("Provider", "Msgs/sec", "Burst", "Daily cap")):
+        ttk.Label(limits_grid, text=heading, font=("Segoe UI", 8, "bold")).grid(row=0, column=col, sticky="w", padx=2)
+    rate_limit_vars = {}
+    for row, (provider, label) in enumerate([('smtp', "SMTP"), ('sendgrid', "SendGrid"), ('ses', "Amazon SES"), ('bulksmsbd', "SMS")], 1):
+        ttk.Label(limits_grid, text=label).grid(row=row, column=0, sticky="w", padx=2)
+        profile = get_profile(provider, settings)
+        for col, key in enumerate(('rate', 'burst', 'daily_cap'), 1):
+            var = ttk.Entry(limits_grid, width=8)
+            value = profile.get(key)
+            var.insert(0, "" if value is None else str(value))
+            var.grid(row=row, column=col, padx=2, pady=1)
+            rate_limit_vars[(provider, key)] = var
+    CreateToolTip(limits_grid, "Leave Daily cap empty for no daily limit")
+
     # ======================== RIGHT PANEL - DEFAULT EMAIL CONTENT ========================
     
     # Default Email Content Section
@@ -225,7 +255,8 @@ def open_settings_dialog(parent):
     update_email_fields(email_method_var.get())
 
     def on_save():
-        new_settings = {}
+        # Start from the saved settings so keys without a field here are kept
+        new_settings = dict(settings)
         # Email settings
         new_settings['email_method'] = email_method_var.get()
         
@@ -240,6 +271,20 @@ def open_settings_dialog(parent):
         # SES settings
         for key, var in ses_vars.items():
             new_settings[key] = var.get().strip()
+
+        # Sending settings
+        new_settings['send_workers'] = workers_var.get().strip()
+        rate_limits = dict(settings.get('rate_limits') or {})
+        for (provider, key), var in rate_limit_vars.items():
+            value = var.get().strip()
+            try:
+                value = float(value) if key == 'rate' else int(value)
+            except ValueError:
+                if key != 'daily_cap':
+                    continue
+                value = None  # No daily cap
+            rate_limits.setdefault(provider, {})[key] = value
+        new_settings['rate_limits'] = rate_limits
             
         # Default content
         new_settings['default_subject'] = subject_var.get().strip()
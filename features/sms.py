@@ -1,11 +1,15 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
-import sqlite3
-import threading
-import time
-import requests
-from datetime import datetime
-from .common import DB_FILE, get_settings, center_window, get_all_group_names, apply_striped_rows
+from .common import DB_FILE, get_settings, center_window, get_all_group_names, apply_striped_rows, ask_resume
+from .progress import SendProgress
+from .search import DebouncedSearch
+from .virtual_table import VirtualTreeview
+from services import db, rate_limit, sms_gateway, outbox
+from services.contact_index import ContactIndex, ContactSelection
+from services.campaigns import end_run, open_run, skip_invalid_recipients
+from services.history_writer import HistoryWriter
+from services.email_utils import personalize
+from services.validation import normalize_mobile
 
 # --- SMS Campaigns UI ---
 def show_sms_campaigns(parent):
@@ -59,9 +63,7 @@ def show_sms_campaigns(parent):
 def load_sms_campaigns(tree):
     for item in tree.get_children():
         tree.delete(item)
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     c.execute("""
         CREATE TABLE IF NOT EXISTS sms_campaigns (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -71,7 +73,6 @@ def load_sms_campaigns(tree):
     """)
     for row in c.execute("SELECT name, message FROM sms_campaigns ORDER BY id DESC"):
         tree.insert("", tk.END, values=row)
-    conn.close()
     apply_striped_rows(tree)
     if hasattr(tree, 'update_counts'):
         tree.update_counts()
@@ -86,18 +87,14 @@ def edit_sms_campaign(tree):
         return
     iid = selected[0]
     old_name, old_message = tree.item(iid, "values")
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     c.execute("SELECT id FROM sms_campaigns WHERE name=?", (old_name,))
     row = c.fetchone()
     if not row:
-        conn.close()
         return
     campaign_id = row[0]
     c.execute("SELECT contact_id FROM sms_campaign_contacts WHERE campaign_id=?", (campaign_id,))
     contact_ids = [r[0] for r in c.fetchall()]
-    conn.close()
     open_sms_campaign_wizard(tree, mode="edit", campaign={
         'id': campaign_id,
         'name': old_name,
@@ -114,20 +111,16 @@ def delete_sms_campaign(tree):
     name = tree.item(iid, "values")[0]
     if not messagebox.askyesno("Delete SMS Campaign", f"Are you sure you want to delete campaign '{name}'?"):
         return
-    import sqlite3
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("DELETE FROM sms_campaigns WHERE name=?", (name,))
-    c.execute("DELETE FROM sms_campaign_contacts WHERE campaign_id IN (SELECT id FROM sms_campaigns WHERE name=?)", (name,))
-    conn.commit()
-    conn.close()
+    with db.transaction(DB_FILE) as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM sms_campaigns WHERE name=?", (name,))
+        c.execute("DELETE FROM sms_campaign_contacts WHERE campaign_id IN (SELECT id FROM sms_campaigns WHERE name=?)", (name,))
     load_sms_campaigns(tree)
 
 # --- SMS Campaign Wizard ---
 def open_sms_campaign_wizard(tree, mode="add", campaign=None):
     import tkinter as tk
     from tkinter import ttk, messagebox
-    import sqlite3
     dialog = tk.Toplevel(tree.master)
     dialog.title("Add SMS Campaign" if mode=="add" else "Edit SMS Campaign")
     dialog.geometry("900x600")
@@ -174,80 +167,66 @@ def open_sms_campaign_wizard(tree, mode="add", campaign=None):
     ttk.Label(step2, text="Selected Contacts:").grid(row=1, column=2, columnspan=2, sticky=tk.W, padx=10)
     sel_list = tk.Listbox(step2, selectmode=tk.MULTIPLE, width=40, height=18)
     sel_list.grid(row=2, column=2, columnspan=2, padx=10, pady=5, sticky=tk.N)
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute("SELECT id, name, email, mobile FROM contacts ORDER BY name")
-    all_contacts = c.fetchall()
-    conn.close()
-    contact_id_map = {idx: cid for idx, (cid, _, _, _) in enumerate(all_contacts)}
+    # Loaded once; search and group filtering below never hit the database
+    contact_index = ContactIndex.load(DB_FILE)
+    all_contacts = [contact_index.contacts[cid] for cid in contact_index.ids]
     contact_display_map = {cid: f"{name} <{mobile}>" for cid, name, _, mobile in all_contacts}
-    sel_contact_ids = []
-    if campaign and campaign.get('contact_ids'):
-        # Filter out contact IDs that no longer exist in the database
-        all_contact_ids = {cid for cid, _, _, _ in all_contacts}
-        valid_contact_ids = [cid for cid in campaign['contact_ids'] if cid in all_contact_ids]
-        sel_contact_ids = valid_contact_ids
-    def refresh_avail_list():
+    # Chosen ids in order; contacts deleted since the campaign was saved are dropped
+    sel_contact_ids = ContactSelection((campaign.get('contact_ids') or ()) if campaign else ())
+    sel_contact_ids.retain(contact_index)
+    # Listbox row -> contact id, rebuilt with each refresh
+    avail_ids = []
+    sel_ids = []
+    def show_avail(ids):
+        avail_ids[:] = ids
         avail_list.delete(0, tk.END)
-        filter_text = search_var.get().lower()
-        group_filter = group_var.get()
-        selected_ids = set(sel_contact_ids)
-        for idx, (cid, name, email, mobile) in enumerate(all_contacts):
-            if cid in selected_ids:
-                continue
-            if (not filter_text or filter_text in name.lower() or filter_text in email.lower() or filter_text in (mobile or "")):
-                if group_filter == "All" or contact_in_group(cid, group_filter):
-                    avail_list.insert(tk.END, f"{name} <{mobile}>")
+        if avail_ids:
+            avail_list.insert(tk.END, *(contact_display_map[cid] for cid in avail_ids))
+    # Typing searches once the user pauses, off the Tk thread
+    avail_search = DebouncedSearch(
+        dialog,
+        lambda text, group, within: contact_index.search(text, group, exclude=sel_contact_ids, within=within),
+        show_avail,
+    )
+    def refresh_avail_list():
+        avail_search.run_now(search_var.get().lower(), group_var.get())
     def refresh_sel_list():
         sel_list.delete(0, tk.END)
-        # Filter out contact IDs that no longer exist
-        valid_contact_ids = []
-        for cid in sel_contact_ids:
-            if cid in contact_display_map:
-                sel_list.insert(tk.END, contact_display_map[cid])
-                valid_contact_ids.append(cid)
-        # Update the list to only include valid contacts
-        sel_contact_ids[:] = valid_contact_ids
-    def contact_in_group(cid, group_short_name):
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
-        c.execute("""
-            SELECT 1 FROM group_members
-            JOIN groups ON group_members.group_id = groups.id
-            WHERE group_members.contact_id=? AND groups.short_name=?
-        """, (cid, group_short_name))
-        found = c.fetchone()
-        conn.close()
-        return bool(found)
+        sel_ids[:] = sel_contact_ids
+        if sel_ids:
+            sel_list.insert(tk.END, *(contact_display_map[cid] for cid in sel_ids))
     refresh_avail_list()
     refresh_sel_list()
+    def add_ids(ids):
+        if sel_contact_ids.add(ids):
+            refresh_avail_list()
+            refresh_sel_list()
     def add_selected():
-        selected = avail_list.curselection()
-        for idx in selected:
-            display = avail_list.get(idx)
-            for cid, disp in contact_display_map.items():
-                if disp == display and cid not in sel_contact_ids:
-                    sel_contact_ids.append(cid)
-        refresh_avail_list()
-        refresh_sel_list()
+        add_ids(avail_ids[idx] for idx in avail_list.curselection())
+    def add_all_matching():
+        add_ids(list(avail_ids))
+    def add_whole_group():
+        if group_var.get() != "All":
+            add_ids(contact_index.search("", group_var.get()))
     def remove_selected():
-        selected = sel_list.curselection()
-        to_remove = [sel_contact_ids[idx] for idx in selected]
-        for cid in to_remove:
-            sel_contact_ids.remove(cid)
+        sel_contact_ids.remove([sel_ids[idx] for idx in sel_list.curselection()])
         refresh_avail_list()
         refresh_sel_list()
     add_btn = ttk.Button(step2, text=">>", command=add_selected)
     add_btn.grid(row=3, column=0, pady=5)
+    bulk_frame = ttk.Frame(step2)
+    bulk_frame.grid(row=3, column=1, pady=5)
+    ttk.Button(bulk_frame, text="Add All Matching", command=add_all_matching).pack(side=tk.LEFT, padx=2)
+    ttk.Button(bulk_frame, text="Add Whole Group", command=add_whole_group).pack(side=tk.LEFT, padx=2)
     remove_btn = ttk.Button(step2, text="<<", command=remove_selected)
     remove_btn.grid(row=3, column=2, pady=5)
-    search_entry.bind("<KeyRelease>", lambda e: refresh_avail_list())
+    search_entry.bind("<KeyRelease>", lambda e: avail_search.trigger(search_var.get().lower(), group_var.get()))
     group_dropdown.bind("<<ComboboxSelected>>", lambda e: refresh_avail_list())
     # Step 3: Send Preview
     step3 = ttk.Frame(notebook)
     notebook.add(step3, text="3. Send Preview")
     send_columns = ("S.No.", "Name", "Mobile", "Status")
-    send_tree = ttk.Treeview(step3, columns=send_columns, show="headings", height=18)
+    send_tree = VirtualTreeview(step3, columns=send_columns, height=18)
     for col in send_columns:
         send_tree.heading(col, text=col)
         send_tree.column(col, width=180 if col!="S.No." else 60, anchor="center")
@@ -275,13 +254,13 @@ def open_sms_campaign_wizard(tree, mode="add", campaign=None):
         current_step[0] = idx
         prev_btn.config(state=tk.NORMAL if idx > 0 else tk.DISABLED)
         if idx == 2:
-            for item in send_tree.get_children():
-                send_tree.delete(item)
+            rows = []
             for i, cid in enumerate(sel_contact_ids, 1):
                 name_mobile = contact_display_map.get(cid, "")
                 name, mobile = name_mobile.split(" <")
                 mobile = mobile.rstrip(">")
-                send_tree.insert("", tk.END, values=(i, name, mobile, "Pending"))
+                rows.append((i, name, mobile, "Pending"))
+            send_tree.set_rows(rows)
             apply_striped_rows(send_tree)
             progress['value'] = 0
             progress['maximum'] = len(sel_contact_ids)
@@ -306,73 +285,8 @@ def open_sms_campaign_wizard(tree, mode="add", campaign=None):
                 return
             show_step(2)
         elif idx == 2:
-            import sqlite3, time, threading, requests
-            settings = get_settings()
-            api_key = settings.get('sms_api_key', '')
-            sender_id = settings.get('sms_sender_id', '')
-            if not api_key or not sender_id:
-                messagebox.showerror("SMS Settings Missing", "Please set SMS API Key and Sender ID in Settings.", parent=dialog)
-                return
-            conn = sqlite3.connect(DB_FILE)
-            c = conn.cursor()
-            c.execute(f"SELECT id, name, email, mobile FROM contacts WHERE id IN ({','.join(['?']*len(sel_contact_ids))})", sel_contact_ids)
-            contacts = c.fetchall()
-            conn.close()
-            total = len(contacts)
-            success = 0
-            failed = 0
-            start_time = time.time()
-            def update_timer():
-                while sending[0]:
-                    elapsed = int(time.time() - start_time)
-                    timer_var.set(f"Elapsed: {elapsed}s")
-                    dialog.update_idletasks()
-                    time.sleep(1)
-            def scroll_to_row(idx):
-                children = send_tree.get_children()
-                if 0 <= idx < len(children):
-                    send_tree.see(children[idx])
-                    send_tree.selection_set(children[idx])
-            def send_thread():
-                nonlocal success, failed
-                base_url = "http://bulksmsbd.net/api/smsapi"
-                for idx, (cid, cname, cemail, cmobile) in enumerate(contacts):
-                    scroll_to_row(idx)
-                    iid = send_tree.get_children()[idx]
-                    tags = [t for t in send_tree.item(iid, "tags") if t not in ("evenrow", "oddrow", "current")]
-                    tags.append("current")
-                    tags.append("evenrow" if idx % 2 == 0 else "oddrow")
-                    send_tree.item(iid, tags=tuple(tags))
-                    dialog.update_idletasks()
-                    personalized_msg = message_text.get("1.0", tk.END).replace("{{name}}", cname).replace("{{email}}", cemail).replace("{{mobile}}", cmobile)
-                    params = {
-                        "api_key": api_key,
-                        "type": "text",
-                        "number": cmobile,
-                        "senderid": sender_id,
-                        "message": personalized_msg
-                    }
-                    try:
-                        resp = requests.get(base_url, params=params, timeout=10)
-                        print(f"SMS API response for {cmobile}: {resp.status_code} {resp.text}")
-                        if resp.status_code == 200 and ("SMS Send Success" in resp.text or 'success' in resp.text.lower()):
-                            send_tree.set(send_tree.get_children()[idx], column="Status", value="✔️")
-                            success += 1
-                        else:
-                            send_tree.set(send_tree.get_children()[idx], column="Status", value="❌")
-                            failed += 1
-                    except Exception as e:
-                        print(f"SMS API error for {cmobile}: {e}")
-                        send_tree.set(send_tree.get_children()[idx], column="Status", value="❌")
-                        failed += 1
-                    counter_var.set(f"Total: {success+failed} | Success: {success} | Failed: {failed}")
-                    dialog.update_idletasks()
-                    progress['value'] = idx + 1
-                    time.sleep(1.5)
-                sending[0] = False
-            sending = [True]
-            threading.Thread(target=update_timer, daemon=True).start()
-            threading.Thread(target=send_thread, daemon=True).start()
+            send_sms_wizard(dialog, send_tree, list(sel_contact_ids), name_var.get().strip(),
+                            message_text.get("1.0", tk.END).strip(), progress, counter_var, timer_var)
     def go_prev():
         idx = current_step[0]
         if idx > 0:
@@ -383,9 +297,7 @@ def open_sms_campaign_wizard(tree, mode="add", campaign=None):
         if not cname:
             messagebox.showerror("Error", "Campaign name is required!", parent=dialog)
             return
-        import sqlite3
-        conn = sqlite3.connect(DB_FILE)
-        c = conn.cursor()
+        c = db.connect(DB_FILE).cursor()
         c.execute("""
             CREATE TABLE IF NOT EXISTS sms_campaigns (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -402,27 +314,21 @@ def open_sms_campaign_wizard(tree, mode="add", campaign=None):
                 UNIQUE(campaign_id, contact_id)
             )
         """)
-        if mode == "add":
-            c.execute("SELECT id FROM sms_campaigns WHERE name=?", (cname,))
-            if c.fetchone():
-                messagebox.showerror("Error", "A campaign with this name already exists!", parent=dialog)
-                conn.close()
-                return
-            c.execute("INSERT INTO sms_campaigns (name, message) VALUES (?, ?)", (cname, cmessage))
-            campaign_id = c.lastrowid
-        else:
-            campaign_id = campaign['id']
-            c.execute("SELECT id FROM sms_campaigns WHERE name=? AND id!=?", (cname, campaign_id))
-            if c.fetchone():
-                messagebox.showerror("Error", "A campaign with this name already exists!", parent=dialog)
-                conn.close()
-                return
-            c.execute("UPDATE sms_campaigns SET name=?, message=? WHERE id=?", (cname, cmessage, campaign_id))
-            c.execute("DELETE FROM sms_campaign_contacts WHERE campaign_id=?", (campaign_id,))
-        for cid in sel_contact_ids:
-            c.execute("INSERT INTO sms_campaign_contacts (campaign_id, contact_id) VALUES (?, ?)", (campaign_id, cid))
-        conn.commit()
-        conn.close()
+        campaign_id = None if mode == "add" else campaign['id']
+        c.execute("SELECT id FROM sms_campaigns WHERE name=? AND id IS NOT ?", (cname, campaign_id))
+        if c.fetchone():
+            messagebox.showerror("Error", "A campaign with this name already exists!", parent=dialog)
+            return
+        with db.transaction(DB_FILE) as conn:
+            c = conn.cursor()
+            if mode == "add":
+                c.execute("INSERT INTO sms_campaigns (name, message) VALUES (?, ?)", (cname, cmessage))
+                campaign_id = c.lastrowid
+            else:
+                c.execute("UPDATE sms_campaigns SET name=?, message=? WHERE id=?", (cname, cmessage, campaign_id))
+                c.execute("DELETE FROM sms_campaign_contacts WHERE campaign_id=?", (campaign_id,))
+            c.executemany("INSERT INTO sms_campaign_contacts (campaign_id, contact_id) VALUES (?, ?)",
+                          ((campaign_id, cid) for cid in sel_contact_ids))
         load_sms_campaigns(tree)
         messagebox.showinfo("Saved", "SMS Campaign saved for later!", parent=dialog)
         dialog.destroy()
@@ -433,89 +339,69 @@ def open_sms_campaign_wizard(tree, mode="add", campaign=None):
 
 # --- SMS Sending Logic ---
 def send_sms_wizard(dialog, send_tree, contact_ids, campaign_name, message, progress, counter_var, timer_var):
-    import sqlite3, time, threading, requests
+    import threading
     settings = get_settings()
     api_key = settings.get('sms_api_key', '')
     sender_id = settings.get('sms_sender_id', '')
     if not api_key or not sender_id:
         messagebox.showerror("SMS Settings Missing", "Please set SMS API Key and Sender ID in Settings.", parent=dialog)
         return
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    c.execute(f"SELECT id, name, email, mobile FROM contacts WHERE id IN ({','.join(['?']*len(contact_ids))})", contact_ids)
-    contacts = c.fetchall()
-    conn.close()
-    total = len(contacts)
+    # Recipients go through a persistent outbox so an interrupted send can resume
+    run, payload = open_run('sms', campaign_name, contact_ids, {'message': message},
+                            resume=lambda left: ask_resume(dialog, campaign_name, left))
+    message = payload['message']
+    # Numbers that don't normalize to E.164 fail up front instead of going through send retries
+    skip_invalid_recipients(run, 'sms')
     success = 0
     failed = 0
-    start_time = time.time()
-    def update_timer():
-        while sending[0]:
-            elapsed = int(time.time() - start_time)
-            timer_var.set(f"Elapsed: {elapsed}s")
-            dialog.update_idletasks()
-            time.sleep(1)
-    def scroll_to_row(idx):
-        children = send_tree.get_children()
-        if 0 <= idx < len(children):
-            send_tree.see(children[idx])
-            send_tree.selection_set(children[idx])
+    limiter = rate_limit.get_limiter('bulksmsbd', settings)
+    client = sms_gateway.get_sms_client(settings)
+    # Rows of send_tree follow contact_ids order; the outbox may not
+    row_index = {cid: i for i, cid in enumerate(contact_ids)}
+    view = SendProgress(dialog, send_tree, progress, counter_var, timer_var, highlight_current=True)
+    # Show what an earlier, interrupted send of this run already did
+    for cid, (state, error) in run.contact_states().items():
+        if cid in row_index and state in (outbox.SENT, outbox.FAILED):
+            view.row(row_index[cid], "✔️" if state == outbox.SENT else "❌")
+            if state == outbox.SENT:
+                success += 1
+            else:
+                failed += 1
+    view.counts(success, failed)
     def send_thread():
-        nonlocal success, failed
-        hist_conn = sqlite3.connect(DB_FILE)
-        hc = hist_conn.cursor()
-        hc.execute('''CREATE TABLE IF NOT EXISTS sms_history (
+        db.connect(DB_FILE).execute('''CREATE TABLE IF NOT EXISTS sms_history (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             timestamp TEXT,
             body TEXT,
             recipient TEXT,
             status TEXT
         )''')
-        hist_conn.commit()
-        base_url = "http://bulksmsbd.net/api/smsapi"
-        for idx, (cid, cname, cemail, cmobile) in enumerate(contacts):
-            scroll_to_row(idx)
-            iid = send_tree.get_children()[idx]
-            tags = [t for t in send_tree.item(iid, "tags") if t not in ("evenrow", "oddrow", "current")]
-            tags.append("current")
-            tags.append("evenrow" if idx % 2 == 0 else "oddrow")
-            send_tree.item(iid, tags=tuple(tags))
-            dialog.update_idletasks()
-            # Personalize message
-            personalized_msg = message.replace("{{name}}", cname).replace("{{email}}", cemail).replace("{{mobile}}", cmobile)
-            params = {
-                "api_key": api_key,
-                "type": "text",
-                "number": cmobile,
-                "senderid": sender_id,
-                "message": personalized_msg
-            }
-            status_text = "Sent"
-            try:
-                resp = requests.get(base_url, params=params, timeout=10)
-                # Debug: log response for troubleshooting
-                print(f"SMS API response for {cmobile}: {resp.status_code} {resp.text}")
-                if resp.status_code == 200 and ("SMS Send Success" in resp.text or 'success' in resp.text.lower()):
-                    send_tree.set(send_tree.get_children()[idx], column="Status", value="✔️")
+        batch_size = int(settings.get('sms_batch_size') or sms_gateway.DEFAULT_BATCH_SIZE)
+        jobs = ((cid, normalize_mobile(cmobile), personalize(message, cname, cemail, cmobile))
+                for cid, cname, cemail, cmobile in run.iter_contacts(batch_size))
+        writer = HistoryWriter(run.run_id)
+        def on_result(result):
+            nonlocal success, failed
+            # One result per gateway request, covering every recipient in it
+            for cid, cmobile, personalized_msg in result.job:
+                if cid in row_index:
+                    view.row(row_index[cid], "✔️" if result.ok else "❌")
+                if result.ok:
                     success += 1
                 else:
-                    send_tree.set(send_tree.get_children()[idx], column="Status", value="❌")
-                    status_text = f"Failed: {resp.text.strip()}"
+                    print(f"SMS API error for {cmobile}: {result.error}")
                     failed += 1
-            except Exception as e:
-                print(f"SMS API error for {cmobile}: {e}")
-                send_tree.set(send_tree.get_children()[idx], column="Status", value="❌")
-                status_text = f"Failed: {e}"
-                failed += 1
-            hc.execute("INSERT INTO sms_history (timestamp, body, recipient, status) VALUES (?, ?, ?, ?)",
-                       (datetime.now().isoformat(), personalized_msg, cmobile, status_text))
-            hist_conn.commit()
-            counter_var.set(f"Total: {success+failed} | Success: {success} | Failed: {failed}")
-            dialog.update_idletasks()
-            progress['value'] = idx + 1
-            time.sleep(1.5)
-        hist_conn.close()
-        sending[0] = False
-    sending = [True]
-    threading.Thread(target=update_timer, daemon=True).start()
+                writer.sms_result(cid, cmobile, personalized_msg, result.ok, result.error)
+            view.counts(success, failed)
+        dispatcher = client.dispatcher(limiter)
+        try:
+            dispatcher.run(sms_gateway.group_by_message(jobs, batch_size), on_result)
+        finally:
+            try:
+                if end_run(run, writer) and dispatcher.stop_reason:
+                    view.counts(success, failed, f"{dispatcher.stop_reason}; send again to resume")
+            finally:
+                db.close_connections()
+                view.done()
+    view.start()
     threading.Thread(target=send_thread, daemon=True).start()
@@ -0,0 +1,323 @@
+import itertools
+import tkinter as tk
+from tkinter import ttk
+
+_STRIPES = ("evenrow", "oddrow")
+_SCROLL_KEYS = ("<Up>", "<Down>", "<Prior>", "<Next>", "<Home>", "<End>")
+
+
+class VirtualTreeview(ttk.Frame):
+    """
+    A Treeview that keeps its rows in Python and shows only the visible window.
+
+    ttk.Treeview makes a Tcl item per row, so inserting, striping or walking
+    50k rows costs seconds and every get_children()/item() call crosses into
+    Tcl. Here rows live in a list plus a dict keyed by item id; the real
+    Treeview only ever holds the 30-odd rows on screen, re-created on scroll.
+
+    It answers the Treeview calls the app uses (insert, delete, item, set,
+    get_children, selection, see, identify_row, heading, column, bind ...)
+    with the same item ids, so existing code keeps working. It carries its
+    own vertical scrollbar; stripes are drawn by position once
+    apply_striped_rows() has been called on it.
+    """
+
+    def __init__(self, master, columns=(), show="headings", height=None, **kwargs):
+        super().__init__(master)
+        self.tree = ttk.Treeview(self, columns=columns, show=show, height=height or 10, **kwargs)
+        self.scrollbar = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._columns = list(columns)
+        self._order = []          # item ids in display order
+        self._rows = {}           # item id -> [values list, tags tuple]
+        self._pos = {}            # item id -> index, rebuilt lazily after deletes
+        self._pos_dirty = False
+        self._selection = set()
+        self._offset = 0
+        self._visible = height or 30
+        self._shown = ()
+        self._striped = False
+        self._render_pending = False
+        self._ids = itertools.count(1)
+        self._own_events = {"<<TreeviewSelect>>", "<Configure>", "<MouseWheel>", "<Button-4>", "<Button-5>"}
+        self._own_events.update(_SCROLL_KEYS)
+        self.tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        self.tree.bind("<Configure>", self._on_configure, add="+")
+        for seq in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            self.tree.bind(seq, self._on_wheel, add="+")
+        for seq in _SCROLL_KEYS:
+            self.tree.bind(seq, self._on_key, add="+")
+
+    # --- Backing rows -------------------------------------------------
+
+    def __len__(self):
+        return len(self._order)
+
+    def _index(self, iid):
+        if self._pos_dirty:
+            self._pos = {item: i for i, item in enumerate(self._order)}
+            self._pos_dirty = False
+        return self._pos[iid]
+
+    def _col(self, column):
+        if isinstance(column, str) and column.startswith("#"):
+            return int(column[1:]) - 1
+        return self._columns.index(column)
+
+    def insert(self, parent, index, iid=None, values=(), tags=(), **kwargs):
+        iid = iid or f"V{next(self._ids)}"
+        row = [list(values) + [""] * (len(self._columns) - len(values)), self._clean_tags(tags)]
+        self._rows[iid] = row
+        if index in (tk.END, "end") or index >= len(self._order):
+            self._pos[iid] = len(self._order)
+            self._order.append(iid)
+        else:
+            self._order.insert(index, iid)
+            self._pos_dirty = True
+        self._schedule_render()
+        return iid
+
+    def set_rows(self, rows, tags=()):
+        """Replace every row at once with value tuples; returns the new item ids."""
+        tags = self._clean_tags(tags)
+        self._order = [f"V{next(self._ids)}" for _ in rows]
+        self._rows = {iid: [list(values), tags] for iid, values in zip(self._order, rows)}
+        self._pos_dirty = True
+        self._selection.clear()
+        self._offset = 0
+        self._schedule_render()
+        return list(self._order)
+
+    def delete(self, *iids):
+        gone = set(iids)
+        if not gone:
+            return
+        self._order = [iid for iid in self._order if iid not in gone]
+        for iid in gone:
+            self._rows.pop(iid, None)
+        self._selection -= gone
+        self._pos_dirty = True
+        self._schedule_render()
+
+    def get_children(self, item=""):
+        return tuple(self._order)
+
+    def exists(self, iid):
+        return iid in self._rows
+
+    def index(self, iid):
+        return self._index(iid)
+
+    def item(self, iid, option=None, **kwargs):
+        row = self._rows[iid]
+        if "values" in kwargs:
+            row[0] = list(kwargs["values"])
+        if "tags" in kwargs:
+            tags = kwargs["tags"]
+            row[1] = self._clean_tags((tags,) if isinstance(tags, str) else tags)
+        if kwargs:
+            self._refresh(iid)
+            return None
+        info = {"values": tuple(row[0]), "tags": self._display_tags(iid)}
+        return info[option] if option else info
+
+    def set(self, iid, column=None, value=None):
+        row = self._rows[iid]
+        if column is None:
+            return dict(zip(self._columns, row[0]))
+        col = self._col(column)
+        if value is None:
+            return row[0][col]
+        row[0][col] = value
+        self._refresh(iid)
+
+    def tag_has(self, tagname, item=None):
+        if item is not None:
+            return tagname in self._display_tags(item)
+        return tuple(iid for iid in self._order if tagname in self._rows[iid][1])
+
+    def _clean_tags(self, tags):
+        tags = tuple(tags or ())
+        return tuple(t for t in tags if t not in _STRIPES) if self._striped else tags
+
+    def _display_tags(self, iid):
+        tags = self._rows[iid][1]
+        if self._striped:
+            tags = tags + (_STRIPES[self._index(iid) % 2],)
+        return tags
+
+    # --- Selection and scrolling --------------------------------------
+
+    def selection(self):
+        return tuple(sorted(self._selection, key=self._index))
+
+    def selection_set(self, *items):
+        self._selection = set(self._flatten(items))
+        self._render()
+
+    def selection_add(self, *items):
+        self._selection |= set(self._flatten(items))
+        self._render()
+
+    def selection_remove(self, *items):
+        self._selection -= set(self._flatten(items))
+        self._render()
+
+    @staticmethod
+    def _flatten(items):
+        for item in items:
+            if isinstance(item, (list, tuple)):
+                yield from item
+            else:
+                yield item
+
+    def see(self, iid):
+        idx = self._index(iid)
+        if idx < self._offset:
+            self._scroll_to(idx)
+        elif idx >= self._offset + self._visible:
+            self._scroll_to(idx - self._visible + 1)
+
+    def yview_moveto(self, fraction):
+        self._scroll_to(int(float(fraction) * len(self._order)))
+
+    def _scroll_to(self, offset):
+        offset = max(0, min(int(offset), len(self._order) - self._visible))
+        if offset != self._offset:
+            self._offset = offset
+            self._render()
+
+    def _on_scrollbar(self, *args):
+        if args[0] == "moveto":
+            self.yview_moveto(args[1])
+        elif args[0] == "scroll":
+            step = self._visible if args[2] == "pages" else 1
+            self._scroll_to(self._offset + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self._scroll_to(self._offset - 3)
+        else:
+            self._scroll_to(self._offset + 3)
+        return "break"
+
+    def _on_key(self, event):
+        focus = self.tree.focus()
+        if not self._order:
+            return None
+        idx = self._index(focus) if focus in self._rows else self._offset
+        target = {
+            "Up": idx - 1, "Down": idx + 1,
+            "Prior": idx - self._visible, "Next": idx + self._visible,
+            "Home": 0, "End": len(self._order) - 1,
+        }[event.keysym]
+        target = max(0, min(target, len(self._order) - 1))
+        iid = self._order[target]
+        self.see(iid)
+        self._selection = {iid}
+        self._render()
+        self.tree.focus(iid)
+        self.tree.event_generate("<<TreeviewSelect>>")
+        return "break"
+
+    def _on_select(self, event):
+        shown = set(self._shown)
+        self._selection = (self._selection - shown) | set(self.tree.selection())
+
+    def _on_configure(self, event):
+        style = ttk.Style(self)
+        row_height = int(style.lookup("Treeview", "rowheight") or 20)
+        visible = max(1, event.height // row_height)
+        if visible != self._visible:
+            self._visible = visible
+            self._scroll_to(self._offset)
+            self._render()
+
+    # --- Rendering ----------------------------------------------------
+
+    def _schedule_render(self):
+        if not self._render_pending:
+            self._render_pending = True
+            self.after_idle(self._render)
+
+    def _refresh(self, iid):
+        if iid in self._shown:
+            self.tree.item(iid, values=self._rows[iid][0], tags=self._display_tags(iid))
+
+    def _render(self):
+        self._render_pending = False
+        total = len(self._order)
+        self._offset = max(0, min(self._offset, total - self._visible))
+        window = self._order[self._offset:self._offset + self._visible]
+        if self._shown:
+            self.tree.delete(*self._shown)
+        for iid in window:
+            self.tree.insert("", tk.END, iid=iid, values=self._rows[iid][0], tags=self._display_tags(iid))
+        self._shown = tuple(window)
+        visible_selection = [iid for iid in window if iid in self._selection]
+        if tuple(self.tree.selection()) != tuple(visible_selection):
+            self.tree.selection_set(visible_selection)
+        if total:
+            self.scrollbar.set(self._offset / total, min(1.0, (self._offset + len(window)) / total))
+        else:
+            self.scrollbar.set(0, 1)
+
+    def enable_stripes(self):
+        """Stripe rows by position at render time (see common.apply_striped_rows)."""
+        if not self._striped:
+            self._striped = True
+            for row in self._rows.values():
+                row[1] = tuple(t for t in row[1] if t not in _STRIPES)
+            self._schedule_render()
+
+    # --- Pass-through to the visible Treeview -------------------------
+
+    def heading(self, column, option=None, **kwargs):
+        return self.tree.heading(column, option, **kwargs)
+
+    def column(self, column, option=None, **kwargs):
+        return self.tree.column(column, option, **kwargs)
+
+    def tag_configure(self, tagname, option=None, **kwargs):
+        return self.tree.tag_configure(tagname, option, **kwargs)
+
+    def identify(self, component, x, y):
+        return self.tree.identify(component, x, y)
+
+    def identify_row(self, y):
+        return self.tree.identify_row(y)
+
+    def identify_column(self, x):
+        return self.tree.identify_column(x)
+
+    def identify_region(self, x, y):
+        return self.tree.identify_region(x, y)
+
+    def focus(self, item=None):
+        return self.tree.focus(item)
+
+    def xview(self, *args):
+        return self.tree.xview(*args)
+
+    def bind(self, sequence=None, func=None, add=None):
+        # Never replace the table's own handlers for these
+        if sequence in self._own_events:
+            add = "+"
+        return self.tree.bind(sequence, func, add)
+
+    def configure(self, cnf=None, **kwargs):
+        if "columns" in kwargs:
+            self._columns = list(kwargs["columns"])
+        if "yscrollcommand" in kwargs:
+            # The table drives its own scrollbar
+            kwargs.pop("yscrollcommand")
+        return self.tree.configure(cnf, **kwargs)
+
+    config = configure
+
+    def cget(self, key):
+        return self.tree.cget(key)
+
+    def __getitem__(self, key):
+        return self.tree[key]
@@ -0,0 +1,105 @@
+"""
+Headless entry point for MessageHub.
+
+    python -m messagehub send --campaign "June Promo" --workers 8
+    python -m messagehub send --campaign "Alert" --channel sms --json
+    python -m messagehub list
+
+Sends saved campaigns without a display, using the same database, settings,
+outbox and senders as the desktop app, so it can run under a process
+supervisor. SIGTERM or Ctrl+C stops after the messages in flight; running
+the same command again resumes from the outbox.
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+from datetime import datetime
+
+from services.campaigns import CampaignError, run_campaign
+from services import db
+from services.config import DB_FILE
+from services.db import init_db
+
+
+def _print_event(event, as_json):
+    if as_json:
+        print(json.dumps(event), flush=True)
+        return
+    stamp = datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
+    kind = event["event"]
+    if kind == "start":
+        print(f"{stamp} Sending {event['channel']} campaign '{event['campaign']}' "
+              f"(run {event['run_id']}): {event['pending']} of {event['total']} pending", flush=True)
+    elif kind == "result":
+        mark = "sent  " if event["ok"] else "FAILED"
+        detail = "" if event["ok"] else f" - {event['error']}"
+        print(f"{stamp} {mark} {event['recipient']}{detail} "
+              f"(sent {event['sent']}, failed {event['failed']})", flush=True)
+    elif kind == "done":
+        print(f"{stamp} Done: sent {event['sent']}, failed {event['failed']}, pending {event['pending']}"
+              + (f" ({event['stop_reason']})" if event.get("stop_reason") else ""), flush=True)
+
+
+def cmd_send(args):
+    stop = threading.Event()
+
+    def _stop(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+    try:
+        done = run_campaign(args.channel, args.campaign, workers=args.workers, resume=not args.fresh,
+                            on_event=lambda e: _print_event(e, args.json), stop_event=stop, db_file=args.db)
+    except CampaignError as e:
+        if args.json:
+            print(json.dumps({"event": "error", "error": str(e)}), flush=True)
+        else:
+            print(f"Error: {e}", file=sys.stderr)
+        return 1
+    # Non-zero when recipients are left for a later run (stopped or daily cap)
+    return 3 if done["pending"] else 0
+
+
+def cmd_list(args):
+    conn = db.connect(args.db)
+    rows = []
+    for channel in ("email", "sms"):
+        rows += [(channel, name, count) for name, count in conn.execute(
+            f"SELECT c.name, COUNT(cc.contact_id) FROM {channel}_campaigns c "
+            f"LEFT JOIN {channel}_campaign_contacts cc ON cc.campaign_id = c.id GROUP BY c.id ORDER BY c.name"
+        )]
+    for channel, name, count in rows:
+        if args.json:
+            print(json.dumps({"channel": channel, "campaign": name, "contacts": count}))
+        else:
+            print(f"{channel:5}  {name}  ({count} contacts)")
+    return 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="messagehub", description="Send MessageHub campaigns without the desktop UI.")
+    parser.add_argument("--db", default=DB_FILE, help="contacts database (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    send = sub.add_parser("send", help="send a saved campaign")
+    send.add_argument("--campaign", required=True, help="campaign name")
+    send.add_argument("--channel", choices=("email", "sms"), default="email")
+    send.add_argument("--workers", type=int, help="concurrent sends (default: send_workers setting)")
+    send.add_argument("--fresh", action="store_true", help="start a new run instead of resuming an unfinished one")
+    send.add_argument("--json", action="store_true", help="print progress as JSON lines")
+    send.set_defaults(func=cmd_send)
+
+    listing = sub.add_parser("list", help="list saved campaigns")
+    listing.add_argument("--json", action="store_true", help="print JSON lines")
+    listing.set_defaults(func=cmd_list)
+
+    args = parser.parse_args(argv)
+    init_db(args.db)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
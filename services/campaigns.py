@@ -0,0 +1,269 @@
+from services import db, email_utils, smtp_pool, rate_limit, outbox, sms_gateway, validation
+from services.config import DB_FILE, get_settings
+from services.dispatcher import CampaignDispatcher, chunked
+from services.history_writer import HistoryWriter
+
+
+class CampaignError(Exception):
+    pass
+
+
+class EmailCampaignSender:
+    """
+    Sends one subject/body to contacts with the provider chosen in settings.
+
+    Holds everything a send needs (pooled SMTP sessions, the provider's rate
+    limiter, bulk batching for SES/SendGrid) so the Tk dialog and the
+    headless runner send the same way. Jobs are (id, name, email, mobile)
+    contacts, or lists of them when the provider takes batches.
+    """
+
+    def __init__(self, settings, subject, body, workers=None, db_file=DB_FILE):
+        self.settings = settings
+        self.subject = subject
+        self.body = body
+        self.method = email_utils.normalize_method(settings.get('email_method', 'SMTP'))
+        self.sender = settings.get('sender_email', '')
+        self.sender_name = settings.get('sender_name', '')
+        self.password = settings.get('sender_pwd', '')
+        self.smtp_settings = {
+            "server": settings.get('smtp_server', 'smtp.gmail.com'),
+            "port": int(settings.get('smtp_port', '587')),
+        }
+        self.sendgrid_api_key = settings.get('sendgrid_api_key', '')
+        self.ses_access_key = settings.get('ses_access_key', '')
+        self.ses_secret_key = settings.get('ses_secret_key', '')
+        self.ses_region = settings.get('ses_region', '')
+        if not self.sender:
+            raise CampaignError("Sender email not set in settings.")
+        self.workers = int(workers or settings.get('send_workers') or 4)
+
+        self.pool = None
+        if self.method == 'smtp':
+            # Reuse authenticated sessions instead of a handshake per recipient
+            self.pool = smtp_pool.get_smtp_pool(
+                self.smtp_settings, self.sender, self.password,
+                size=int(settings.get('smtp_pool_size') or self.workers),
+                max_messages=int(settings.get('smtp_max_messages_per_connection', 100)),
+            )
+        self.limiter = rate_limit.get_limiter(
+            self.method, settings, host=self.smtp_settings["server"] if self.method == 'smtp' else None,
+            db_file=db_file
+        )
+
+        # SES can send one templated message to 50 recipients per call when the
+        # only personalization is the contact placeholders
+        self.ses_bulk = (self.method == 'ses' and settings.get('ses_bulk', True)
+                         and email_utils.uses_only_contact_placeholders(subject, body))
+        # SendGrid takes up to 1000 personalizations per request
+        sendgrid_batch = self.method == 'sendgrid' and settings.get('sendgrid_batch', True)
+        if self.ses_bulk:
+            self.batch_size = email_utils.SES_BULK_MAX_DESTINATIONS
+        elif sendgrid_batch:
+            self.batch_size = min(int(settings.get('sendgrid_batch_size') or email_utils.SENDGRID_MAX_PERSONALIZATIONS),
+                                  email_utils.SENDGRID_MAX_PERSONALIZATIONS)
+        else:
+            self.batch_size = None
+
+    @property
+    def lease_size(self):
+        """How many outbox rows to lease at a time."""
+        return self.batch_size or self.workers * 2
+
+    def send_one(self, contact):
+        cid, cname, cemail, cmobile = contact
+        personalized_subject = email_utils.personalize(self.subject, cname, cemail, cmobile)
+        personalized_body = email_utils.personalize(self.body, cname, cemail, cmobile)
+        if self.method == 'smtp':
+            email_utils.send_email_with_connection_check('smtp', self.smtp_settings, self.sender, self.password, cemail, personalized_subject, personalized_body, self.sender_name, pool=self.pool)
+        elif self.method == 'sendgrid':
+            email_utils.send_email_with_connection_check('sendgrid', {"sendgrid_api_key": self.sendgrid_api_key}, self.sender, None, cemail, personalized_subject, personalized_body, self.sender_name)
+        elif self.method == 'ses':
+            email_utils.send_email_with_connection_check('ses', {"ses_access_key": self.ses_access_key, "ses_secret_key": self.ses_secret_key, "ses_region": self.ses_region}, self.sender, None, cemail, personalized_subject, personalized_body, self.sender_name)
+        else:
+            raise ValueError(f"Unknown email method: {self.method}")
+
+    def send_batch(self, batch):
+        if not email_utils.check_internet_connection():
+            raise Exception("No internet connection available")
+        recipients = [(cemail, cname, cmobile) for _, cname, cemail, cmobile in batch]
+        if self.ses_bulk:
+            return email_utils.send_bulk_email_ses(
+                self.ses_access_key, self.ses_secret_key, self.ses_region, self.sender, recipients,
+                self.subject, self.body, self.sender_name
+            )
+        return email_utils.send_bulk_email_sendgrid(
+            self.sendgrid_api_key, self.sender, recipients, self.subject, self.body, self.sender_name
+        )
+
+    def dispatch(self, contacts, on_result, stop_event=None):
+        """Send contacts (an iterable, read lazily); returns the CampaignDispatcher used."""
+        if self.batch_size:
+            dispatcher = CampaignDispatcher(self.send_batch, workers=self.workers, limiter=self.limiter,
+                                            cost=len, stop_event=stop_event)
+            dispatcher.run(chunked(contacts, self.batch_size), on_result)
+        else:
+            dispatcher = CampaignDispatcher(self.send_one, workers=self.workers, limiter=self.limiter,
+                                            stop_event=stop_event)
+            dispatcher.run(contacts, on_result)
+        return dispatcher
+
+    def outcomes(self, result):
+        """Yield (contact, ok, error) for every contact a dispatcher result covers."""
+        if self.batch_size:
+            statuses = result.value if result.ok else [(False, result.error)] * len(result.job)
+            yield from ((contact, ok, error) for contact, (ok, error) in zip(result.job, statuses))
+        else:
+            yield result.job, result.ok, result.error
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close_idle()
+        if self.ses_bulk:
+            email_utils.delete_ses_template(self.ses_access_key, self.ses_secret_key, self.ses_region,
+                                            self.subject, self.body)
+
+
+def open_run(channel, campaign_name, contact_ids, payload, resume=True, db_file=DB_FILE):
+    """
+    Return (run, payload): the unfinished outbox run of this campaign when
+    resuming, with the message it was started with, or a new run.
+    `resume` may be a callable, asked with the number of recipients left
+    whether to resume (the Tk dialogs ask the user).
+    """
+    run = outbox.Outbox.find_unfinished(channel, campaign_name, db_file=db_file)
+    if run is not None:
+        run.recover()
+        counts = run.counts()
+        left = counts[outbox.PENDING] + counts[outbox.IN_FLIGHT]
+        if left and (resume(left) if callable(resume) else resume):
+            return run, dict(payload, **run.payload)
+        run.finish()
+    return outbox.Outbox.create(channel, campaign_name, contact_ids, payload, db_file=db_file), payload
+
+
+def end_run(run, writer):
+    """
+    Wrap up a send of `run` once its workers have stopped: write the
+    writer's queued results, return unsettled leases to pending and finish
+    the run if no recipient is left. Returns how many are left.
+    """
+    # Every reported outcome is settled before the release; if that
+    # fails the rows stay in-flight and recover() fails them on resume
+    writer.close()
+    # Leases left unsettled were never handed to a worker
+    run.release()
+    counts = run.counts()
+    left = counts[outbox.PENDING] + counts[outbox.IN_FLIGHT]
+    if not left:
+        run.finish()
+    return left
+
+
+def skip_invalid_recipients(run, channel):
+    """
+    Fail the run's pending recipients whose email (or, for SMS, mobile)
+    can't be sent to, before the send starts, so no request or retry is
+    spent on them. Returns how many.
+    """
+    check = validation.email_error if channel == 'email' else validation.mobile_error
+    column = 'email' if channel == 'email' else 'mobile'
+    conn = db.connect(run.db_file)
+    failed = [(cid, False, error) for cid, value in conn.execute(
+        f"SELECT c.id, c.{column} FROM send_outbox o JOIN contacts c ON c.id = o.contact_id "
+        "WHERE o.run_id=? AND o.state=?", (run.run_id, outbox.PENDING)
+    ) for error in [check(value)] if error]
+    with db.transaction(run.db_file) as conn:
+        outbox.settle_many(conn, run.run_id, failed)
+    return len(failed)
+
+
+def _load_campaign(channel, campaign_name, db_file):
+    conn = db.connect(db_file)
+    table, columns = ('email_campaigns', 'id, subject, body') if channel == 'email' else ('sms_campaigns', 'id, message')
+    row = conn.execute(f"SELECT {columns} FROM {table} WHERE name=?", (campaign_name,)).fetchone()
+    if row is None:
+        raise CampaignError(f"No {channel} campaign named '{campaign_name}'")
+    contact_ids = [r[0] for r in conn.execute(
+        f"SELECT contact_id FROM {channel}_campaign_contacts WHERE campaign_id=? ORDER BY rowid", (row[0],)
+    )]
+    if channel == 'email':
+        return row[0], {'subject': row[1] or '', 'body': row[2] or ''}, contact_ids
+    return row[0], {'message': row[1] or ''}, contact_ids
+
+
+def run_campaign(channel, campaign_name, settings=None, workers=None, resume=True,
+                 on_event=None, stop_event=None, db_file=DB_FILE):
+    """
+    Send a saved email or SMS campaign without any UI.
+
+    Reuses the campaign and contact tables, the outbox and the same senders
+    as the Tk dialogs. on_event receives plain dicts: one "start", a "result"
+    per recipient and a final "done". Setting stop_event stops after the
+    in-flight messages; the rest stays pending for the next run.
+    Returns the "done" event.
+    """
+    if channel not in ('email', 'sms'):
+        raise CampaignError(f"Unknown channel: {channel}")
+    settings = get_settings() if settings is None else settings
+    emit = on_event or (lambda event: None)
+    campaign_id, payload, contact_ids = _load_campaign(channel, campaign_name, db_file)
+    if not contact_ids:
+        raise CampaignError(f"Campaign '{campaign_name}' has no contacts")
+
+    if channel == 'email' and not settings.get('sender_email'):
+        raise CampaignError("Sender email not set in settings.")
+    if channel == 'sms' and (not settings.get('sms_api_key') or not settings.get('sms_sender_id')):
+        raise CampaignError("SMS API Key and Sender ID are not set in settings.")
+
+    run, payload = open_run(channel, campaign_name, contact_ids, payload, resume, db_file)
+    invalid = skip_invalid_recipients(run, channel)
+    counts = run.counts()
+    emit({"event": "start", "channel": channel, "campaign": campaign_name, "run_id": run.run_id,
+          "total": sum(counts.values()), "pending": counts[outbox.PENDING], "invalid": invalid})
+
+    tally = {"sent": 0, "failed": 0}
+
+    def report(contact_id, recipient, ok, error):
+        tally["sent" if ok else "failed"] += 1
+        emit({"event": "result", "contact_id": contact_id, "recipient": recipient, "ok": ok,
+              "error": error, **tally})
+
+    writer = HistoryWriter(run.run_id, db_file)
+    try:
+        if channel == 'email':
+            sender = EmailCampaignSender(settings, payload['subject'], payload['body'], workers, db_file)
+
+            def on_result(result):
+                for contact, ok, error in sender.outcomes(result):
+                    writer.email_result(campaign_id, contact, sender.subject, sender.body, ok, error)
+                    report(contact[0], contact[2], ok, error)
+
+            try:
+                dispatcher = sender.dispatch(run.iter_contacts(sender.lease_size), on_result, stop_event)
+            finally:
+                sender.close()
+        else:
+            if workers:
+                settings = dict(settings, sms_workers=workers)
+            client = sms_gateway.get_sms_client(settings)
+            batch_size = int(settings.get('sms_batch_size') or sms_gateway.DEFAULT_BATCH_SIZE)
+            jobs = ((cid, validation.normalize_mobile(cmobile),
+                     email_utils.personalize(payload['message'], cname, cemail, cmobile))
+                    for cid, cname, cemail, cmobile in run.iter_contacts(batch_size))
+
+            def on_result(result):
+                for cid, cmobile, message in result.job:
+                    writer.sms_result(cid, cmobile, message, result.ok, result.error)
+                    report(cid, cmobile, result.ok, result.error)
+
+            dispatcher = client.dispatcher(rate_limit.get_limiter('bulksmsbd', settings, db_file=db_file), stop_event)
+            dispatcher.run(sms_gateway.group_by_message(jobs, batch_size), on_result)
+    finally:
+        left = end_run(run, writer)
+
+    stop_reason = dispatcher.stop_reason or ("Stopped" if stop_event is not None and stop_event.is_set() else None)
+    done = {"event": "done", "channel": channel, "campaign": campaign_name, "run_id": run.run_id,
+            **tally, "pending": left, "stop_reason": stop_reason}
+    emit(done)
+    return done
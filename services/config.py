@@ -0,0 +1,28 @@
+import os
+import sys
+import json
+
+# Paths and settings shared by the Tk app and the headless runner. Kept free
+# of tkinter so services can be imported on a server without a display.
+if getattr(sys, "frozen", False):
+    BASE_DIR = os.path.dirname(sys.executable)
+else:
+    BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRIVATE_DIR = os.path.join(BASE_DIR, "private")
+
+DB_FILE = os.path.join(PRIVATE_DIR, "contacts.db")
+SETTINGS_FILE = os.path.join(PRIVATE_DIR, "settings.json")
+COLUMN_WIDTHS_FILE = os.path.join(PRIVATE_DIR, "column_widths.json")
+# Rows an import rejected, one CSV per import
+IMPORT_REPORTS_DIR = os.path.join(PRIVATE_DIR, "import_reports")
+
+
+def get_settings():
+    if not os.path.exists(SETTINGS_FILE):
+        return {}
+    try:
+        with open(SETTINGS_FILE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
@@ -0,0 +1,110 @@
+from collections import defaultdict
+
+from services import db
+from services.config import DB_FILE
+
+# Separates the name/email/mobile fields in the search text, so a query
+# cannot match across two fields
+_SEP = "\x00"
+
+
+class ContactIndex:
+    """
+    In-memory view of the contacts table for the campaign pickers.
+
+    Loaded once per wizard with two queries. Group filtering is a set lookup
+    and search is a substring scan over pre-lowercased text, so filtering
+    never touches the database while the user types.
+    """
+
+    def __init__(self, contacts, memberships=()):
+        # contacts: (id, name, email, mobile) rows in display order
+        # memberships: (group short_name, contact_id) pairs
+        self.ids = [row[0] for row in contacts]
+        self.contacts = {row[0]: row for row in contacts}
+        self._text = {
+            cid: _SEP.join(((name or "").lower(), (email or "").lower(), (mobile or "").lower()))
+            for cid, name, email, mobile in contacts
+        }
+        self.groups = defaultdict(set)
+        for short_name, cid in memberships:
+            self.groups[short_name].add(cid)
+
+    @classmethod
+    def load(cls, db_file=DB_FILE):
+        conn = db.connect(db_file)
+        contacts = conn.execute("SELECT id, name, email, mobile FROM contacts ORDER BY name").fetchall()
+        memberships = conn.execute("""
+            SELECT groups.short_name, group_members.contact_id FROM group_members
+            JOIN groups ON group_members.group_id = groups.id
+        """).fetchall()
+        return cls(contacts, memberships)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, cid):
+        return cid in self.contacts
+
+    def members(self, group):
+        """Contact ids of a group by short name; None for "All"."""
+        if group == "All":
+            return None
+        return self.groups.get(group, set())
+
+    def in_group(self, cid, group):
+        return group == "All" or cid in self.groups.get(group, ())
+
+    def search(self, text="", group="All", exclude=(), within=None):
+        """
+        Ids, in display order, of contacts whose name, email or mobile
+        contains `text` (case-insensitive) and that belong to `group`.
+        `within` limits the scan to earlier results (ids in display order),
+        for a query that extends the previous one.
+        """
+        text = text.lower()
+        members = self.members(group)
+        if members is not None and not members:
+            return []
+        candidates = self.ids if within is None else within
+        haystacks = self._text
+        return [
+            cid for cid in candidates
+            if (members is None or cid in members)
+            and cid not in exclude
+            and (not text or text in haystacks[cid])
+        ]
+
+
+class ContactSelection:
+    """
+    The contacts chosen in a campaign wizard: an ordered set of ids kept in
+    the order they were added. Backed by a dict, so membership, add and
+    remove cost O(1) per id and bulk operations are linear.
+    """
+
+    def __init__(self, ids=()):
+        self._ids = dict.fromkeys(ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __iter__(self):
+        return iter(self._ids)
+
+    def __contains__(self, cid):
+        return cid in self._ids
+
+    def add(self, ids):
+        """Append ids not already chosen; returns how many were added."""
+        before = len(self._ids)
+        self._ids.update(dict.fromkeys(cid for cid in ids if cid not in self._ids))
+        return len(self._ids) - before
+
+    def remove(self, ids):
+        for cid in ids:
+            self._ids.pop(cid, None)
+
+    def retain(self, valid):
+        """Drop ids that are not in `valid` (e.g. contacts deleted since saving)."""
+        self._ids = {cid: None for cid in self._ids if cid in valid}
@@ -1,42 +1,240 @@
-import sqlite3
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
 import pandas as pd
 
-from features.common import DB_FILE
+from services import db, validation
+from services.config import DB_FILE, IMPORT_REPORTS_DIR
+
+# Rows read and inserted per transaction; bounds memory on large files
+IMPORT_CHUNK_ROWS = 50000
+CONTACT_COLUMNS = ['name', 'email', 'mobile']
+
 
-def import_contacts_from_csv(filename):
-    data = pd.read_csv(filename)
-    required_cols = {'name', 'email', 'mobile'}
-    # Normalize column names to lower for robustness
-    data.columns = [col.lower() for col in data.columns]
-    missing = required_cols - set(data.columns)
+def _contact_columns(columns, kind="File"):
+    """Map name/email/mobile to the source's own column names, matched case-insensitively."""
+    wanted = {}
+    for col in columns:
+        if str(col).lower() in CONTACT_COLUMNS:
+            wanted.setdefault(str(col).lower(), col)
+    missing = set(CONTACT_COLUMNS) - set(wanted)
     if missing:
-        raise Exception(f"CSV is missing required columns: {', '.join(missing)}. Required columns are: name, email, mobile.")
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
-    imported = 0
-    for _, row in data.iterrows():
-        def safe_str(val):
-            if pd.isna(val):
-                return ''
-            return str(val).strip()
-        name = safe_str(row.get('name', ''))
-        email = safe_str(row.get('email', ''))
-        mobile = safe_str(row.get('mobile', ''))
-        if not name or not email:
-            continue
+        raise Exception(f"{kind} is missing required columns: {', '.join(missing)}. Required columns are: name, email, mobile.")
+    return wanted
+
+
+def _as_text(frame, wanted):
+    """The contact columns of a chunk, renamed and as text; missing values stay missing."""
+    return frame[[wanted[name] for name in CONTACT_COLUMNS]].set_axis(CONTACT_COLUMNS, axis=1).astype("string")
+
+
+def _csv_chunks(filename, chunk_rows):
+    wanted = _contact_columns(pd.read_csv(filename, nrows=0).columns, "CSV")
+    size = os.path.getsize(filename) or 1
+    with open(filename, 'rb') as f:
+        for chunk in pd.read_csv(f, dtype=str, usecols=list(wanted.values()), chunksize=chunk_rows):
+            yield _as_text(chunk, wanted), f.tell() / size
+
+
+def _jsonl_chunks(filename, chunk_rows):
+    size = os.path.getsize(filename) or 1
+    wanted = None
+    with open(filename, 'rb') as f:
+        # dtype=False: no type guessing, so "017..." strings keep their zero
+        for chunk in pd.read_json(f, lines=True, chunksize=chunk_rows, dtype=False, convert_dates=False):
+            if wanted is None:
+                wanted = _contact_columns(chunk.columns, "JSON Lines file")
+            # A key absent from every record of a later chunk is absent from its columns
+            chunk = chunk.reindex(columns=list(dict.fromkeys(list(chunk.columns) + list(wanted.values()))))
+            yield _as_text(chunk, wanted), f.tell() / size
+
+
+def _xlsx_chunks(filename, chunk_rows):
+    try:
+        import openpyxl
+    except ImportError:
+        raise Exception("Importing .xlsx files needs the openpyxl package (pip install openpyxl).")
+    # read_only streams the sheet row by row instead of loading it
+    workbook = openpyxl.load_workbook(filename, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        header = list(next(rows, None) or [])
+        wanted = _contact_columns(header, "Sheet")
+        positions = {name: header.index(col) for name, col in wanted.items()}
+        total = max((sheet.max_row or 0) - 1, 1)
+        read = 0
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= chunk_rows:
+                read += len(batch)
+                yield _xlsx_frame(batch, positions), min(read / total, 1.0)
+                batch = []
+        if batch:
+            yield _xlsx_frame(batch, positions), 1.0
+    finally:
+        workbook.close()
+
+
+def _xlsx_frame(rows, positions):
+    frame = pd.DataFrame({name: [row[pos] if pos < len(row) else None for row in rows]
+                          for name, pos in positions.items()}, dtype=object)
+    return _as_text(frame, {name: name for name in CONTACT_COLUMNS})
+
+
+def _parquet_chunks(filename, chunk_rows):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise Exception("Importing Parquet files needs the pyarrow package (pip install pyarrow).")
+    parquet = pq.ParquetFile(filename)
+    wanted = _contact_columns(parquet.schema_arrow.names, "Parquet file")
+    total = max(parquet.metadata.num_rows, 1)
+    read = 0
+    # Only the three columns are read, one record batch at a time
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=list(wanted.values())):
+        read += batch.num_rows
+        yield _as_text(batch.to_pandas(), wanted), read / total
+
+
+# File extension -> chunk reader; anything else is read as CSV
+CONTACT_READERS = {
+    '.jsonl': _jsonl_chunks,
+    '.ndjson': _jsonl_chunks,
+    '.xlsx': _xlsx_chunks,
+    '.parquet': _parquet_chunks,
+}
+
+
+def read_contact_chunks(filename, chunk_rows=IMPORT_CHUNK_ROWS):
+    """
+    Yield (chunk, done) pairs: the name, email and mobile columns of a
+    contacts file as DataFrames of up to chunk_rows rows, and the fraction
+    of the file read so far. CSV, JSON Lines, xlsx (first sheet) and
+    Parquet are read by extension. Column names match case-insensitively;
+    every value comes as text, so mobiles keep their leading zeros.
+    """
+    reader = CONTACT_READERS.get(os.path.splitext(filename)[1].lower(), _csv_chunks)
+    return reader(filename, chunk_rows)
+
+
+# What an import did: contacts added, rows whose email was already taken
+# (in the database or earlier in the file), rows rejected as invalid, new
+# group memberships, the CSV listing the rejected rows (None if none), and
+# whether it was cancelled. Counts cover committed chunks only.
+ImportReport = namedtuple("ImportReport", "inserted duplicate invalid assigned rejects cancelled")
+
+
+class ImportProgress(namedtuple("ImportProgress", "rows done elapsed")):
+    """Rows committed so far, the fraction of the source read, and seconds since the start."""
+
+    @property
+    def rate(self):
+        """Rows per second."""
+        return self.rows / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def eta(self):
+        """Seconds left at the pace so far, or None before there is a pace."""
+        if not 0 < self.done <= 1:
+            return None
+        return self.elapsed * (1 - self.done) / self.done
+
+
+class _Cancelled(Exception):
+    pass
+
+
+class _RejectLog:
+    """Appends rejected rows, with their reason, to a CSV created on first use."""
+
+    def __init__(self, source, reject_dir):
+        stem = os.path.splitext(os.path.basename(source))[0]
+        self.path = os.path.join(reject_dir, f"{stem}-{datetime.now():%Y%m%d-%H%M%S}-rejected.csv")
+        self.used = False
+
+    def write(self, rejected):
+        if rejected.empty:
+            return
+        if not self.used:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        rejected.to_csv(self.path, mode='a' if self.used else 'w', header=not self.used, index=False)
+        self.used = True
+
+
+def import_contacts(filename, groups=(), db_file=DB_FILE, chunk_rows=IMPORT_CHUNK_ROWS,
+                    reject_dir=IMPORT_REPORTS_DIR, on_progress=None, stop_event=None):
+    """
+    Import a contacts file (see read_contact_chunks) in one pass and add
+    every contact it names, new or already known, to the groups with the
+    given short names. Rows go through services.validation first: emails
+    are trimmed and lower-cased, mobiles normalized, and rows that fail a
+    check or repeat an earlier email are written to a CSV in reject_dir
+    instead.
+
+    Each chunk is committed on its own, after which on_progress (if given)
+    receives an ImportProgress. Setting stop_event rolls back the chunk in
+    progress and ends the import with what was already committed.
+    Returns an ImportReport.
+    """
+    start = time.monotonic()
+    conn = db.connect(db_file)
+    group_ids = [row[0] for row in conn.execute(
+        f"SELECT id FROM groups WHERE short_name IN ({','.join('?' * len(groups))})", list(groups)
+    )] if groups else []
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS import_rows (name TEXT, email TEXT, mobile TEXT)")
+    seen = validation.SeenEmails()
+    rejects = _RejectLog(filename, reject_dir)
+    inserted = duplicate = invalid = assigned = rows_done = 0
+    cancelled = False
+    for chunk, done in read_contact_chunks(filename, chunk_rows):
+        valid, rejected = validation.validate_contacts(chunk, seen)
+        rows = list(zip(*(valid[col].tolist() for col in CONTACT_COLUMNS)))
         try:
-            c.execute("INSERT OR IGNORE INTO contacts (name, email, mobile) VALUES (?, ?, ?)", (name, email, mobile))
-            if c.rowcount > 0:
-                imported += 1
-        except Exception:
-            continue
-    conn.commit()
-    conn.close()
-    return imported
+            with db.transaction(db_file) as conn:
+                conn.execute("DELETE FROM import_rows")
+                conn.executemany("INSERT INTO import_rows VALUES (?, ?, ?)", rows)
+                # Stored emails may predate lower-casing, so match them case-insensitively.
+                # lower() on both sides (i.email already is) lets idx_contacts_email_lower be used.
+                added = conn.execute(
+                    "INSERT OR IGNORE INTO contacts (name, email, mobile) "
+                    "SELECT name, email, mobile FROM import_rows i "
+                    "WHERE NOT EXISTS (SELECT 1 FROM contacts c WHERE lower(c.email) = lower(i.email)) ORDER BY i.rowid"
+                ).rowcount
+                members = conn.execute(
+                    "INSERT OR IGNORE INTO group_members (group_id, contact_id) "
+                    f"SELECT g.id, c.id FROM groups g, import_rows i JOIN contacts c ON lower(c.email) = lower(i.email) "
+                    f"WHERE g.id IN ({','.join('?' * len(group_ids))})", group_ids
+                ).rowcount if group_ids else 0
+                conn.execute("DELETE FROM import_rows")
+                if stop_event is not None and stop_event.is_set():
+                    raise _Cancelled()
+        except _Cancelled:
+            cancelled = True
+            break
+        rejects.write(rejected)
+        repeated = int((rejected['reason'] == validation.DUPLICATE_ROW).sum())
+        inserted += added
+        duplicate += repeated + len(rows) - added
+        invalid += len(rejected) - repeated
+        assigned += members
+        rows_done += len(chunk)
+        if on_progress is not None:
+            on_progress(ImportProgress(rows_done, done, time.monotonic() - start))
+    return ImportReport(inserted, duplicate, invalid, assigned, rejects.path if rejects.used else None, cancelled)
+
+
+def import_contacts_from_csv(filename, db_file=DB_FILE, chunk_rows=IMPORT_CHUNK_ROWS,
+                             reject_dir=IMPORT_REPORTS_DIR):
+    """Insert the contacts of a file, skipping emails already present, and return how many were added."""
+    return import_contacts(filename, db_file=db_file, chunk_rows=chunk_rows, reject_dir=reject_dir).inserted
+
 
 def get_contacts_for_group(group_name):
-    conn = sqlite3.connect(DB_FILE)
-    c = conn.cursor()
+    c = db.connect(DB_FILE).cursor()
     if group_name == "All Contacts":
         c.execute("SELECT name, email FROM contacts")
     else:
@@ -47,5 +245,4 @@ def get_contacts_for_group(group_name):
             WHERE groups.name=?
         """, (group_name,))
     rows = c.fetchall()
-    conn.close()
     return pd.DataFrame(rows, columns=["name", "email"])
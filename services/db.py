@@ -1,12 +1,79 @@
 import sqlite3
 import os
+import threading
+from contextlib import contextmanager
 
-from features.common import DB_FILE, PRIVATE_DIR
+from services import history, outbox, rate_limit
+from services.config import DB_FILE, PRIVATE_DIR
 
-def init_db():
-    os.makedirs(PRIVATE_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_FILE)
+# Applied to every shared connection. WAL lets the UI read while a send
+# thread commits; NORMAL sync is safe under WAL and skips most fsyncs.
+BUSY_TIMEOUT_MS = 30000
+PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "cache_size=-65536",     # 64 MiB
+    "mmap_size=268435456",   # 256 MiB
+    f"busy_timeout={BUSY_TIMEOUT_MS}",
+)
+
+_local = threading.local()
+
+
+def connect(db_file=DB_FILE):
+    """
+    This thread's connection to db_file, opened and tuned on first use and
+    reused after that. It is in autocommit mode: group writes with
+    transaction(). Don't close it; a finished worker thread can call
+    close_connections().
+    """
+    conns = getattr(_local, "conns", None)
+    if conns is None:
+        conns = _local.conns = {}
+    conn = conns.get(db_file)
+    if conn is None:
+        conn = sqlite3.connect(db_file, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+        for pragma in PRAGMAS:
+            conn.execute(f"PRAGMA {pragma}")
+        conns[db_file] = conn
+    return conn
+
+
+@contextmanager
+def transaction(db_file=DB_FILE):
+    """
+    This thread's connection inside BEGIN IMMEDIATE ... COMMIT, rolled back
+    if the block raises. Nested inside another transaction() it joins the
+    outer one.
+    """
+    conn = connect(db_file)
+    if conn.in_transaction:
+        yield conn
+        return
+    # IMMEDIATE takes the write lock up front, so busy_timeout applies
+    # instead of failing when a read would later upgrade to a write
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def close_connections():
+    """Close this thread's shared connections."""
+    for conn in getattr(_local, "conns", {}).values():
+        conn.close()
+    _local.conns = {}
+
+
+def init_db(db_file=DB_FILE):
+    os.makedirs(os.path.dirname(db_file) or PRIVATE_DIR, exist_ok=True)
+    conn = sqlite3.connect(db_file)
     c = conn.cursor()
+    # Persistent: every later connection to the file uses WAL too
+    c.execute("PRAGMA journal_mode=WAL")
     c.execute('''
         CREATE TABLE IF NOT EXISTS groups (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -73,8 +140,66 @@ def init_db():
             contact_id INTEGER,
             timestamp TEXT,
             status TEXT,
-            error TEXT
+            error TEXT,
+            personalized_subject TEXT,
+            personalized_body TEXT,
+            ts_ms INTEGER
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sms_campaigns (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT UNIQUE NOT NULL,
+            message TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sms_campaign_contacts (
+            campaign_id INTEGER,
+            contact_id INTEGER,
+            FOREIGN KEY(campaign_id) REFERENCES sms_campaigns(id),
+            FOREIGN KEY(contact_id) REFERENCES contacts(id),
+            UNIQUE(campaign_id, contact_id)
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sms_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            body TEXT,
+            recipient TEXT,
+            status TEXT,
+            ts_ms INTEGER
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS email_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            subject TEXT,
+            body TEXT,
+            email TEXT,
+            status TEXT,
+            ts_ms INTEGER
         )
     ''')
+    # History: campaign/contact joins, status filters and per-recipient
+    # lookups (init_history_timestamps indexes ts_ms for dates and paging)
+    c.execute("CREATE INDEX IF NOT EXISTS idx_email_history_email ON email_history(email)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_email_history_status ON email_history(status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_email_campaign_history_campaign_contact ON email_campaign_history(campaign_id, contact_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_email_campaign_history_contact ON email_campaign_history(contact_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_email_campaign_history_status ON email_campaign_history(status)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sms_history_recipient ON sms_history(recipient)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sms_history_status ON sms_history(status)")
+    # Imports match emails case-insensitively against contacts saved in any case
+    c.execute("CREATE INDEX IF NOT EXISTS idx_contacts_email_lower ON contacts(lower(email))")
+    # group_members is UNIQUE(group_id, contact_id); lookups by contact need their own
+    c.execute("CREATE INDEX IF NOT EXISTS idx_group_members_contact ON group_members(contact_id)")
+    outbox.init_outbox(conn)
+    rate_limit.init_send_quota(conn)
+    history.init_history_search(conn)
+    history.init_history_timestamps(conn)
+    history.init_history_counts(conn)
     conn.commit()
     conn.close()
\ No newline at end of file
@@ -0,0 +1,126 @@
+import threading
+from collections import namedtuple
+from queue import Queue
+
+from services.rate_limit import DailyCapExceeded
+
+# One outcome per job: ok is True when send_func returned, value is what it
+# returned, error is the exception text otherwise.
+SendResult = namedtuple("SendResult", "job ok value error")
+
+_DONE = object()
+
+
+def chunked(iterable, size):
+    """Yield lists of up to `size` items, pulling from `iterable` lazily."""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class CampaignDispatcher:
+    """
+    Send a list of jobs with a pool of worker threads.
+
+    `send_func(job)` is called concurrently from `workers` threads, each call
+    first taking a token from the shared `limiter` (see services.rate_limit).
+    Results are handed to `on_result` on the thread that called run(), so
+    callers can keep a single database connection and UI update path. When the
+    limiter's daily cap is reached the remaining jobs are left unsent and
+    unreported, and `stop_reason` says why.
+
+    A job may stand for several messages (a provider bulk call); `cost(job)`
+    then gives the number of limiter tokens it spends.
+    """
+
+    def __init__(self, send_func, workers=4, limiter=None, cost=None, stop_event=None):
+        self.send_func = send_func
+        self.workers = max(1, int(workers))
+        self.limiter = limiter
+        self.cost = cost
+        self.stop_reason = None
+        # Callers may pass their own Event to stop the run from outside
+        self._stop = stop_event or threading.Event()
+
+    def stop(self):
+        """Ask workers to finish their current job and take no new ones."""
+        self._stop.set()
+
+    def _worker(self, jobs, results):
+        while True:
+            job = jobs.get()
+            if job is _DONE:
+                results.put(_DONE)
+                return
+            if self._stop.is_set():
+                continue
+            if self.limiter is not None:
+                try:
+                    self.limiter.acquire(self.cost(job) if self.cost else 1)
+                except DailyCapExceeded as e:
+                    # The job stays unsent and unreported, like any after it
+                    self.stop_reason = str(e)
+                    self.stop()
+                    continue
+            try:
+                results.put(SendResult(job, True, self.send_func(job), ""))
+            except Exception as e:
+                results.put(SendResult(job, False, None, str(e)))
+
+    def _feed(self, job_iter, jobs):
+        job_iter = iter(job_iter)
+        try:
+            for job in job_iter:
+                if self._stop.is_set():
+                    break
+                jobs.put(job)
+        finally:
+            # Finish a generator here, on the thread that has been running it
+            if hasattr(job_iter, "close"):
+                job_iter.close()
+            for _ in range(self.workers):
+                jobs.put(_DONE)
+
+    def run(self, job_iter, on_result=None):
+        """
+        Send every job and block until all workers are done. Returns the counts.
+
+        If on_result raises, the run stops: workers finish the job in hand,
+        their results still go to on_result (further errors are dropped) so
+        no sent job goes unreported, and the first error is raised once
+        every worker has exited.
+        """
+        jobs = Queue(maxsize=self.workers * 2)
+        results = Queue()
+        threads = [threading.Thread(target=self._feed, args=(job_iter, jobs), daemon=True)]
+        threads += [threading.Thread(target=self._worker, args=(jobs, results), daemon=True)
+                    for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        success = failed = 0
+        running = self.workers
+        error = None
+        while running:
+            result = results.get()
+            if result is _DONE:
+                running -= 1
+                continue
+            if result.ok:
+                success += 1
+            else:
+                failed += 1
+            if on_result:
+                try:
+                    on_result(result)
+                except BaseException as e:
+                    if error is None:
+                        error = e
+                        self.stop()
+        if error is not None:
+            raise error
+        return success, failed
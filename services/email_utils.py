@@ -1,21 +1,29 @@
 import smtplib
 from email.mime.text import MIMEText
 import requests
+import requests.adapters
+import urllib3.exceptions
 import boto3
-from botocore.exceptions import BotoCoreError, ClientError
+from botocore.config import Config as BotoConfig
+from botocore.exceptions import BotoCoreError, ClientError, ConnectTimeoutError, EndpointConnectionError
 import time
 import random
 import socket
+import threading
+import hashlib
+import json
+import re
 from requests.exceptions import RequestException, ConnectionError, Timeout
 
-def retry_with_backoff(func, max_retries=3, base_delay=1, max_delay=60):
+def retry_with_backoff(func, max_retries=3, base_delay=1, max_delay=60, retry_on=Exception):
     """
     Retry a function with exponential backoff
+    retry_on: exception type(s) worth retrying; anything else is raised at once
     """
     for attempt in range(max_retries):
         try:
             return func()
-        except Exception as e:
+        except retry_on as e:
             if attempt == max_retries - 1:  # Last attempt
                 raise e
             
@@ -25,23 +33,58 @@ def retry_with_backoff(func, max_retries=3, base_delay=1, max_delay=60):
             print(f"Retrying in {delay:.1f} seconds...")
             time.sleep(delay)
 
-def send_email_smtp(smtp_settings, sender, password, recipient, subject, body, sender_name=None):
+def normalize_method(method):
+    """Map the settings label ('SMTP', 'SendGrid', 'Amazon SES') to 'smtp', 'sendgrid' or 'ses'."""
+    method = (method or 'smtp').strip().lower()
+    return 'ses' if method in ('amazon ses', 'aws ses') else method
+
+
+# {{name}}, {{email}} and {{mobile}}, with or without spaces inside the braces
+_CONTACT_PLACEHOLDER_RE = re.compile(r"{{\s*(name|email|mobile)\s*}}")
+
+
+def personalize(text, name, email, mobile):
+    """Fill the {{name}}, {{email}} and {{mobile}} placeholders."""
+    if "{{" not in text:
+        return text
+    values = {"name": name or "", "email": email or "", "mobile": mobile or ""}
+    return _CONTACT_PLACEHOLDER_RE.sub(lambda m: values[m.group(1)], text)
+
+
+def normalize_placeholders(text):
+    """Rewrite spaced contact placeholders ({{ name }}) as {{name}}."""
+    return _CONTACT_PLACEHOLDER_RE.sub(lambda m: "{{" + m.group(1) + "}}", text)
+
+
+def build_message(sender, recipient, subject, body, sender_name=None):
+    msg = MIMEText(body)
+    msg['Subject'] = subject
+    # Format the From field with display name if provided
+    if sender_name:
+        msg['From'] = f'"{sender_name}" <{sender}>'
+    else:
+        msg['From'] = sender
+    msg['To'] = recipient
+    return msg.as_string()
+
+
+def send_email_smtp(smtp_settings, sender, password, recipient, subject, body, sender_name=None, pool=None):
+    """
+    Send one message over SMTP. When a pool from services.smtp_pool is given the
+    message goes over an already authenticated session instead of a fresh
+    connect/STARTTLS/LOGIN round trip.
+    """
+    message = build_message(sender, recipient, subject, body, sender_name)
+
     def _send():
+        if pool is not None:
+            return pool.sendmail(recipient, message)
         server = None
         try:
-            server = smtplib.SMTP(smtp_settings["server"], smtp_settings["port"])
-            server.settimeout(30)  # 30 second timeout
+            server = smtplib.SMTP(smtp_settings["server"], smtp_settings["port"], timeout=30)  # 30 second timeout
             server.starttls()
             server.login(sender, password)
-            msg = MIMEText(body)
-            msg['Subject'] = subject
-            # Format the From field with display name if provided
-            if sender_name:
-                msg['From'] = f'"{sender_name}" <{sender}>'
-            else:
-                msg['From'] = sender
-            msg['To'] = recipient
-            server.sendmail(sender, recipient, msg.as_string())
+            server.sendmail(sender, recipient, message)
             return True
         finally:
             if server:
@@ -53,46 +96,151 @@ def send_email_smtp(smtp_settings, sender, password, recipient, subject, body, s
     return retry_with_backoff(_send, max_retries=3)
 
 
+SENDGRID_URL = "https://api.sendgrid.com/v3/mail/send"
+# The v3 mail/send API accepts up to 1000 personalizations per request
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+_sendgrid_session = None
+_sendgrid_session_lock = threading.Lock()
+
+
+def get_sendgrid_session():
+    """Shared keep-alive session so sends reuse TLS connections to SendGrid."""
+    global _sendgrid_session
+    with _sendgrid_session_lock:
+        if _sendgrid_session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=32)
+            session.mount("https://", adapter)
+            _sendgrid_session = session
+        return _sendgrid_session
+
+
+class SendGridTransientError(Exception):
+    """A failure worth retrying: the request never reached SendGrid, or it answered 429 or 5xx."""
+
+
+def _never_sent(e):
+    """True when a requests error happened before any of the request was sent."""
+    if isinstance(e, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(e.args[0], "reason", None) if e.args else None
+    return isinstance(reason, (urllib3.exceptions.NewConnectionError, urllib3.exceptions.ConnectTimeoutError))
+
+
+def _sendgrid_post(api_key, data):
+    """
+    POST to mail/send. Raises SendGridTransientError when a retry is safe;
+    other failures, including a connection lost after the body was sent
+    (SendGrid may have accepted it), raise a plain Exception.
+    """
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Content-Type": "application/json"
+    }
+    try:
+        response = get_sendgrid_session().post(SENDGRID_URL, headers=headers, json=data, timeout=30)
+    except RequestException as e:
+        if _never_sent(e):
+            raise SendGridTransientError(f"SendGrid unreachable: {e}")
+        raise Exception(f"SendGrid request failed with no response: {e}")
+    if response.status_code == 429 or response.status_code >= 500:
+        raise SendGridTransientError(f"SendGrid error: {response.status_code} {response.text}")
+    if response.status_code >= 400:
+        raise Exception(f"SendGrid error: {response.status_code} {response.text}")
+    return response
+
+
+def _sendgrid_from(sender, sender_name):
+    from_field = {"email": sender}
+    if sender_name:
+        from_field["name"] = sender_name
+    return from_field
+
+
 def send_email_sendgrid(api_key, sender, recipient, subject, body, sender_name=None):
     def _send():
-        url = "https://api.sendgrid.com/v3/mail/send"
-        headers = {
-            "Authorization": f"Bearer {api_key}",
-            "Content-Type": "application/json"
-        }
-        from_field = {"email": sender}
-        if sender_name:
-            from_field["name"] = sender_name
-        
         data = {
             "personalizations": [
                 {"to": [{"email": recipient}]}
             ],
-            "from": from_field,
+            "from": _sendgrid_from(sender, sender_name),
             "subject": subject,
             "content": [
                 {"type": "text/plain", "value": body}
             ]
         }
-        
-        # Use timeout and retry-friendly session
-        response = requests.post(url, headers=headers, json=data, timeout=30)
-        if response.status_code >= 400:
-            raise Exception(f"SendGrid error: {response.status_code} {response.text}")
-        return response
+        return _sendgrid_post(api_key, data)
     
-    return retry_with_backoff(_send, max_retries=3)
+    return retry_with_backoff(_send, max_retries=3, retry_on=SendGridTransientError)
 
 
-def send_email_ses(access_key, secret_key, region, sender, recipient, subject, body, sender_name=None):
+def send_bulk_email_sendgrid(api_key, sender, recipients, subject, body, sender_name=None):
+    """
+    Send one request carrying a personalization per recipient.
+
+    recipients: list of (email, name, mobile) tuples, at most 1000
+    The {{name}}, {{email}} and {{mobile}} placeholders become substitution
+    tags. SendGrid accepts or rejects the request as a whole, so the returned
+    list of (ok, error) tuples holds the same outcome for every recipient.
+    """
+    if len(recipients) > SENDGRID_MAX_PERSONALIZATIONS:
+        raise ValueError(f"SendGrid requests take at most {SENDGRID_MAX_PERSONALIZATIONS} recipients")
+
     def _send():
-        try:
-            client = boto3.client(
-                'ses',
+        data = {
+            "personalizations": [
+                {
+                    "to": [{"email": email}],
+                    "subject": personalize(subject, name, email, mobile),
+                    "substitutions": {"{{name}}": name or "", "{{email}}": email or "", "{{mobile}}": mobile or ""},
+                }
+                for email, name, mobile in recipients
+            ],
+            "from": _sendgrid_from(sender, sender_name),
+            "content": [
+                # Substitution tags match exactly, so spell them one way
+                {"type": "text/plain", "value": normalize_placeholders(body)}
+            ]
+        }
+        return _sendgrid_post(api_key, data)
+
+    retry_with_backoff(_send, max_retries=3, retry_on=SendGridTransientError)
+    return [(True, "")] * len(recipients)
+
+
+_ses_clients = {}
+_ses_clients_lock = threading.Lock()
+
+
+def get_ses_client(access_key, secret_key, region):
+    """
+    Return the SES client for (access key, region), building it once.
+
+    Client construction loads the botocore service model, so it is done on
+    first use only. boto3 clients are thread-safe and are shared by all workers.
+    """
+    key = (access_key, region)
+    with _ses_clients_lock:
+        cached = _ses_clients.get(key)
+        if cached is None or cached[0] != secret_key:
+            session = boto3.session.Session(
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
                 region_name=region
             )
+            # No botocore retries: it would resend after a read timeout, when SES
+            # may have accepted the call; senders retry what is safe themselves
+            client = session.client('ses', config=BotoConfig(max_pool_connections=32,
+                                                             retries={'total_max_attempts': 1}))
+            cached = (secret_key, client)
+            _ses_clients[key] = cached
+        return cached[1]
+
+
+def send_email_ses(access_key, secret_key, region, sender, recipient, subject, body, sender_name=None):
+    def _send():
+        try:
+            client = get_ses_client(access_key, secret_key, region)
             # Format the Source field with display name if provided
             source = f'"{sender_name}" <{sender}>' if sender_name else sender
             
@@ -111,15 +259,143 @@ def send_email_ses(access_key, secret_key, region, sender, recipient, subject, b
     return retry_with_backoff(_send, max_retries=3)
 
 
-def send_email(method, settings, sender, password, recipient, subject, body, sender_name=None):
+# SendBulkTemplatedEmail accepts at most 50 destinations per call
+SES_BULK_MAX_DESTINATIONS = 50
+CONTACT_PLACEHOLDERS = {"name", "email", "mobile"}
+_PLACEHOLDER_RE = re.compile(r"{{\s*([^{}]*?)\s*}}")
+# (access key, region, template name) of templates known to exist
+_ses_templates = set()
+_ses_templates_lock = threading.Lock()
+# Error codes of SES calls that were refused before anything was sent
+SES_THROTTLING_CODES = {"Throttling", "ThrottlingException", "TooManyRequestsException", "RequestThrottled"}
+
+
+class SESTransientError(Exception):
+    """A failure worth retrying: throttling, a 5xx, a failed connect or a template deleted under the send."""
+
+
+def _ses_error(e):
+    """Wrap a boto error from a bulk send as SESTransientError when a resend is safe."""
+    if isinstance(e, (EndpointConnectionError, ConnectTimeoutError)):
+        return SESTransientError(f"SES unreachable: {e}")
+    if isinstance(e, ClientError):
+        code = e.response.get('Error', {}).get('Code')
+        status = e.response.get('ResponseMetadata', {}).get('HTTPStatusCode') or 0
+        if code in SES_THROTTLING_CODES or code == 'TemplateDoesNotExist' or status >= 500:
+            return SESTransientError(f"SES error: {e}")
+    return Exception(f"SES error: {e}")
+
+
+def uses_only_contact_placeholders(*texts):
+    """True when every {{...}} in the texts is one of {{name}}, {{email}} or {{mobile}}."""
+    return all(set(_PLACEHOLDER_RE.findall(text or "")) <= CONTACT_PLACEHOLDERS for text in texts)
+
+
+def ses_template_name(subject, body):
+    """Name of the SES template for this subject/body, derived from the content."""
+    return "messagehub-" + hashlib.sha1(f"{subject}\0{body}".encode("utf-8")).hexdigest()[:20]
+
+
+def ensure_ses_template(client, access_key, region, subject, body):
+    """
+    Create an SES template for this subject/body and return its name. The name
+    is derived from the content, so an edited campaign gets a new template;
+    delete_ses_template() removes it once the send is over.
+    """
+    # Triple braces stop Handlebars from HTML-escaping names like "Tom & Jerry"
+    to_template = lambda text: _PLACEHOLDER_RE.sub(lambda m: "{{{" + m.group(1) + "}}}", text)
+    name = ses_template_name(subject, body)
+    key = (access_key, region, name)
+    with _ses_templates_lock:
+        if key in _ses_templates:
+            return name
+    try:
+        client.create_template(Template={
+            'TemplateName': name,
+            'SubjectPart': to_template(subject),
+            'TextPart': to_template(body),
+        })
+    except ClientError as e:
+        if e.response.get('Error', {}).get('Code') != 'AlreadyExists':
+            raise
+    with _ses_templates_lock:
+        _ses_templates.add(key)
+    return name
+
+
+def delete_ses_template(access_key, secret_key, region, subject, body):
+    """
+    Delete the template of this subject/body, if this process created or
+    used it, so finished sends don't use up the account's template quota.
+    A send still using it recreates it.
+    """
+    name = ses_template_name(subject, body)
+    with _ses_templates_lock:
+        if (access_key, region, name) not in _ses_templates:
+            return
+        _ses_templates.discard((access_key, region, name))
+    try:
+        get_ses_client(access_key, secret_key, region).delete_template(TemplateName=name)
+    except (BotoCoreError, ClientError) as e:
+        print(f"Could not delete SES template {name}: {e}")
+
+
+def send_bulk_email_ses(access_key, secret_key, region, sender, recipients, subject, body, sender_name=None):
+    """
+    Send one templated message to up to 50 recipients in a single API call.
+
+    recipients: list of (email, name, mobile) tuples
+    Returns a list of (ok, error) tuples in the same order as recipients.
+    """
+    if len(recipients) > SES_BULK_MAX_DESTINATIONS:
+        raise ValueError(f"SES bulk sends take at most {SES_BULK_MAX_DESTINATIONS} recipients")
+
+    def _send():
+        try:
+            client = get_ses_client(access_key, secret_key, region)
+            template = ensure_ses_template(client, access_key, region, subject, body)
+            source = f'"{sender_name}" <{sender}>' if sender_name else sender
+            return client.send_bulk_templated_email(
+                Source=source,
+                Template=template,
+                DefaultTemplateData=json.dumps({"name": "", "email": "", "mobile": ""}),
+                Destinations=[
+                    {
+                        'Destination': {'ToAddresses': [email]},
+                        'ReplacementTemplateData': json.dumps({"name": name or "", "email": email or "", "mobile": mobile or ""}),
+                    }
+                    for email, name, mobile in recipients
+                ]
+            )
+        except (BotoCoreError, ClientError) as e:
+            if isinstance(e, ClientError) and e.response.get('Error', {}).get('Code') == 'TemplateDoesNotExist':
+                # Deleted by a send that finished first; the retry creates it again
+                with _ses_templates_lock:
+                    _ses_templates.discard((access_key, region, ses_template_name(subject, body)))
+            raise _ses_error(e)
+
+    # Only retried when SES refused the call; a timeout or dropped connection
+    # may follow an accepted batch, and resending would duplicate it
+    response = retry_with_backoff(_send, max_retries=3, retry_on=SESTransientError)
+    results = []
+    for status in response.get('Status', []):
+        if status.get('Status') == 'Success':
+            results.append((True, ""))
+        else:
+            results.append((False, f"SES {status.get('Status')}: {status.get('Error', '')}"))
+    return results
+
+
+def send_email(method, settings, sender, password, recipient, subject, body, sender_name=None, pool=None):
     """
     method: 'smtp', 'sendgrid', or 'ses'
     settings: dict with relevant keys for the method
     sender_name: optional display name for the sender
+    pool: optional SMTPConnectionPool to send SMTP messages through
     """
     try:
         if method == 'smtp':
-            return send_email_smtp(settings, sender, password, recipient, subject, body, sender_name)
+            return send_email_smtp(settings, sender, password, recipient, subject, body, sender_name, pool=pool)
         elif method == 'sendgrid':
             return send_email_sendgrid(settings['sendgrid_api_key'], sender, recipient, subject, body, sender_name)
         elif method == 'ses':
@@ -142,7 +418,7 @@ def check_internet_connection():
     except OSError:
         return False
 
-def send_email_with_connection_check(method, settings, sender, password, recipient, subject, body, sender_name=None):
+def send_email_with_connection_check(method, settings, sender, password, recipient, subject, body, sender_name=None, pool=None):
     """
     Send email with internet connection check
     """
@@ -161,4 +437,4 @@ def send_email_with_connection_check(method, settings, sender, password, recipie
             raise Exception("No internet connection available after 5 minutes of waiting")
     
     # Proceed with sending email
-    return send_email(method, settings, sender, password, recipient, subject, body, sender_name)
\ No newline at end of file
+    return send_email(method, settings, sender, password, recipient, subject, body, sender_name, pool=pool)
\ No newline at end of file
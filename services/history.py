@@ -0,0 +1,393 @@
+import re
+import sys
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from services import db
+from services.config import DB_FILE
+
+EMAIL_COLUMNS = ("Timestamp", "Recipient", "Subject", "Body", "Status", "Type")
+SMS_COLUMNS = ("Timestamp", "Recipient", "Body", "Status")
+# Rows per page when browsing without search text
+PAGE_SIZE = 500
+# Best-ranked matches shown for a search
+SEARCH_LIMIT = 500
+
+# History tables per channel; rows of the email tables are told apart in
+# page keys by their position here ("src")
+CHANNEL_TABLES = {
+    "email": ("email_history", "email_campaign_history"),
+    "sms": ("sms_history",),
+}
+
+# How each table's text timestamp was written: campaign rows by SQLite's
+# datetime('now') in UTC, the others by datetime.now().isoformat() in local
+# time. ts_ms, derived from it, is what history sorts and filters on.
+TIMESTAMP_ZONES = {
+    "email_history": "local",
+    "email_campaign_history": "utc",
+    "sms_history": "local",
+}
+
+# entries: (display row, full body) newest first; first/last: keys
+# (ts_ms, src, id) of the first and last entry, for paging
+HistoryPage = namedtuple("HistoryPage", "entries first last has_older has_newer")
+
+
+def init_history_counts(conn):
+    """Row counts of the history tables, maintained by triggers so totals never need COUNT(*)."""
+    c = conn.cursor()
+    c.execute("CREATE TABLE IF NOT EXISTS history_counts (table_name TEXT PRIMARY KEY, total INTEGER NOT NULL)")
+    for tables in CHANNEL_TABLES.values():
+        for table in tables:
+            c.execute(f"INSERT OR IGNORE INTO history_counts (table_name, total) SELECT ?, COUNT(*) FROM {table}",
+                      (table,))
+            c.executescript(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_count_ai AFTER INSERT ON {table} BEGIN
+                    UPDATE history_counts SET total = total + 1 WHERE table_name = '{table}';
+                END;
+                CREATE TRIGGER IF NOT EXISTS {table}_count_ad AFTER DELETE ON {table} BEGIN
+                    UPDATE history_counts SET total = total - 1 WHERE table_name = '{table}';
+                END;
+            """)
+
+
+def now_ms():
+    """The current time as stored in ts_ms: UTC epoch milliseconds."""
+    return int(time.time() * 1000)
+
+
+def _epoch_ms_sql(column, zone):
+    """
+    SQL turning a text timestamp written in `zone` into UTC epoch
+    milliseconds; 0 (sorting oldest) when it cannot be parsed.
+    """
+    modifier = ", 'utc'" if zone == "local" else ""
+    return f"COALESCE(CAST(ROUND((julianday({column}{modifier}) - 2440587.5) * 86400000) AS INTEGER), 0)"
+
+
+def init_history_timestamps(conn):
+    """
+    ts_ms (UTC epoch milliseconds) on every history table, indexed so date
+    filters and paging are numeric range scans. Older databases get the
+    column filled from their text timestamps; rows written without ts_ms
+    get it from a trigger.
+    """
+    c = conn.cursor()
+    for table, zone in TIMESTAMP_ZONES.items():
+        columns = [row[1] for row in c.execute(f"PRAGMA table_info({table})")]
+        if "ts_ms" not in columns:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN ts_ms INTEGER")
+            c.execute(f"UPDATE {table} SET ts_ms = {_epoch_ms_sql('timestamp', zone)}")
+        c.executescript(f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_ts_ms_ai AFTER INSERT ON {table} WHEN new.ts_ms IS NULL BEGIN
+                UPDATE {table} SET ts_ms = {_epoch_ms_sql('new.timestamp', zone)} WHERE id = new.id;
+            END;
+        """)
+        c.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_ts_ms ON {table}(ts_ms)")
+        # Superseded by the ts_ms index
+        c.execute(f"DROP INDEX IF EXISTS idx_{table}_timestamp")
+
+
+def _create_fts(c, name, sql):
+    """Create an FTS table; returns True when it is new and needs filling."""
+    exists = c.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)).fetchone()
+    c.execute(sql)
+    return not exists
+
+
+def init_history_search(conn):
+    """
+    Full-text indexes over the history tables, kept in sync by triggers.
+
+    email_history and sms_history are indexed as external content (the FTS
+    table stores only the index). Campaign rows take their recipient and
+    body from the contact and campaign at send time, so their index keeps
+    its own copy of that text.
+    """
+    c = conn.cursor()
+    if _create_fts(c, "email_history_fts", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS email_history_fts USING fts5(
+            email, subject, body, status, content='email_history', content_rowid='id', prefix='2 3'
+        )
+    """):
+        c.execute("INSERT INTO email_history_fts(email_history_fts) VALUES ('rebuild')")
+    # Update triggers only fire for indexed columns, so filling in ts_ms
+    # leaves the indexes alone; replace ones created before that
+    for name, in c.execute("SELECT name FROM sqlite_master WHERE type='trigger' "
+                           "AND name LIKE '%_fts_au' AND sql LIKE '%AFTER UPDATE ON%'").fetchall():
+        c.execute(f"DROP TRIGGER {name}")
+    c.executescript("""
+        CREATE TRIGGER IF NOT EXISTS email_history_fts_ai AFTER INSERT ON email_history BEGIN
+            INSERT INTO email_history_fts(rowid, email, subject, body, status)
+            VALUES (new.id, new.email, new.subject, new.body, new.status);
+        END;
+        CREATE TRIGGER IF NOT EXISTS email_history_fts_ad AFTER DELETE ON email_history BEGIN
+            INSERT INTO email_history_fts(email_history_fts, rowid, email, subject, body, status)
+            VALUES ('delete', old.id, old.email, old.subject, old.body, old.status);
+        END;
+        CREATE TRIGGER IF NOT EXISTS email_history_fts_au AFTER UPDATE OF email, subject, body, status ON email_history BEGIN
+            INSERT INTO email_history_fts(email_history_fts, rowid, email, subject, body, status)
+            VALUES ('delete', old.id, old.email, old.subject, old.body, old.status);
+            INSERT INTO email_history_fts(rowid, email, subject, body, status)
+            VALUES (new.id, new.email, new.subject, new.body, new.status);
+        END;
+    """)
+
+    if _create_fts(c, "sms_history_fts", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS sms_history_fts USING fts5(
+            recipient, body, status, content='sms_history', content_rowid='id', prefix='2 3'
+        )
+    """):
+        c.execute("INSERT INTO sms_history_fts(sms_history_fts) VALUES ('rebuild')")
+    c.executescript("""
+        CREATE TRIGGER IF NOT EXISTS sms_history_fts_ai AFTER INSERT ON sms_history BEGIN
+            INSERT INTO sms_history_fts(rowid, recipient, body, status)
+            VALUES (new.id, new.recipient, new.body, new.status);
+        END;
+        CREATE TRIGGER IF NOT EXISTS sms_history_fts_ad AFTER DELETE ON sms_history BEGIN
+            INSERT INTO sms_history_fts(sms_history_fts, rowid, recipient, body, status)
+            VALUES ('delete', old.id, old.recipient, old.body, old.status);
+        END;
+        CREATE TRIGGER IF NOT EXISTS sms_history_fts_au AFTER UPDATE OF recipient, body, status ON sms_history BEGIN
+            INSERT INTO sms_history_fts(sms_history_fts, rowid, recipient, body, status)
+            VALUES ('delete', old.id, old.recipient, old.body, old.status);
+            INSERT INTO sms_history_fts(rowid, recipient, body, status)
+            VALUES (new.id, new.recipient, new.body, new.status);
+        END;
+    """)
+
+    campaign_row = """
+        SELECT h.id, ct.email, c.name, h.personalized_subject, COALESCE(h.personalized_body, c.body), h.status
+        FROM email_campaign_history h
+        LEFT JOIN email_campaigns c ON h.campaign_id = c.id
+        LEFT JOIN contacts ct ON h.contact_id = ct.id
+    """
+    if _create_fts(c, "email_campaign_history_fts", """
+        CREATE VIRTUAL TABLE IF NOT EXISTS email_campaign_history_fts USING fts5(
+            recipient, campaign, subject, body, status, prefix='2 3'
+        )
+    """):
+        c.execute("INSERT INTO email_campaign_history_fts(rowid, recipient, campaign, subject, body, status) "
+                  + campaign_row)
+    c.executescript(f"""
+        CREATE TRIGGER IF NOT EXISTS email_campaign_history_fts_ai AFTER INSERT ON email_campaign_history BEGIN
+            INSERT INTO email_campaign_history_fts(rowid, recipient, campaign, subject, body, status)
+            {campaign_row} WHERE h.id = new.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS email_campaign_history_fts_ad AFTER DELETE ON email_campaign_history BEGIN
+            DELETE FROM email_campaign_history_fts WHERE rowid = old.id;
+        END;
+        CREATE TRIGGER IF NOT EXISTS email_campaign_history_fts_au
+            AFTER UPDATE OF campaign_id, contact_id, personalized_subject, personalized_body, status
+            ON email_campaign_history BEGIN
+            DELETE FROM email_campaign_history_fts WHERE rowid = old.id;
+            INSERT INTO email_campaign_history_fts(rowid, recipient, campaign, subject, body, status)
+            {campaign_row} WHERE h.id = new.id;
+        END;
+    """)
+
+
+def match_expression(query):
+    """
+    FTS5 MATCH text for what the user typed: every word must appear, each
+    as a prefix ("ali exa" finds alice@example.com). None when the query
+    has no searchable words.
+    """
+    words = re.findall(r"\w+", query.lower())
+    return " ".join(f'"{word}"*' for word in words) or None
+
+
+def parse_date_range(from_str, to_str):
+    """
+    (from, to) ts_ms bounds for local "YYYY-MM-DD HH:MM" strings, both
+    inclusive (to covers its whole minute); None if either is invalid.
+    """
+    try:
+        from_dt = datetime.strptime(from_str, "%Y-%m-%d %H:%M")
+        to_dt = datetime.strptime(to_str, "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+    return int(from_dt.timestamp() * 1000), int((to_dt + timedelta(minutes=1)).timestamp() * 1000) - 1
+
+
+def format_ms(ts_ms):
+    """A ts_ms value as local "YYYY-MM-DD HH:MM:SS" for display."""
+    if ts_ms is None:
+        return ""
+    return datetime.fromtimestamp(ts_ms / 1000).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _preview(body):
+    # Truncate body for list view
+    return (body[:50] + "...") if body and len(body) > 50 else (body or "")
+
+
+def _date_clause(dates, column="ts_ms"):
+    if dates is None:
+        return "", []
+    return f" AND {column} BETWEEN ? AND ?", list(dates)
+
+
+def _email_entry(ts_ms, email, subject, body, status, kind):
+    """A history entry: (values shown in the list, full body)."""
+    return (format_ms(ts_ms), email, subject, _preview(body), status, kind), body
+
+
+def _entry(channel, ts_ms, recipient, subject, body, status, src):
+    if channel == "sms":
+        return (format_ms(ts_ms), recipient, _preview(body), status), body
+    if src == 0:
+        return _email_entry(ts_ms, recipient, subject, body, status, "Direct")
+    return _email_entry(ts_ms, recipient, f"Campaign: {subject}", body, status, "Campaign")
+
+
+# One SELECT per history table giving
+# (ts_ms, recipient, subject, body, status, src, id)
+_PAGE_SOURCES = {
+    "email_history": ("SELECT ts_ms, email, subject, body, status, {src}, id FROM email_history",
+                      "ts_ms", "id"),
+    "email_campaign_history": ("""
+        SELECT h.ts_ms, ct.email, c.name, COALESCE(h.personalized_body, c.body), h.status, {src}, h.id
+        FROM email_campaign_history h
+        LEFT JOIN email_campaigns c ON h.campaign_id = c.id
+        LEFT JOIN contacts ct ON h.contact_id = ct.id""", "h.ts_ms", "h.id"),
+    "sms_history": ("SELECT ts_ms, recipient, NULL, body, status, {src}, id FROM sms_history",
+                    "ts_ms", "id"),
+}
+
+
+def _keyset(src, cursor, older, ts_col, id_col):
+    """
+    WHERE clause of one source for rows past `cursor` in page order
+    (ts_ms, src, id), phrased as (ts_ms, id) so the ts_ms index can seek
+    to it.
+    """
+    ts, cursor_src, cursor_id = cursor
+    if src == cursor_src:
+        bound = cursor_id
+    elif (src < cursor_src) == older:
+        # Rows at the cursor's timestamp are all past it
+        bound = sys.maxsize if older else -1
+    else:
+        # Rows at the cursor's timestamp all come before it
+        bound = -1 if older else sys.maxsize
+    return f"({ts_col}, {id_col}) {'<' if older else '>'} (?, ?)", [ts, bound]
+
+
+def history_page(channel, dates=None, before=None, after=None, page_size=PAGE_SIZE, db_file=DB_FILE):
+    """
+    One page of a channel's history, newest first, merging its tables in a
+    single UNION ALL. Pass the previous page's `last` as `before` for the
+    next older page, or its `first` as `after` for the next newer one.
+    Pages are found by keyset (ts_ms, src, id), so any page costs an
+    index seek plus page_size rows however deep it is.
+    """
+    older = after is None
+    cursor = before if older else after
+    direction = "DESC" if older else "ASC"
+    selects, params = [], []
+    for src, table in enumerate(CHANNEL_TABLES[channel]):
+        sql, ts_col, id_col = _PAGE_SOURCES[table]
+        conditions, branch_params = [], []
+        if dates is not None:
+            conditions.append(f"{ts_col} BETWEEN ? AND ?")
+            branch_params += list(dates)
+        if cursor is not None:
+            condition, keyset_params = _keyset(src, cursor, older, ts_col, id_col)
+            conditions.append(condition)
+            branch_params += keyset_params
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+        selects.append(f"SELECT * FROM ({sql.format(src=src)}{where} "
+                       f"ORDER BY {ts_col} {direction}, {id_col} {direction} LIMIT ?)")
+        params += branch_params + [page_size + 1]
+    conn = db.connect(db_file)
+    rows = conn.execute(
+        " UNION ALL ".join(selects) + f" ORDER BY 1 {direction}, 6 {direction}, 7 {direction} LIMIT ?",
+        params + [page_size + 1]
+    ).fetchall()
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if not older:
+        if not more:
+            # Reached the newest rows: show a full first page instead
+            return history_page(channel, dates, page_size=page_size, db_file=db_file)
+        rows.reverse()
+    return HistoryPage(
+        entries=[_entry(channel, *row[:6]) for row in rows],
+        first=(rows[0][0], rows[0][5], rows[0][6]) if rows else None,
+        last=(rows[-1][0], rows[-1][5], rows[-1][6]) if rows else None,
+        has_older=more if older else True,
+        has_newer=cursor is not None if older else True,
+    )
+
+
+def history_total(channel, dates=None, db_file=DB_FILE):
+    """Rows in a channel's history; from the maintained counters unless a date range is given."""
+    tables = CHANNEL_TABLES[channel]
+    conn = db.connect(db_file)
+    if dates is None:
+        placeholders = ",".join("?" * len(tables))
+        return conn.execute(f"SELECT COALESCE(SUM(total), 0) FROM history_counts WHERE table_name IN ({placeholders})",
+                            tables).fetchone()[0]
+    return sum(conn.execute(f"SELECT COUNT(*) FROM {table} WHERE ts_ms BETWEEN ? AND ?", dates).fetchone()[0]
+               for table in tables)
+
+
+def email_history(query="", dates=None, db_file=DB_FILE, limit=None):
+    """
+    Direct and campaign email history entries. With a query, the best
+    `limit` full-text matches on recipient, subject/campaign, body or
+    status, best first; without, the newest page.
+    """
+    if not query:
+        return history_page("email", dates, page_size=limit or PAGE_SIZE, db_file=db_file).entries
+    limit = limit or SEARCH_LIMIT
+    match = match_expression(query)
+    if match is None:
+        return []
+    date_conditions, date_params = _date_clause(dates, "h.ts_ms")
+    conn = db.connect(db_file)
+    c = conn.cursor()
+    c.execute(f"""
+        SELECT f.rank, h.ts_ms, h.email, h.subject, h.body, h.status
+        FROM email_history_fts f JOIN email_history h ON h.id = f.rowid
+        WHERE email_history_fts MATCH ?{date_conditions}
+        ORDER BY f.rank LIMIT ?
+    """, [match] + date_params + [limit])
+    ranked = [(row[0], _email_entry(*row[1:], "Direct")) for row in c.fetchall()]
+    c.execute(f"""
+        SELECT f.rank, h.ts_ms, ct.email, c.name,
+               COALESCE(h.personalized_body, c.body) as body_content, h.status
+        FROM email_campaign_history_fts f
+        JOIN email_campaign_history h ON h.id = f.rowid
+        LEFT JOIN email_campaigns c ON h.campaign_id = c.id
+        LEFT JOIN contacts ct ON h.contact_id = ct.id
+        WHERE email_campaign_history_fts MATCH ?{date_conditions}
+        ORDER BY f.rank LIMIT ?
+    """, [match] + date_params + [limit])
+    for rank, ts_ms, email, campaign_name, body, status in c.fetchall():
+        ranked.append((rank, _email_entry(ts_ms, email, f"Campaign: {campaign_name}", body, status, "Campaign")))
+    # bm25 rank: lower is better
+    ranked.sort(key=lambda item: item[0])
+    return [entry for _, entry in ranked[:limit]]
+
+
+def sms_history(query="", dates=None, db_file=DB_FILE, limit=None):
+    """SMS history entries, searched and paged like email_history()."""
+    if not query:
+        return history_page("sms", dates, page_size=limit or PAGE_SIZE, db_file=db_file).entries
+    limit = limit or SEARCH_LIMIT
+    match = match_expression(query)
+    if match is None:
+        return []
+    date_conditions, date_params = _date_clause(dates, "h.ts_ms")
+    conn = db.connect(db_file)
+    rows = conn.execute(f"""
+        SELECT h.ts_ms, h.recipient, h.body, h.status
+        FROM sms_history_fts f JOIN sms_history h ON h.id = f.rowid
+        WHERE sms_history_fts MATCH ?{date_conditions}
+        ORDER BY f.rank LIMIT ?
+    """, [match] + date_params + [limit]).fetchall()
+    return [_entry("sms", ts_ms, recipient, None, body, status, 0) for ts_ms, recipient, body, status in rows]
@@ -0,0 +1,141 @@
+import atexit
+import threading
+import weakref
+from datetime import datetime, timezone
+
+from services import db, email_utils, history, outbox
+from services.config import DB_FILE
+
+# Writers still open at interpreter exit; flushed by _close_all
+_open = weakref.WeakSet()
+
+EMAIL_SQL = ("INSERT INTO email_campaign_history (campaign_id, contact_id, timestamp, ts_ms, status, error, "
+             "personalized_subject, personalized_body) VALUES (?, ?, ?, ?, ?, ?, ?, ?)")
+SMS_SQL = "INSERT INTO sms_history (timestamp, ts_ms, body, recipient, status) VALUES (?, ?, ?, ?, ?)"
+
+
+class HistoryWriter:
+    """
+    Write-behind log of one outbox run's send results.
+
+    email_result() and sms_result() only append to a buffer; a background
+    thread writes the history rows and settles their outbox rows with
+    executemany in one transaction, once `max_rows` results are waiting or
+    the oldest has waited `max_delay_ms`. close() writes what is left.
+
+    A result is durable only once flushed, and its outbox row stays
+    in-flight until then: after a crash Outbox.recover() fails the unflushed
+    recipients as interrupted instead of sending them again. Close the
+    writer before Outbox.release(), which would otherwise return them to
+    pending.
+    """
+
+    def __init__(self, run_id, db_file=DB_FILE, max_rows=500, max_delay_ms=250):
+        self.run_id = run_id
+        self.db_file = db_file
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self.error = None
+        self._pending = []
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        _open.add(self)
+
+    def email_result(self, campaign_id, contact, subject, body, ok, error):
+        """Queue the history row and outbox outcome of one email recipient."""
+        self._add(('email', datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'), history.now_ms(),
+                   campaign_id, contact, subject, body, ok, error))
+
+    def sms_result(self, contact_id, mobile, message, ok, error):
+        """Queue the sms_history row and outbox outcome of one SMS recipient."""
+        self._add(('sms', datetime.now().isoformat(), history.now_ms(),
+                   contact_id, mobile, message, ok, error))
+
+    def _add(self, record):
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("HistoryWriter is closed")
+            self._pending.append(record)
+            if len(self._pending) == 1 or len(self._pending) >= self.max_rows:
+                self._cond.notify()
+
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._closed or self._pending)
+                    # Give the batch up to max_delay to fill
+                    self._cond.wait_for(lambda: self._closed or len(self._pending) >= self.max_rows,
+                                        self.max_delay)
+                    batch, closed = self._pending, self._closed
+                    self._pending = []
+                try:
+                    self._write(batch)
+                except Exception as e:
+                    # Keep the results and retry with the next batch; close()
+                    # reports the error if they never make it
+                    self.error = e
+                    with self._cond:
+                        self._pending[:0] = batch
+                    if closed:
+                        return
+                    continue
+                self.error = None
+                if closed:
+                    return
+        finally:
+            db.close_connections()
+
+    def _write(self, batch):
+        if not batch:
+            return
+        email_rows, sms_rows, settled = [], [], []
+        for record in batch:
+            if record[0] == 'email':
+                _, stamp, ts_ms, campaign_id, contact, subject, body, ok, error = record
+                cid, cname, cemail, cmobile = contact
+                email_rows.append((campaign_id, cid, stamp, ts_ms, 'Sent' if ok else 'Failed', '' if ok else error,
+                                   email_utils.personalize(subject, cname, cemail, cmobile),
+                                   email_utils.personalize(body, cname, cemail, cmobile)))
+            else:
+                _, stamp, ts_ms, cid, mobile, message, ok, error = record
+                sms_rows.append((stamp, ts_ms, message, mobile, "Sent" if ok else f"Failed: {error}"))
+            settled.append((cid, ok, error))
+        with db.transaction(self.db_file) as conn:
+            if email_rows:
+                conn.executemany(EMAIL_SQL, email_rows)
+            if sms_rows:
+                conn.executemany(SMS_SQL, sms_rows)
+            outbox.settle_many(conn, self.run_id, settled)
+
+    def close(self, timeout=None):
+        """
+        Write every queued result and stop the thread. Raises the last write
+        error if some results could not be written; their outbox rows are
+        left in-flight.
+        """
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join(timeout)
+        _open.discard(self)
+        if self._pending or self._thread.is_alive():
+            raise self.error or RuntimeError("HistoryWriter did not finish writing")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+@atexit.register
+def _close_all():
+    # Send threads are daemons; write what they reported before the process goes
+    for writer in list(_open):
+        try:
+            writer.close(timeout=5)
+        except Exception:
+            pass
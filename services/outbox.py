@@ -0,0 +1,217 @@
+import json
+import time
+import uuid
+from datetime import datetime
+
+from services import db
+from services.config import DB_FILE
+
+# Outbox row states. A row is leased by moving it to IN_FLIGHT with a
+# lease_until deadline and the lease_owner of the Outbox that took it; the sender then settles it as SENT or FAILED in the
+# same transaction that writes its history row.
+PENDING = 'pending'
+IN_FLIGHT = 'in-flight'
+SENT = 'sent'
+FAILED = 'failed'
+
+INTERRUPTED_ERROR = "Interrupted before delivery was confirmed"
+
+
+def init_outbox(conn):
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            channel TEXT NOT NULL,
+            campaign_name TEXT,
+            payload TEXT,
+            created_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS send_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            run_id INTEGER NOT NULL,
+            contact_id INTEGER NOT NULL,
+            state TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_until REAL,
+            lease_owner TEXT,
+            last_error TEXT,
+            FOREIGN KEY(run_id) REFERENCES outbox_runs(id),
+            UNIQUE(run_id, contact_id)
+        )
+    ''')
+    if "lease_owner" not in [row[1] for row in c.execute("PRAGMA table_info(send_outbox)")]:
+        c.execute("ALTER TABLE send_outbox ADD COLUMN lease_owner TEXT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_send_outbox_run_state ON send_outbox(run_id, state, id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_outbox_runs_open ON outbox_runs(channel, campaign_name, finished_at)")
+
+
+# Database files whose outbox tables are known to exist
+_ready = set()
+
+
+def _connect(db_file):
+    conn = db.connect(db_file)
+    if db_file not in _ready:
+        init_outbox(conn)
+        _ready.add(db_file)
+    return conn
+
+
+def _transaction(db_file):
+    _connect(db_file)
+    return db.transaction(db_file)
+
+
+_SETTLE_SQL = "UPDATE send_outbox SET state=?, last_error=?, lease_until=NULL, lease_owner=NULL WHERE run_id=? AND contact_id=?"
+
+
+def settle(cursor, run_id, contact_id, ok, error=""):
+    """
+    Record a send outcome on the caller's cursor without committing, so it
+    lands in the same transaction as the matching history row.
+    """
+    cursor.execute(_SETTLE_SQL, (SENT if ok else FAILED, "" if ok else error, run_id, contact_id))
+
+
+def settle_many(cursor, run_id, outcomes):
+    """settle() for many (contact_id, ok, error) outcomes in one executemany."""
+    cursor.executemany(_SETTLE_SQL, ((SENT if ok else FAILED, "" if ok else error, run_id, contact_id)
+                                     for contact_id, ok, error in outcomes))
+
+
+class Outbox:
+    """
+    Persistent per-recipient queue for one campaign send ("run").
+
+    Recipients are leased in small batches as the dispatcher asks for work,
+    so a run interrupted by a crash or by closing the app keeps every
+    unleased recipient pending. Rows whose lease ran out without an outcome
+    were handed to the provider with no confirmation; they are marked failed
+    on resume instead of being sent again, so resuming never duplicates a
+    message.
+
+    Each Outbox object leases under its own owner token. release() only
+    returns that owner's leases, so a run resumed while the leases of a
+    crashed process are still live leaves them in-flight until recover()
+    fails them.
+    """
+
+    def __init__(self, run_id, db_file=DB_FILE, lease_seconds=300):
+        self.run_id = run_id
+        self.db_file = db_file
+        self.lease_seconds = lease_seconds
+        self.owner = uuid.uuid4().hex
+
+    @classmethod
+    def create(cls, channel, campaign_name, contact_ids, payload=None, db_file=DB_FILE):
+        with _transaction(db_file) as conn:
+            c = conn.cursor()
+            c.execute(
+                "INSERT INTO outbox_runs (channel, campaign_name, payload, created_at) VALUES (?, ?, ?, ?)",
+                (channel, campaign_name, json.dumps(payload or {}), datetime.now().isoformat())
+            )
+            run_id = c.lastrowid
+            c.executemany(
+                "INSERT OR IGNORE INTO send_outbox (run_id, contact_id) VALUES (?, ?)",
+                ((run_id, cid) for cid in contact_ids)
+            )
+        return cls(run_id, db_file)
+
+    @classmethod
+    def find_unfinished(cls, channel, campaign_name, db_file=DB_FILE):
+        """Return the latest unfinished run of this campaign, or None."""
+        row = _connect(db_file).execute(
+            "SELECT id FROM outbox_runs WHERE channel=? AND campaign_name=? AND finished_at IS NULL "
+            "ORDER BY id DESC LIMIT 1",
+            (channel, campaign_name)
+        ).fetchone()
+        return cls(row[0], db_file) if row else None
+
+    @property
+    def payload(self):
+        row = _connect(self.db_file).execute("SELECT payload FROM outbox_runs WHERE id=?", (self.run_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else {}
+
+    def recover(self):
+        """Fail rows whose lease expired without an outcome. Returns how many."""
+        with _transaction(self.db_file) as conn:
+            cur = conn.execute(
+                "UPDATE send_outbox SET state=?, last_error=?, lease_until=NULL, lease_owner=NULL "
+                "WHERE run_id=? AND state=? AND lease_until < ?",
+                (FAILED, INTERRUPTED_ERROR, self.run_id, IN_FLIGHT, time.time())
+            )
+            return cur.rowcount
+
+    def release(self):
+        """
+        Return the unsettled leases this Outbox took to pending. Only call
+        once every worker has stopped, when no leased row can still be in a
+        provider call. Leases of other owners are left for recover().
+        """
+        with _transaction(self.db_file) as conn:
+            conn.execute(
+                "UPDATE send_outbox SET state=?, lease_until=NULL, lease_owner=NULL "
+                "WHERE run_id=? AND state=? AND lease_owner=?",
+                (PENDING, self.run_id, IN_FLIGHT, self.owner)
+            )
+
+    def lease(self, limit):
+        """Move up to `limit` pending rows to in-flight and return their contact ids in order."""
+        # The transaction is BEGIN IMMEDIATE, so two senders cannot lease the same rows
+        with _transaction(self.db_file) as conn:
+            ids = [row[0] for row in conn.execute(
+                "SELECT contact_id FROM send_outbox WHERE run_id=? AND state=? ORDER BY id LIMIT ?",
+                (self.run_id, PENDING, int(limit))
+            )]
+            conn.executemany(
+                "UPDATE send_outbox SET state=?, attempts=attempts+1, lease_until=?, lease_owner=? "
+                "WHERE run_id=? AND contact_id=?",
+                ((IN_FLIGHT, time.time() + self.lease_seconds, self.owner, self.run_id, cid) for cid in ids)
+            )
+        return ids
+
+    def iter_contacts(self, batch_size=50):
+        """
+        Lease pending recipients batch by batch and yield their
+        (id, name, email, mobile) rows, until the run has nothing pending.
+        Contacts deleted since the run was queued are failed and skipped.
+        """
+        while True:
+            ids = self.lease(batch_size)
+            if not ids:
+                return
+            conn = _connect(self.db_file)
+            placeholders = ",".join("?" * len(ids))
+            rows = {row[0]: row for row in conn.execute(
+                f"SELECT id, name, email, mobile FROM contacts WHERE id IN ({placeholders})", ids
+            )}
+            for cid in ids:
+                if cid in rows:
+                    yield rows[cid]
+                else:
+                    settle(conn.cursor(), self.run_id, cid, False, "Contact no longer exists")
+
+    def contact_states(self):
+        """Map contact_id -> (state, last_error) for every recipient of the run."""
+        return {cid: (state, error) for cid, state, error in _connect(self.db_file).execute(
+            "SELECT contact_id, state, last_error FROM send_outbox WHERE run_id=?", (self.run_id,)
+        )}
+
+    def counts(self):
+        counts = {PENDING: 0, IN_FLIGHT: 0, SENT: 0, FAILED: 0}
+        counts.update(_connect(self.db_file).execute(
+            "SELECT state, COUNT(*) FROM send_outbox WHERE run_id=? GROUP BY state", (self.run_id,)
+        ).fetchall())
+        return counts
+
+    def finish(self):
+        """Close the run so it is no longer offered for resuming."""
+        with _transaction(self.db_file) as conn:
+            conn.execute(
+                "UPDATE outbox_runs SET finished_at=? WHERE id=? AND finished_at IS NULL",
+                (datetime.now().isoformat(), self.run_id)
+            )
@@ -0,0 +1,166 @@
+import threading
+import time
+from datetime import date
+
+from services import db
+from services.config import DB_FILE
+
+# Default sending profiles. Any of them can be overridden from settings under
+# "rate_limits", e.g. {"rate_limits": {"ses": {"rate": 50, "burst": 50}}}.
+# SMTP limiters are kept per host; a host name key overrides the "smtp" entry.
+DEFAULT_PROFILES = {
+    'smtp': {'rate': 2, 'burst': 5, 'daily_cap': 2000},
+    'sendgrid': {'rate': 50, 'burst': 100, 'daily_cap': None},
+    'ses': {'rate': 14, 'burst': 14, 'daily_cap': 50000},
+    'bulksmsbd': {'rate': 10, 'burst': 20, 'daily_cap': None},
+}
+
+
+class DailyCapExceeded(Exception):
+    pass
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `burst`."""
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = max(1.0, float(burst))
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens):
+        """Take tokens now, going into debt if needed; return the wait required."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+    def acquire(self, tokens=1):
+        """Block until `tokens` may be spent."""
+        if self.rate <= 0:
+            return
+        wait = self._reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+
+def init_send_quota(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS send_quota (
+            key TEXT NOT NULL,
+            day TEXT NOT NULL,
+            sent INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY(key, day)
+        )
+    ''')
+
+
+# Database files whose send_quota table is known to exist
+_ready = set()
+
+
+def _transaction(db_file):
+    if db_file not in _ready:
+        init_send_quota(db.connect(db_file))
+        _ready.add(db_file)
+    return db.transaction(db_file)
+
+
+class RateLimiter:
+    """
+    A provider's token bucket plus its daily message cap.
+
+    With a `key` and `db_file` the day's count lives in the send_quota
+    table, so app restarts, repeated headless runs and other processes
+    sharing the database all draw on the same cap. Without them it is
+    counted in this process only.
+    """
+
+    def __init__(self, rate, burst=1, daily_cap=None, key=None, db_file=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.daily_cap = int(daily_cap) if daily_cap else None
+        self.key = key
+        self.db_file = db_file if key else None
+        self._day = date.today()
+        self._sent_today = 0
+        self._lock = threading.Lock()
+
+    @property
+    def sent_today(self):
+        if self.db_file is not None:
+            with _transaction(self.db_file) as conn:
+                return self._stored_count(conn)
+        with self._lock:
+            if self._day != date.today():
+                return 0
+            return self._sent_today
+
+    def _stored_count(self, conn):
+        row = conn.execute("SELECT sent FROM send_quota WHERE key=? AND day=?",
+                           (self.key, date.today().isoformat())).fetchone()
+        return row[0] if row else 0
+
+    def _check_cap(self, sent, tokens):
+        if self.daily_cap is not None and sent + tokens > self.daily_cap:
+            raise DailyCapExceeded(f"Daily cap of {self.daily_cap} messages reached")
+
+    def acquire(self, tokens=1):
+        """Wait for the rate limit; raise DailyCapExceeded once today's cap is spent."""
+        if self.db_file is not None:
+            # Check and count in one write transaction so concurrent senders can't overshoot
+            with _transaction(self.db_file) as conn:
+                self._check_cap(self._stored_count(conn), tokens)
+                conn.execute(
+                    "INSERT INTO send_quota (key, day, sent) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key, day) DO UPDATE SET sent = sent + excluded.sent",
+                    (self.key, date.today().isoformat(), tokens)
+                )
+        else:
+            with self._lock:
+                today = date.today()
+                if self._day != today:
+                    self._day, self._sent_today = today, 0
+                self._check_cap(self._sent_today, tokens)
+                self._sent_today += tokens
+        self.bucket.acquire(tokens)
+
+
+def get_profile(provider, settings=None, host=None):
+    provider = provider.lower()
+    profile = dict(DEFAULT_PROFILES.get(provider, DEFAULT_PROFILES['smtp']))
+    overrides = (settings or {}).get('rate_limits') or {}
+    for key in (provider, host):
+        if key and isinstance(overrides.get(key), dict):
+            # An empty daily_cap means "no cap"; empty rate/burst keep the default
+            profile.update({k: v for k, v in overrides[key].items() if k == 'daily_cap' or v not in ("", None)})
+    return profile
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider, settings=None, host=None, db_file=DB_FILE):
+    """
+    Return the limiter shared by every sender using this provider (and SMTP
+    host), so parallel dialogs and workers together stay within the profile.
+    Its daily count is kept in db_file.
+    """
+    provider = provider.lower()
+    profile = get_profile(provider, settings, host)
+    host = host if provider == 'smtp' else None
+    key = (provider, host, db_file)
+    with _limiters_lock:
+        entry = _limiters.get(key)
+        if entry is None or entry[0] != profile:
+            limiter = RateLimiter(profile['rate'], profile['burst'], profile.get('daily_cap'),
+                                  key=f"{provider}:{host}" if host else provider, db_file=db_file)
+            entry = (profile, limiter)
+            _limiters[key] = entry
+        return entry[1]
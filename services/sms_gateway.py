@@ -0,0 +1,156 @@
+import threading
+from collections import namedtuple
+
+import requests
+import requests.adapters
+
+from services.dispatcher import CampaignDispatcher, chunked
+from services.email_utils import retry_with_backoff
+
+BULKSMSBD_URL = "http://bulksmsbd.net/api/smsapi"
+# Numbers per one-to-many request
+DEFAULT_BATCH_SIZE = 100
+
+# ok is True when the gateway accepted the message; detail is its reply text
+# (or the transport error) for sms_history.
+SmsResult = namedtuple("SmsResult", "number ok detail")
+
+
+class GatewayTransientError(Exception):
+    """A failure worth retrying: the request never reached the gateway or it answered 5xx."""
+
+
+def is_success(status_code, text):
+    return status_code == 200 and ("SMS Send Success" in text or 'success' in text.lower())
+
+
+def group_by_message(jobs, batch_size=DEFAULT_BATCH_SIZE, window=5):
+    """
+    Split (key, number, message) jobs into lists that share one message, at
+    most batch_size long. Jobs are read lazily, window * batch_size at a time,
+    and grouped within that window in first-seen order.
+    """
+    batch_size = max(1, int(batch_size))
+    for chunk in chunked(jobs, batch_size * window):
+        groups = {}
+        for job in chunk:
+            groups.setdefault(job[2], []).append(job)
+        for group in groups.values():
+            for i in range(0, len(group), batch_size):
+                yield group[i:i + batch_size]
+
+
+class SmsGatewayClient:
+    """
+    bulksmsbd HTTP API client holding a keep-alive connection pool.
+
+    Up to `max_in_flight` requests run at once across all threads using the
+    client. Connection failures and 5xx replies are retried with backoff; a
+    read timeout is not, since the gateway may already have queued the SMS.
+    """
+
+    def __init__(self, api_key, sender_id, base_url=BULKSMSBD_URL, pool_size=8, max_in_flight=8,
+                 connect_timeout=5, read_timeout=15, max_retries=3):
+        self.api_key = api_key
+        self.sender_id = sender_id
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._in_flight = threading.BoundedSemaphore(self.max_in_flight)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=max(int(pool_size), self.max_in_flight))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method, **kwargs):
+        with self._in_flight:
+            try:
+                resp = self.session.request(method, self.base_url, timeout=self.timeout, **kwargs)
+            except requests.ConnectionError as e:
+                # Includes connect timeouts; read timeouts are not retried
+                raise GatewayTransientError(f"SMS gateway unreachable: {e}")
+        if resp.status_code >= 500:
+            raise GatewayTransientError(f"SMS gateway error: {resp.status_code} {resp.text.strip()}")
+        return resp
+
+    def _submit(self, number, message):
+        params = {
+            "api_key": self.api_key,
+            "type": "text",
+            "number": number,
+            "senderid": self.sender_id,
+            "message": message
+        }
+        # Comma-separated number lists go in a POST body to stay clear of URL limits
+        if "," in number:
+            return self._request("post", data=params)
+        return self._request("get", params=params)
+
+    def send(self, number, message):
+        """Send one SMS and return an SmsResult; never raises for gateway failures."""
+        return self.send_to_many([number], message)[0]
+
+    def send_to_many(self, numbers, message):
+        """
+        Send the same text to several numbers in one request. The gateway
+        answers for the request as a whole, so every number gets the same result.
+        """
+        try:
+            resp = retry_with_backoff(lambda: self._submit(",".join(numbers), message),
+                                      max_retries=self.max_retries, retry_on=GatewayTransientError)
+        except Exception as e:
+            return [SmsResult(number, False, str(e)) for number in numbers]
+        ok = is_success(resp.status_code, resp.text)
+        return [SmsResult(number, ok, resp.text.strip()) for number in numbers]
+
+    def send_batch(self, batch):
+        """
+        Dispatcher job for a list of (key, number, message) jobs sharing one
+        message: returns the SmsResults, or raises with the gateway's reply.
+        """
+        results = self.send_to_many([number for _, number, _ in batch], batch[0][2])
+        if not results[0].ok:
+            raise Exception(results[0].detail or "SMS gateway rejected the message")
+        return results
+
+    def dispatcher(self, limiter=None, stop_event=None):
+        """A CampaignDispatcher running send_batch with up to max_in_flight requests at once."""
+        return CampaignDispatcher(self.send_batch, workers=self.max_in_flight, limiter=limiter,
+                                  cost=len, stop_event=stop_event)
+
+    def send_many(self, jobs, on_result=None, limiter=None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Send (key, number, message) jobs with up to max_in_flight concurrent
+        requests. Recipients whose rendered message is identical share one
+        multi-number request of up to batch_size numbers; unique messages go
+        one per request.
+
+        on_result gets a dispatcher SendResult per request on the calling
+        thread, with the list of jobs it covered as `job`; a rejected request
+        arrives as ok=False with the gateway reply as error. Returns the
+        (success, failed) request counts.
+        """
+        return self.dispatcher(limiter).run(group_by_message(jobs, batch_size), on_result)
+
+    def close(self):
+        self.session.close()
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_sms_client(settings):
+    """Return the shared client for the configured API key and sender ID."""
+    api_key = settings.get('sms_api_key', '')
+    sender_id = settings.get('sms_sender_id', '')
+    base_url = settings.get('sms_api_url') or BULKSMSBD_URL
+    workers = int(settings.get('sms_workers') or settings.get('send_workers') or 4)
+    key = (api_key, sender_id, base_url, workers)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = SmsGatewayClient(api_key, sender_id, base_url, pool_size=workers, max_in_flight=workers)
+            _clients[key] = client
+        return client
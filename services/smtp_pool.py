@@ -0,0 +1,161 @@
+import smtplib
+import threading
+import time
+from queue import LifoQueue, Empty
+
+
+class _PooledConnection:
+    def __init__(self, smtp):
+        self.smtp = smtp
+        self.messages_sent = 0
+        self.last_used = time.monotonic()
+
+
+class SMTPConnectionPool:
+    """
+    Keep a small set of authenticated SMTP sessions open between sends.
+
+    Connections are opened lazily (connect, STARTTLS, LOGIN) up to `size`,
+    health-checked with NOOP when they have been idle for `idle_check` seconds,
+    replaced transparently on 421 replies or timeouts, and recycled after
+    `max_messages` messages.
+    """
+
+    def __init__(self, server, port, sender, password, size=4, max_messages=100, timeout=30, idle_check=30):
+        self.server = server
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.size = max(1, int(size))
+        self.max_messages = max(1, int(max_messages))
+        self.timeout = timeout
+        self.idle_check = idle_check
+        self._idle = LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._closed = False
+
+    def _connect(self):
+        smtp = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+        try:
+            smtp.starttls()
+            smtp.login(self.sender, self.password)
+        except Exception:
+            _quit_quietly(smtp)
+            raise
+        return _PooledConnection(smtp)
+
+    def _is_alive(self, conn):
+        try:
+            code, _ = conn.smtp.noop()
+            return code == 250
+        except Exception:
+            return False
+
+    def acquire(self):
+        """Borrow a ready connection, opening a new one if none is idle."""
+        if self._closed:
+            raise RuntimeError("SMTP connection pool is closed")
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except Empty:
+                    return self._connect()
+                if time.monotonic() - conn.last_used < self.idle_check or self._is_alive(conn):
+                    return conn
+                _quit_quietly(conn.smtp)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn, discard=False):
+        """Return a borrowed connection; broken or worn-out ones are closed."""
+        try:
+            conn.last_used = time.monotonic()
+            if discard or self._closed or conn.messages_sent >= self.max_messages:
+                _quit_quietly(conn.smtp)
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def sendmail(self, recipient, message):
+        """
+        Send an already formatted message, reconnecting once if the pooled
+        session turns out to be dropped by the server.
+        """
+        for attempt in range(2):
+            conn = self.acquire()
+            try:
+                conn.smtp.sendmail(self.sender, recipient, message)
+            except smtplib.SMTPServerDisconnected:
+                self.release(conn, discard=True)
+                if attempt == 0:
+                    continue
+                raise
+            except smtplib.SMTPResponseException as e:
+                # 421: the server is closing the channel, so retry on a fresh one
+                if e.smtp_code == 421:
+                    self.release(conn, discard=True)
+                    if attempt == 0:
+                        continue
+                    raise
+                self.release(conn)
+                raise
+            except smtplib.SMTPException:
+                # Refused recipients etc. leave the session usable
+                self.release(conn)
+                raise
+            except OSError:
+                # Timeouts and resets (SMTPException is an OSError, handled above)
+                self.release(conn, discard=True)
+                if attempt == 0:
+                    continue
+                raise
+            except Exception:
+                self.release(conn, discard=True)
+                raise
+            conn.messages_sent += 1
+            self.release(conn)
+            return True
+
+    def close_idle(self):
+        """Close idle connections, e.g. when a campaign finishes; the pool stays usable."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except Empty:
+                break
+            _quit_quietly(conn.smtp)
+
+    def close(self):
+        """Close the pool; connections still borrowed are closed on release."""
+        self._closed = True
+        self.close_idle()
+
+
+def _quit_quietly(smtp):
+    try:
+        smtp.quit()
+    except Exception:
+        try:
+            smtp.close()
+        except Exception:
+            pass
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_smtp_pool(smtp_settings, sender, password, size=4, max_messages=100):
+    """Return the shared pool for these credentials, creating it on first use."""
+    key = (smtp_settings["server"], int(smtp_settings["port"]), sender, password)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = SMTPConnectionPool(key[0], key[1], sender, password, size=size, max_messages=max_messages)
+            _pools[key] = pool
+        return pool
+
@@ -0,0 +1,124 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+# Country code put in front of numbers written in national format
+# (01712345678 -> 8801712345678)
+DEFAULT_COUNTRY_CODE = "880"
+
+# Practical address syntax: no spaces, one @, a dotted domain with a
+# letter TLD. Applied after trimming and lower-casing.
+EMAIL_PATTERN = r"[a-z0-9!#$%&'*+/=?^_`{|}~-]+(?:\.[a-z0-9!#$%&'*+/=?^_`{|}~-]+)*@(?:[a-z0-9](?:[a-z0-9-]*[a-z0-9])?\.)+[a-z]{2,}"
+# E.164 without the "+": country code and subscriber number, 8 to 15 digits
+MOBILE_PATTERN = r"[1-9]\d{7,14}"
+
+INVALID_NAME = "Missing name"
+INVALID_EMAIL = "Invalid email"
+INVALID_MOBILE = "Invalid mobile"
+DUPLICATE_ROW = "Duplicate of an earlier row"
+
+
+def normalize_emails(emails):
+    """Trimmed, lower-cased emails; missing values become ''."""
+    return emails.fillna('').astype(str).str.strip().str.lower()
+
+
+def valid_emails(emails):
+    """Boolean mask of normalized emails with a valid address syntax."""
+    return emails.str.fullmatch(EMAIL_PATTERN).fillna(False).astype(bool)
+
+
+def normalize_mobiles(mobiles, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Mobile numbers as E.164 digits without the "+", the form the SMS gateway
+    takes. Spacing and punctuation are dropped, a "+" or "00" prefix marks a
+    number that already has its country code, and a national number gets
+    country_code in place of its leading 0. Missing values become ''.
+    """
+    mobiles = mobiles.fillna('').astype(str).str.strip()
+    # Most numbers are plain digits; only the rest need the regex clean-up
+    messy = ~mobiles.str.isdigit() & (mobiles != '')
+    if messy.any():
+        # Spreadsheets turn long digit strings into floats: 8801712345678.0
+        mobiles = mobiles.mask(messy, mobiles[messy].str.replace(r"\.0$", "", regex=True)
+                               .str.replace(r"[\s().-]", "", regex=True))
+    prefixed = mobiles.str.startswith("+") | mobiles.str.startswith("00")
+    if prefixed.any():
+        mobiles = mobiles.mask(prefixed, mobiles[prefixed].str.replace(r"^(?:\+|00)", "", regex=True))
+    national = ~prefixed & (mobiles != '') & ~mobiles.str.startswith(country_code)
+    if national.any():
+        mobiles = mobiles.mask(national, country_code + mobiles[national].str.removeprefix("0"))
+    return mobiles
+
+
+def valid_mobiles(mobiles):
+    """Boolean mask of normalized mobiles that are E.164 numbers or empty (mobile is optional)."""
+    return (mobiles == '') | mobiles.str.fullmatch(MOBILE_PATTERN).fillna(False).astype(bool)
+
+
+def email_error(email):
+    """Why an address can't be sent to, or None. The one-value form of valid_emails()."""
+    return None if re.fullmatch(EMAIL_PATTERN, str(email or '').strip().lower()) else INVALID_EMAIL
+
+
+def normalize_mobile(mobile, country_code=DEFAULT_COUNTRY_CODE):
+    """normalize_mobiles() for one number."""
+    mobile = re.sub(r"[\s().-]", "", re.sub(r"\.0$", "", str(mobile or '').strip()))
+    if mobile.startswith("+") or mobile.startswith("00"):
+        return re.sub(r"^(?:\+|00)", "", mobile)
+    if mobile and not mobile.startswith(country_code):
+        return country_code + re.sub(r"^0", "", mobile)
+    return mobile
+
+
+def mobile_error(mobile, country_code=DEFAULT_COUNTRY_CODE):
+    """Why a number can't be sent an SMS, or None."""
+    return None if re.fullmatch(MOBILE_PATTERN, normalize_mobile(mobile, country_code)) else INVALID_MOBILE
+
+
+class SeenEmails:
+    """
+    Emails met so far in one import, kept as 64-bit hashes so a million
+    rows cost 8 MB rather than the strings themselves.
+    """
+
+    def __init__(self):
+        self._hashes = np.empty(0, dtype=np.uint64)
+
+    def add(self, emails):
+        """Record emails and return a mask of those seen earlier, in this call or a previous one."""
+        hashes = pd.util.hash_pandas_object(emails, index=False).to_numpy()
+        repeated = pd.Series(hashes).duplicated().to_numpy()
+        if len(self._hashes):
+            # self._hashes is sorted: a binary search per email
+            pos = np.searchsorted(self._hashes, hashes).clip(max=len(self._hashes) - 1)
+            repeated = repeated | (self._hashes[pos] == hashes)
+        self._hashes = np.sort(np.concatenate([self._hashes, hashes[~repeated]]))
+        return repeated
+
+
+def validate_contacts(chunk, seen=None, country_code=DEFAULT_COUNTRY_CODE):
+    """
+    Split a chunk of name/email/mobile text columns into (valid, rejected)
+    DataFrames. Valid rows are trimmed, emails lower-cased and mobiles
+    normalized; rejected rows keep their original values plus a "reason"
+    column. Rows repeating an email already in `seen` (a SeenEmails) are
+    rejected as duplicates.
+    """
+    names = chunk['name'].fillna('').astype(str).str.strip()
+    emails = normalize_emails(chunk['email'])
+    mobiles = normalize_mobiles(chunk['mobile'], country_code)
+    reason = pd.Series('', index=chunk.index, dtype=object)
+    reason = reason.mask(~valid_mobiles(mobiles), INVALID_MOBILE)
+    reason = reason.mask(~valid_emails(emails), INVALID_EMAIL)
+    reason = reason.mask(names == '', INVALID_NAME)
+    ok = (reason == '').to_numpy()
+    if seen is not None:
+        repeated = np.zeros(len(chunk), dtype=bool)
+        repeated[ok] = seen.add(emails[ok])
+        reason = reason.mask(repeated, DUPLICATE_ROW)
+        ok = ok & ~repeated
+    valid = pd.DataFrame({'name': names, 'email': emails, 'mobile': mobiles})[ok]
+    rejected = chunk[~ok].assign(reason=reason[~ok])
+    return valid, rejected
@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Test the chunked contact import from CSV, JSON Lines, xlsx and Parquet files
+"""
+
+import sys
+import os
+import json
+import sqlite3
+import shutil
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from services import db
+from services.contacts import ImportReport, import_contacts, import_contacts_from_csv
+from services.db import init_db
+
+
+def make_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    init_db(path)
+    return path
+
+
+def make_db_and_reports():
+    return make_db(), tempfile.mkdtemp()
+
+
+def write_csv(text):
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    with os.fdopen(fd, "w") as f:
+        f.write(text)
+    return path
+
+
+def contacts(path):
+    conn = sqlite3.connect(path)
+    rows = conn.execute("SELECT name, email, mobile FROM contacts ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def test_import_normalizes_and_ignores_duplicates():
+    path, reports = make_db_and_reports()
+    csv = write_csv("Name,EMAIL,Mobile,Notes\n"
+                    "  Alice ,Alice@Example.com ,01711000001,x\n"
+                    "Carol,carol@example.com,,\n"
+                    "Dan,dan@example.com,8801711000004.0,\n")
+    try:
+        assert import_contacts_from_csv(csv, db_file=path, chunk_rows=2, reject_dir=reports) == 3
+        assert contacts(path) == [("Alice", "alice@example.com", "8801711000001"),
+                                  ("Carol", "carol@example.com", ""),
+                                  ("Dan", "dan@example.com", "8801711000004")]
+        # Nothing new the second time
+        assert import_contacts_from_csv(csv, db_file=path, reject_dir=reports) == 0
+        assert os.listdir(reports) == []
+    finally:
+        db.close_connections()
+        shutil.rmtree(reports)
+        os.remove(csv)
+        os.remove(path)
+
+
+def test_one_pass_import_reports_and_assigns_groups():
+    path, reports = make_db_and_reports()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO groups (id, short_name) VALUES (1, 'vip'), (2, 'news'), (3, 'other')")
+    conn.execute("INSERT INTO contacts (id, name, email, mobile) VALUES (7, 'Old', 'old@example.com', '')")
+    conn.execute("INSERT INTO group_members (group_id, contact_id) VALUES (1, 7)")
+    conn.commit()
+    conn.close()
+    csv = write_csv("name,email,mobile\n"
+                    "New,new@example.com,01711000001\n"
+                    "Old again,old@example.com,\n"
+                    "No email,,01711000002\n"
+                    "Bad mobile,bad@example.com,017\n"
+                    "New twice,NEW@example.com,01711000003\n")
+    try:
+        report = import_contacts(csv, ["vip", "news", "missing"], db_file=path, chunk_rows=3, reject_dir=reports)
+        # Old was already in vip; every other (contact, group) pair is new
+        assert report[:4] == (1, 2, 2, 3)
+        conn = sqlite3.connect(path)
+        members = conn.execute("SELECT c.email, g.short_name FROM group_members m JOIN contacts c ON c.id = m.contact_id "
+                               "JOIN groups g ON g.id = m.group_id ORDER BY 1, 2").fetchall()
+        conn.close()
+        assert members == [("new@example.com", "news"), ("new@example.com", "vip"),
+                           ("old@example.com", "news"), ("old@example.com", "vip")]
+        assert contacts(path)[-1] == ("New", "new@example.com", "8801711000001")
+
+        # Rejected rows are kept as written, with the reason
+        assert os.path.dirname(report.rejects) == reports
+        with open(report.rejects) as f:
+            assert f.read().splitlines() == ["name,email,mobile,reason",
+                                             "No email,,01711000002,Invalid email",
+                                             "Bad mobile,bad@example.com,017,Invalid mobile",
+                                             "New twice,NEW@example.com,01711000003,Duplicate of an earlier row"]
+        again = import_contacts(csv, db_file=path, reject_dir=reports)
+        assert again == ImportReport(0, 3, 2, 0, again.rejects, False)
+    finally:
+        db.close_connections()
+        shutil.rmtree(reports)
+        os.remove(csv)
+        os.remove(path)
+
+
+def test_existing_email_in_other_case_is_a_duplicate():
+    path, reports = make_db_and_reports()
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO groups (id, short_name) VALUES (1, 'vip')")
+    # Saved before imports lower-cased emails, or through the contact dialog
+    conn.execute("INSERT INTO contacts (id, name, email, mobile) VALUES (3, 'Alice', 'Alice@Example.com', '')")
+    conn.commit()
+    conn.close()
+    csv = write_csv("name,email,mobile\nAlice,alice@example.com,\n")
+    try:
+        report = import_contacts(csv, ["vip"], db_file=path, reject_dir=reports)
+        assert report[:4] == (0, 1, 0, 1)
+        assert contacts(path) == [("Alice", "Alice@Example.com", "")]
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT group_id, contact_id FROM group_members").fetchall() == [(1, 3)]
+        conn.close()
+    finally:
+        db.close_connections()
+        shutil.rmtree(reports)
+        os.remove(csv)
+        os.remove(path)
+
+
+def test_progress_and_cancel_keep_committed_chunks():
+    path, reports = make_db_and_reports()
+    # Long notes spread the rows over several read buffers
+    notes = "x" * 100000
+    csv = write_csv("name,email,mobile,notes\n" + "".join(f"User {i},user{i}@example.com,,{notes}\n" for i in range(10))
+                    + "Bad,bad@,,\n")
+    stop = threading.Event()
+    progress = []
+
+    def on_progress(p):
+        progress.append(p)
+        if p.rows == 8:
+            stop.set()  # as if Cancel were pressed while the third chunk is read
+    try:
+        report = import_contacts(csv, db_file=path, chunk_rows=4, reject_dir=reports,
+                                 on_progress=on_progress, stop_event=stop)
+        assert report == ImportReport(8, 0, 0, 0, None, True)
+        assert [p.rows for p in progress] == [4, 8]
+        assert 0 < progress[0].done < progress[1].done <= 1
+        assert progress[1].rate > 0 and progress[1].eta >= 0
+        # The third chunk was rolled back, its reject not written
+        assert len(contacts(path)) == 8 and os.listdir(reports) == []
+        assert not db.connect(path).in_transaction
+
+        report = import_contacts(csv, db_file=path, chunk_rows=4, reject_dir=reports, on_progress=progress.append)
+        assert report[:3] == (2, 8, 1) and not report.cancelled
+        assert progress[-1].rows == 11 and progress[-1].done == 1
+    finally:
+        db.close_connections()
+        shutil.rmtree(reports)
+        os.remove(csv)
+        os.remove(path)
+
+
+def test_jsonl_xlsx_and_parquet_import_like_csv():
+    import openpyxl
+    reports = tempfile.mkdtemp()
+    jsonl, xlsx, parquet = (os.path.join(reports, name) for name in ("c.jsonl", "c.xlsx", "c.parquet"))
+    with open(jsonl, "w") as f:
+        for record in ({"Name": "A", "Email": "A@x.com", "Mobile": 8801712345678},
+                       {"Name": "B", "Email": "b@x.com", "Mobile": "01712345679", "Extra": 1},
+                       {"Name": "C", "Email": "c@x.com"}, {"Name": "", "Email": "bad@x.com"}):
+            f.write(json.dumps(record) + "\n")
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["NAME", "email", "Mobile", "Notes"])
+    for row in (["A", "a@x.com", 8801712345678, "n"], ["B", "b@x.com", "01712345679"], ["C", "c@x.com", None],
+                [None, "bad@x.com", None]):
+        workbook.active.append(row)
+    workbook.save(xlsx)
+    pd.DataFrame({"name": ["A", "B", "C", ""], "email": ["a@x.com", "b@x.com", "c@x.com", "bad@x.com"],
+                  "mobile": ["8801712345678", "01712345679", None, None], "other": 1}).to_parquet(parquet)
+    expected = [("A", "a@x.com", "8801712345678"), ("B", "b@x.com", "8801712345679"), ("C", "c@x.com", "")]
+    try:
+        for source in (jsonl, xlsx, parquet):
+            path = make_db()
+            progress = []
+            report = import_contacts(source, db_file=path, chunk_rows=2, reject_dir=reports,
+                                     on_progress=progress.append)
+            assert report[:3] == (3, 0, 1), source
+            assert contacts(path) == expected, source
+            assert [p.rows for p in progress] == [2, 4] and progress[-1].done == 1
+            db.close_connections()
+            os.remove(path)
+    finally:
+        db.close_connections()
+        shutil.rmtree(reports)
+
+
+def test_missing_columns_are_reported():
+    path = make_db()
+    csv = write_csv("name,email\nAlice,alice@example.com\n")
+    try:
+        import_contacts_from_csv(csv, db_file=path)
+        assert False, "expected a missing column error"
+    except Exception as e:
+        assert "mobile" in str(e)
+    finally:
+        db.close_connections()
+        os.remove(csv)
+        os.remove(path)
+
+
+def test_large_import_is_bulk_speed():
+    path = make_db()
+    csv = write_csv("name,email,mobile\n" + "".join(
+        f"User {i},user{i}@example.com,8801{i:09d}\n" for i in range(200000)))
+    try:
+        start = time.perf_counter()
+        assert import_contacts_from_csv(csv, db_file=path) == 200000
+        elapsed = time.perf_counter() - start
+        assert elapsed < 10  # a couple of seconds in practice; loose for slow CI machines
+    finally:
+        db.close_connections()
+        os.remove(csv)
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for test in (test_import_normalizes_and_ignores_duplicates, test_one_pass_import_reports_and_assigns_groups,
+                 test_existing_email_in_other_case_is_a_duplicate,
+                 test_progress_and_cancel_keep_committed_chunks, test_jsonl_xlsx_and_parquet_import_like_csv,
+                 test_missing_columns_are_reported,
+                 test_large_import_is_bulk_speed):
+        test()
+        print(f"✅ {test.__name__}")
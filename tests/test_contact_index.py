@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Test the in-memory contact index used by the campaign wizards
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.contact_index import ContactIndex, ContactSelection
+from services.db import init_db
+
+
+def make_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO contacts (id, name, email, mobile) VALUES (?, ?, ?, ?)", [
+        (1, "Carol", "carol@example.com", "01711000001"),
+        (2, "alice", "ALICE@Example.com", "01711000002"),
+        (3, "Bob", "bob@test.org", None),
+    ])
+    conn.execute("INSERT INTO groups (id, short_name, name) VALUES (1, 'vip', 'VIP')")
+    conn.execute("INSERT INTO group_members (group_id, contact_id) VALUES (1, 1), (1, 3)")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_load_and_group_membership():
+    path = make_db()
+    try:
+        index = ContactIndex.load(path)
+        assert len(index) == 3
+        assert index.ids == [3, 1, 2]  # ORDER BY name, as the wizards list them
+        assert index.in_group(1, "vip") and not index.in_group(2, "vip")
+        assert index.in_group(2, "All")
+        assert index.members("missing") == set()
+    finally:
+        os.remove(path)
+
+
+def test_search_filters_by_text_group_and_exclusion():
+    index = ContactIndex([
+        (1, "Carol", "carol@example.com", "01711000001"),
+        (2, "alice", "ALICE@Example.com", "01711000002"),
+        (3, "Bob", "bob@test.org", None),
+    ], [("vip", 1), ("vip", 3)])
+    assert index.search("") == [1, 2, 3]
+    assert index.search("EXAMPLE") == [1, 2]
+    assert index.search("0002") == [2]
+    assert index.search("example", group="vip") == [1]
+    assert index.search("", group="vip", exclude={3}) == [1]
+    assert index.search("", group="nobody") == []
+    # A query never matches across the name/email boundary
+    assert index.search("carolcarol") == []
+
+
+def test_search_is_fast_at_100k_contacts():
+    contacts = [(i, f"Contact {i}", f"user{i}@example.com", f"0171{i:07d}") for i in range(100000)]
+    index = ContactIndex(contacts, [("even", i) for i in range(0, 100000, 2)])
+    start = time.perf_counter()
+    matches = index.search("user9999", group="even")
+    elapsed = time.perf_counter() - start
+    assert matches[0] == 99990
+    assert elapsed < 0.5  # well under in practice; loose for slow CI machines
+
+
+def test_selection_keeps_order_and_ignores_duplicates():
+    selection = ContactSelection([5, 3])
+    assert selection.add([3, 7, 7, 1]) == 2
+    assert list(selection) == [5, 3, 7, 1]
+    selection.remove([3, 42])
+    assert list(selection) == [5, 7, 1] and 3 not in selection
+    selection.retain({1, 5})
+    assert list(selection) == [5, 1] and len(selection) == 2
+
+
+def test_selecting_a_large_group_is_linear():
+    index = ContactIndex([(i, f"C{i}", f"c{i}@x.org", "") for i in range(50000)],
+                         [("big", i) for i in range(0, 50000, 2)])
+    selection = ContactSelection()
+    start = time.perf_counter()
+    selection.add(index.search("", "big"))
+    remaining = index.search("", exclude=selection)
+    selection.remove(list(selection)[:10000])
+    elapsed = time.perf_counter() - start
+    assert len(selection) == 15000 and len(remaining) == 25000
+    assert elapsed < 1.0
+
+
+if __name__ == "__main__":
+    for test in (test_load_and_group_membership, test_search_filters_by_text_group_and_exclusion,
+                 test_search_is_fast_at_100k_contacts, test_selection_keeps_order_and_ignores_duplicates,
+                 test_selecting_a_large_group_is_linear):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test the shared per-thread SQLite connections and transactions in services.db
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import db
+from services.db import init_db
+
+
+def make_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    init_db(path)
+    return path
+
+
+def test_one_tuned_connection_per_thread():
+    path = make_db()
+    try:
+        conn = db.connect(path)
+        assert db.connect(path) is conn
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert conn.execute("PRAGMA busy_timeout").fetchone()[0] == db.BUSY_TIMEOUT_MS
+        other = []
+        thread = threading.Thread(target=lambda: other.append(db.connect(path)))
+        thread.start()
+        thread.join()
+        assert other[0] is not conn
+    finally:
+        db.close_connections()
+        os.remove(path)
+
+
+def test_transaction_commits_rolls_back_and_nests():
+    path = make_db()
+    try:
+        with db.transaction(path) as conn:
+            conn.execute("INSERT INTO groups (short_name) VALUES ('a')")
+            with db.transaction(path):
+                conn.execute("INSERT INTO groups (short_name) VALUES ('b')")
+            assert conn.in_transaction  # the inner block joined, not committed
+        try:
+            with db.transaction(path) as conn:
+                conn.execute("INSERT INTO groups (short_name) VALUES ('c')")
+                conn.execute("INSERT INTO groups (short_name) VALUES ('a')")  # UNIQUE
+        except sqlite3.IntegrityError:
+            pass
+        names = [r[0] for r in db.connect(path).execute("SELECT short_name FROM groups ORDER BY 1")]
+        assert names == ["a", "b"]
+        assert not db.connect(path).in_transaction
+    finally:
+        db.close_connections()
+        os.remove(path)
+
+
+def test_reads_do_not_wait_for_a_writer():
+    path = make_db()
+    writing = threading.Event()
+    done = threading.Event()
+
+    def writer():
+        with db.transaction(path) as conn:
+            conn.execute("INSERT INTO groups (short_name) VALUES ('pending')")
+            writing.set()
+            done.wait(5)
+        db.close_connections()
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        assert writing.wait(5)
+        reader = db.connect(path)
+        reader.execute("PRAGMA busy_timeout=0")  # fail instead of waiting
+        assert reader.execute("SELECT COUNT(*) FROM groups").fetchone()[0] == 0
+        done.set()
+        thread.join()
+        assert reader.execute("SELECT COUNT(*) FROM groups").fetchone()[0] == 1
+    finally:
+        done.set()
+        thread.join()
+        db.close_connections()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for test in (test_one_tuned_connection_per_thread, test_transaction_commits_rolls_back_and_nests,
+                 test_reads_do_not_wait_for_a_writer):
+        test()
+        print(f"✅ {test.__name__}")
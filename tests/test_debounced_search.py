@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the debounced search controller and the history search service
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from features.search import DebouncedSearch
+from services import history
+from services.db import init_db
+
+
+class FakeWidget:
+    """Keeps after() timers so the test decides when they fire"""
+
+    def __init__(self):
+        self.timers = {}
+        self._next = 0
+
+    def after(self, ms, func):
+        self._next += 1
+        self.timers[self._next] = (ms, func)
+        return self._next
+
+    def after_cancel(self, timer_id):
+        self.timers.pop(timer_id, None)
+
+    def fire_all(self, timeout=5):
+        """Run timers (including ones they schedule) until none are left."""
+        deadline = time.time() + timeout
+        while self.timers and time.time() < deadline:
+            timer_id = min(self.timers)
+            _, func = self.timers.pop(timer_id)
+            func()
+            time.sleep(0.001)
+
+
+def make_search(words):
+    calls = []
+    applied = []
+
+    def search(query, context, within):
+        calls.append((query, context, within))
+        source = words if within is None else within
+        return [w for w in source if query in w]
+
+    widget = FakeWidget()
+    return widget, DebouncedSearch(widget, search, applied.append), calls, applied
+
+
+def test_typing_runs_one_search():
+    widget, searcher, calls, applied = make_search(["alpha", "alphabet", "beta"])
+    for i in range(1, len("alphabet") + 1):
+        searcher.trigger("alphabet"[:i], "All")
+    assert len(widget.timers) == 1  # every keystroke restarted the same timer
+    widget.fire_all()
+    assert [c[0] for c in calls] == ["alphabet"]
+    assert applied == [["alphabet"]]
+
+
+def test_longer_query_narrows_previous_results():
+    widget, searcher, calls, applied = make_search(["alpha", "alphabet", "beta"])
+    searcher.trigger("al", "All")
+    widget.fire_all()
+    searcher.trigger("alphab", "All")
+    widget.fire_all()
+    assert calls[1][2] == ["alpha", "alphabet"]
+    assert applied[-1] == ["alphabet"]
+    # A different context (e.g. group) or a shorter query searches everything again
+    searcher.trigger("alphabe", "vip")
+    widget.fire_all()
+    searcher.trigger("alp", "vip")
+    widget.fire_all()
+    assert calls[2][2] is None and calls[3][2] is None
+    assert applied[-1] == ["alpha", "alphabet"]
+
+
+def test_superseded_results_are_dropped():
+    widget, searcher, calls, applied = make_search(["alpha", "beta"])
+    searcher.trigger("a", "All")
+    _, start = widget.timers.pop(min(widget.timers))
+    start()  # worker running for "a"
+    searcher.trigger("b", "All")  # typed while it runs
+    widget.fire_all()
+    assert [c[0] for c in calls] == ["a", "b"]
+    assert applied == [["beta"]]
+
+
+def test_history_recent_rows_and_date_range():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        init_db(path)
+        conn = sqlite3.connect(path)
+        conn.executemany("INSERT INTO sms_history (timestamp, body, recipient, status) VALUES (?, ?, ?, ?)", [
+            ("2024-01-01 10:00:00", "Hello Alice, your order shipped", "01711000001", "Sent"),
+            ("2024-01-02 10:00:00", "Hello Bob", "01711000002", "Failed: timeout"),
+            ("2024-02-01 10:00:00", "Order reminder", "01711000003", "Sent"),
+        ])
+        conn.commit()
+        conn.close()
+        everything = history.sms_history(db_file=path)
+        assert len(everything) == 3
+        january = history.parse_date_range("2024-01-01 00:00", "2024-01-31 23:59")
+        assert len(history.sms_history("", january, db_file=path)) == 2
+        assert history.parse_date_range("not a date", "2024-01-31 23:59") is None
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for test in (test_typing_runs_one_search, test_longer_query_narrows_previous_results,
+                 test_superseded_results_are_dropped, test_history_recent_rows_and_date_range):
+        test()
+        print(f"✅ {test.__name__}")
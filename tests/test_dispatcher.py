@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Test script for the concurrent campaign dispatcher
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.dispatcher import CampaignDispatcher
+from services.rate_limit import TokenBucket, RateLimiter
+
+
+def test_all_jobs_reported():
+    seen = []
+
+    def send(job):
+        if job % 5 == 0:
+            raise Exception(f"bad {job}")
+        return job * 2
+
+    dispatcher = CampaignDispatcher(send, workers=4)
+    success, failed = dispatcher.run(range(50), seen.append)
+    assert (success, failed) == (40, 10)
+    assert sorted(r.job for r in seen) == list(range(50))
+    assert all(r.value == r.job * 2 for r in seen if r.ok)
+    assert all(r.error == f"bad {r.job}" for r in seen if not r.ok)
+
+
+def test_wall_clock_scales_with_workers():
+    def send(job):
+        time.sleep(0.05)
+
+    start = time.monotonic()
+    CampaignDispatcher(send, workers=10).run(range(40))
+    elapsed = time.monotonic() - start
+    # 40 jobs x 50 ms would take 2 s serially
+    assert elapsed < 0.8, elapsed
+
+
+def test_results_delivered_on_calling_thread():
+    caller = threading.get_ident()
+    threads = set()
+    CampaignDispatcher(lambda job: None, workers=3).run(range(10), lambda r: threads.add(threading.get_ident()))
+    assert threads == {caller}
+
+
+def test_global_rate_ceiling():
+    start = time.monotonic()
+    CampaignDispatcher(lambda job: None, workers=8, limiter=TokenBucket(50, 1)).run(range(26))
+    elapsed = time.monotonic() - start
+    # 26 sends at 50/s need at least 0.5 s no matter how many workers
+    assert elapsed >= 0.45, elapsed
+
+
+def test_daily_cap_stops_dispatch():
+    sent = []
+    limiter = RateLimiter(rate=1000, burst=1000, daily_cap=10)
+    dispatcher = CampaignDispatcher(sent.append, workers=2, limiter=limiter)
+    success, failed = dispatcher.run(range(30))
+    assert success == 10 and len(sent) == 10
+    assert failed == 0
+    assert "Daily cap" in dispatcher.stop_reason
+
+
+def test_batch_jobs_spend_cost_tokens():
+    limiter = RateLimiter(rate=1000, burst=1000, daily_cap=120)
+    batches = [list(range(i, i + 50)) for i in range(0, 200, 50)]
+    success, failed = CampaignDispatcher(len, workers=1, limiter=limiter, cost=len).run(batches)
+    # Two batches of 50 fit under the cap of 120, the third does not
+    assert success == 2 and limiter.sent_today == 100
+
+
+def test_on_result_error_stops_the_run():
+    sent, reported = [], []
+
+    def on_result(result):
+        reported.append(result.job)
+        if len(reported) == 2:
+            raise BrokenPipeError("stdout closed")
+
+    def send(job):
+        time.sleep(0.005)
+        sent.append(job)
+
+    dispatcher = CampaignDispatcher(send, workers=4)
+    try:
+        dispatcher.run(range(200), on_result)
+        assert False, "expected the on_result error"
+    except BrokenPipeError:
+        pass
+    count = len(sent)
+    time.sleep(0.1)
+    # Workers stopped with the run, and every job they sent was reported
+    assert len(sent) == count < 200
+    assert sorted(reported) == sorted(sent)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
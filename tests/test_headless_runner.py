@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Test script for the headless campaign runner and the messagehub CLI
+"""
+
+import sys
+import os
+import sqlite3
+import subprocess
+import tempfile
+import threading
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import outbox
+from services.campaigns import open_run, run_campaign
+from services.db import init_db
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SETTINGS = {
+    "email_method": "SMTP",
+    "sender_email": "me@example.com",
+    "sender_pwd": "secret",
+    "smtp_server": "smtp.runner.test",
+    "smtp_port": "587",
+    "send_workers": 3,
+    "rate_limits": {"smtp": {"rate": 1000, "burst": 1000, "daily_cap": ""}},
+}
+
+
+class FakeSMTP:
+    sent = []
+    lock = threading.Lock()
+
+    def __init__(self, host, port, timeout=None):
+        pass
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        pass
+
+    def noop(self):
+        return (250, b"OK")
+
+    def sendmail(self, sender, recipient, message):
+        with FakeSMTP.lock:
+            FakeSMTP.sent.append(recipient)
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+def make_campaign(n=12):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO contacts (name, email, mobile) VALUES (?, ?, ?)",
+                     [(f"User {i}", f"u{i}@example.com", f"0171{i:07d}") for i in range(n)])
+    conn.execute("INSERT INTO email_campaigns (name, subject, body) VALUES ('Promo', 'Hi {{name}}', 'Body')")
+    conn.execute("INSERT INTO email_campaign_contacts (campaign_id, contact_id) SELECT 1, id FROM contacts")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_cli_does_not_import_tkinter():
+    out = subprocess.run(
+        [sys.executable, "-c", "import sys, messagehub; print('tkinter' in sys.modules)"],
+        cwd=ROOT, capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == "False"
+
+
+def test_run_campaign_sends_and_records_history():
+    db = make_campaign(12)
+    FakeSMTP.sent = []
+    events = []
+    with mock.patch("smtplib.SMTP", FakeSMTP), \
+            mock.patch("services.email_utils.check_internet_connection", return_value=True):
+        done = run_campaign("email", "Promo", settings=SETTINGS, on_event=events.append, db_file=db)
+    assert (done["sent"], done["failed"], done["pending"]) == (12, 0, 0)
+    assert sorted(FakeSMTP.sent) == sorted(f"u{i}@example.com" for i in range(12))
+    assert events[0]["event"] == "start" and events[-1]["event"] == "done"
+    assert sum(1 for e in events if e["event"] == "result") == 12
+    conn = sqlite3.connect(db)
+    subjects = {row[0] for row in conn.execute("SELECT personalized_subject FROM email_campaign_history")}
+    conn.close()
+    assert "Hi User 3" in subjects
+    assert outbox.Outbox.find_unfinished("email", "Promo", db_file=db) is None
+    os.remove(db)
+
+
+def test_stopped_run_resumes_without_duplicates():
+    db = make_campaign(10)
+    FakeSMTP.sent = []
+    stop = threading.Event()
+    stop.set()
+    with mock.patch("smtplib.SMTP", FakeSMTP), \
+            mock.patch("services.email_utils.check_internet_connection", return_value=True):
+        first = run_campaign("email", "Promo", settings=SETTINGS, stop_event=stop, db_file=db)
+        assert first["pending"] == 10 and not FakeSMTP.sent
+        second = run_campaign("email", "Promo", settings=SETTINGS, db_file=db)
+    assert second["run_id"] == first["run_id"]
+    assert second["sent"] == 10 and len(FakeSMTP.sent) == 10
+    os.remove(db)
+
+
+def test_open_run_asks_before_resuming():
+    db = make_campaign(3)
+    first, _ = open_run("email", "Promo", [1, 2, 3], {"subject": "Old", "body": "B"}, db_file=db)
+    asked = []
+    # The dialogs pass the user's answer as a callable
+    run, payload = open_run("email", "Promo", [1, 2, 3], {"subject": "New", "body": "B"},
+                            resume=lambda left: asked.append(left) or True, db_file=db)
+    assert asked == [3] and run.run_id == first.run_id and payload["subject"] == "Old"
+    fresh, payload = open_run("email", "Promo", [1, 2, 3], {"subject": "New", "body": "B"},
+                              resume=lambda left: False, db_file=db)
+    assert fresh.run_id != first.run_id and payload["subject"] == "New"
+    assert outbox.Outbox.find_unfinished("email", "Promo", db_file=db).run_id == fresh.run_id
+    os.remove(db)
+
+
+def test_invalid_recipients_fail_without_a_send():
+    db = make_campaign(4)
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE contacts SET email='not-an-address' WHERE id=2")
+    conn.commit()
+    conn.close()
+    FakeSMTP.sent = []
+    events = []
+    with mock.patch("smtplib.SMTP", FakeSMTP), \
+            mock.patch("services.email_utils.check_internet_connection", return_value=True):
+        done = run_campaign("email", "Promo", settings=SETTINGS, on_event=events.append, db_file=db)
+    assert events[0]["invalid"] == 1 and done["sent"] == 3 and done["pending"] == 0
+    assert "not-an-address" not in FakeSMTP.sent
+    run = outbox.Outbox(done["run_id"], db)
+    assert run.contact_states()[2] == (outbox.FAILED, "Invalid email")
+    os.remove(db)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
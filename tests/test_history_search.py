@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Test script for the full-text history search (FTS5 indexes kept by triggers)
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import history
+from services.db import init_db
+
+
+def make_db():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("INSERT INTO contacts (id, name, email, mobile) VALUES (1, 'Alice', 'alice@example.com', '01711000001')")
+    conn.execute("INSERT INTO email_campaigns (id, name, subject, body) VALUES (1, 'June Promo', 'Sale', 'Big summer sale')")
+    conn.execute("INSERT INTO email_campaign_history (campaign_id, contact_id, timestamp, status, error) "
+                 "VALUES (1, 1, '2024-06-01 09:00:00', 'Sent', '')")
+    conn.executemany("INSERT INTO email_history (timestamp, subject, body, email, status) VALUES (?, ?, ?, ?, ?)", [
+        ("2024-06-02 10:00:00", "Invoice", "Your invoice is attached", "bob@test.org", "Sent"),
+        ("2024-05-02 10:00:00", "Summer plans", "Summer summer summer", "carol@test.org", "Failed"),
+    ])
+    conn.executemany("INSERT INTO sms_history (timestamp, body, recipient, status) VALUES (?, ?, ?, ?)", [
+        ("2024-06-01 10:00:00", "Your order shipped", "01711000001", "Sent"),
+        ("2024-06-02 10:00:00", "Hello Bob", "01711000002", "Failed: timeout"),
+    ])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_triggers_keep_index_in_sync():
+    path = make_db()
+    try:
+        assert [e[0][1] for e in history.sms_history("order", db_file=path)] == ["01711000001"]
+        assert [e[0][1] for e in history.sms_history("0171100000", db_file=path)] != []
+        conn = sqlite3.connect(path)
+        conn.execute("UPDATE sms_history SET body='Refund issued' WHERE recipient='01711000001'")
+        conn.execute("DELETE FROM email_history WHERE email='bob@test.org'")
+        conn.commit()
+        conn.close()
+        assert history.sms_history("order", db_file=path) == []
+        assert len(history.sms_history("refund", db_file=path)) == 1
+        assert history.email_history("invoice", db_file=path) == []
+    finally:
+        os.remove(path)
+
+
+def test_email_search_covers_campaigns_ranked():
+    path = make_db()
+    try:
+        results = history.email_history("summer", db_file=path)
+        # The direct email mentions "summer" four times; it ranks first
+        assert [row[5] for row, _ in results] == ["Direct", "Campaign"]
+        campaign_row, body = results[1]
+        assert campaign_row[1] == "alice@example.com" and campaign_row[2] == "Campaign: June Promo"
+        assert body == "Big summer sale"
+        # Word prefixes, any order; punctuation in the query is ignored
+        assert len(history.email_history("alice@exam", db_file=path)) == 1
+        assert history.email_history("@@", db_file=path) == []
+        june = history.parse_date_range("2024-06-01 00:00", "2024-06-30 23:59")
+        assert [row[5] for row, _ in history.email_history("summer", june, db_file=path)] == ["Campaign"]
+        assert len(history.email_history("summer", db_file=path, limit=1)) == 1
+    finally:
+        os.remove(path)
+
+
+def test_index_is_built_for_existing_rows():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE sms_history (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, body TEXT, recipient TEXT, status TEXT)")
+        conn.execute("INSERT INTO sms_history (timestamp, body, recipient, status) VALUES ('2024-01-01', 'Legacy row', '017', 'Sent')")
+        conn.commit()
+        conn.close()
+        init_db(path)
+        init_db(path)  # idempotent
+        assert len(history.sms_history("legacy", db_file=path)) == 1
+    finally:
+        os.remove(path)
+
+
+def test_keyset_pages_walk_all_rows_both_ways():
+    path = make_db()
+    try:
+        conn = sqlite3.connect(path)
+        # Many rows share a timestamp across both email tables
+        for i in range(45):
+            stamp = f"2024-03-{i % 4 + 1:02d} 08:00:00"
+            conn.execute("INSERT INTO email_history (timestamp, subject, body, email, status) VALUES (?, ?, '', 'x@y.z', 'Sent')",
+                         (stamp, f"direct {i}"))
+            conn.execute("INSERT INTO email_campaign_history (campaign_id, contact_id, timestamp, status) VALUES (1, 1, ?, 'Sent')",
+                         (stamp,))
+        conn.commit()
+        expected = sorted(
+            [(ts, 0, rid) for rid, ts in conn.execute("SELECT id, ts_ms FROM email_history")]
+            + [(ts, 1, rid) for rid, ts in conn.execute("SELECT id, ts_ms FROM email_campaign_history")],
+            reverse=True)
+        conn.close()
+        assert history.history_total("email", db_file=path) == len(expected) == 93
+
+        pages = [history.history_page("email", page_size=10, db_file=path)]
+        while pages[-1].has_older:
+            pages.append(history.history_page("email", before=pages[-1].last, page_size=10, db_file=path))
+        assert sum(len(page.entries) for page in pages) == 93
+        assert [page.first for page in pages] == expected[::10]
+        assert not pages[0].has_newer
+
+        newer = history.history_page("email", after=pages[3].first, page_size=10, db_file=path)
+        assert newer.first == pages[2].first and newer.entries == pages[2].entries
+        # Paging back past the newest rows gives the first page
+        assert history.history_page("email", after=pages[1].first, page_size=10, db_file=path) == pages[0]
+
+        march_1 = history.parse_date_range("2024-03-01 00:00", "2024-03-01 23:59")
+        assert history.history_total("email", march_1, db_file=path) == 24
+        assert len(history.history_page("email", march_1, db_file=path).entries) == 24
+    finally:
+        os.remove(path)
+
+
+def test_timestamps_migrate_to_utc_epoch_ms():
+    old_tz = os.environ.get("TZ")
+    os.environ["TZ"] = "Asia/Dhaka"  # UTC+6, no DST
+    time.tzset()
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE email_history (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, subject TEXT, body TEXT, email TEXT, status TEXT)")
+        conn.execute("CREATE TABLE email_campaign_history (id INTEGER PRIMARY KEY AUTOINCREMENT, campaign_id INTEGER, contact_id INTEGER, "
+                     "timestamp TEXT, status TEXT, error TEXT, personalized_subject TEXT, personalized_body TEXT)")
+        # Local isoformat vs UTC datetime('now'): as text the direct email
+        # sorts newer, but it was sent half an hour before the campaign one
+        conn.execute("INSERT INTO email_history (timestamp, subject, body, email, status) "
+                     "VALUES ('2024-06-01T14:30:00.250000', 'Direct', '', 'a@b.c', 'Sent')")
+        conn.execute("INSERT INTO email_campaign_history (campaign_id, contact_id, timestamp, status) "
+                     "VALUES (1, 1, '2024-06-01 09:00:00', 'Sent')")
+        conn.commit()
+        conn.close()
+        init_db(path)
+
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT ts_ms FROM email_history").fetchone()[0] == \
+            datetime(2024, 6, 1, 8, 30, 0, 250000, tzinfo=timezone.utc).timestamp() * 1000
+        conn.execute("INSERT INTO sms_history (timestamp, body, recipient, status) VALUES ('2024-06-01T15:10:00', 'Hi', '017', 'Sent')")
+        conn.execute("INSERT INTO sms_history (timestamp, ts_ms, body, recipient, status) VALUES ('', 42, 'Hi', '018', 'Sent')")
+        conn.commit()
+        assert conn.execute("SELECT ts_ms FROM sms_history ORDER BY id").fetchall() == [
+            (int(datetime(2024, 6, 1, 9, 10, tzinfo=timezone.utc).timestamp() * 1000),), (42,)]
+        conn.close()
+
+        rows = [row for row, _ in history.email_history(db_file=path)]
+        assert [(row[0], row[5]) for row in rows] == [("2024-06-01 15:00:00", "Campaign"), ("2024-06-01 14:30:00", "Direct")]
+        afternoon = history.parse_date_range("2024-06-01 14:45", "2024-06-01 15:10")
+        assert [row[5] for row, _ in history.email_history("", afternoon, db_file=path)] == ["Campaign"]
+        assert history.history_total("sms", afternoon, db_file=path) == 1
+    finally:
+        os.remove(path)
+        if old_tz is None:
+            os.environ.pop("TZ", None)
+        else:
+            os.environ["TZ"] = old_tz
+        time.tzset()
+
+
+if __name__ == "__main__":
+    for test in (test_triggers_keep_index_in_sync, test_email_search_covers_campaigns_ranked,
+                 test_index_is_built_for_existing_rows, test_keyset_pages_walk_all_rows_both_ways,
+                 test_timestamps_migrate_to_utc_epoch_ms):
+        test()
+        print(f"✅ {test.__name__}")
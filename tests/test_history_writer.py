@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test the write-behind history writer: batched flushes, shutdown flush and
+outbox reconciliation of results that were never flushed
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import db, outbox
+from services.db import init_db
+from services.history_writer import HistoryWriter
+
+
+def make_run(n=10):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.executemany("INSERT INTO contacts (id, name, email, mobile) VALUES (?, ?, ?, ?)",
+                     [(i, f"User {i}", f"u{i}@example.com", f"0171{i:07d}") for i in range(1, n + 1)])
+    conn.commit()
+    conn.close()
+    run = outbox.Outbox.create('email', 'Promo', range(1, n + 1), db_file=path)
+    return path, run, list(run.iter_contacts(n))
+
+
+def history_count(path, table="email_campaign_history"):
+    conn = sqlite3.connect(path)
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_results_are_written_in_batches():
+    path, run, contacts = make_run(10)
+    commits = []
+    try:
+        writer = HistoryWriter(run.run_id, path, max_rows=4, max_delay_ms=60000)
+        writer._write = (lambda write: lambda batch: commits.append(len(batch)) or write(batch))(writer._write)
+        for contact in contacts[:8]:
+            writer.email_result(1, contact, "Hi {{name}}", "For {{email}}", True, "")
+        deadline = time.time() + 5
+        while history_count(path) < 8 and time.time() < deadline:
+            time.sleep(0.01)
+        assert history_count(path) == 8
+        writer.email_result(1, contacts[8], "Hi {{name}}", "For {{email}}", False, "bounced")
+        writer.close()
+        assert sum(commits) == 9 and len(commits) <= 3
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT personalized_subject, personalized_body FROM email_campaign_history "
+                            "WHERE contact_id=1").fetchone() == ("Hi User 1", "For u1@example.com")
+        assert conn.execute("SELECT status, error FROM email_campaign_history WHERE contact_id=9").fetchone() == \
+            ("Failed", "bounced")
+        conn.close()
+        counts = run.counts()
+        assert counts[outbox.SENT] == 8 and counts[outbox.FAILED] == 1 and counts[outbox.IN_FLIGHT] == 1
+    finally:
+        db.close_connections()
+        os.remove(path)
+
+
+def test_flushes_after_max_delay():
+    path, run, contacts = make_run(2)
+    try:
+        writer = HistoryWriter(run.run_id, path, max_rows=500, max_delay_ms=50)
+        writer.sms_result(1, "01710000001", "Hello", True, "")
+        deadline = time.time() + 5
+        while history_count(path, "sms_history") < 1 and time.time() < deadline:
+            time.sleep(0.01)
+        assert history_count(path, "sms_history") == 1
+        assert run.contact_states()[1] == (outbox.SENT, "")
+        writer.close()
+    finally:
+        db.close_connections()
+        os.remove(path)
+
+
+def test_unflushed_results_are_failed_not_resent():
+    path, run, contacts = make_run(3)
+    try:
+        writer = HistoryWriter(run.run_id, path, max_rows=500, max_delay_ms=0)
+
+        def disk_full(batch):
+            raise sqlite3.OperationalError("database or disk is full")
+        writer._write = disk_full
+        writer.email_result(1, contacts[0], "S", "B", True, "")
+        try:
+            writer.close(timeout=5)
+            assert False, "close() should report the failed write"
+        except sqlite3.OperationalError:
+            pass
+        assert history_count(path) == 0
+        assert run.counts()[outbox.IN_FLIGHT] == 3
+
+        resumed = outbox.Outbox(run.run_id, path, lease_seconds=0)
+        conn = db.connect(path)
+        conn.execute("UPDATE send_outbox SET lease_until=0")
+        assert resumed.recover() == 3
+        assert resumed.contact_states()[1] == (outbox.FAILED, outbox.INTERRUPTED_ERROR)
+        assert list(resumed.iter_contacts()) == []
+    finally:
+        db.close_connections()
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for test in (test_results_are_written_in_batches, test_flushes_after_max_delay,
+                 test_unflushed_results_are_failed_not_resent):
+        test()
+        print(f"✅ {test.__name__}")
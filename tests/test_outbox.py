@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Test script for the persistent send outbox and crash-safe resume
+"""
+
+import sys
+import os
+import sqlite3
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import outbox
+from services.dispatcher import CampaignDispatcher
+from services.rate_limit import RateLimiter
+
+
+def make_db(n=20):
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE contacts (id INTEGER PRIMARY KEY, name TEXT, email TEXT, mobile TEXT)")
+    conn.executemany("INSERT INTO contacts VALUES (?, ?, ?, ?)",
+                     [(i, f"User {i}", f"u{i}@example.com", f"0171{i:07d}") for i in range(1, n + 1)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def send_all(run, db_file, on_send, limiter=None):
+    conn = sqlite3.connect(db_file)
+
+    def on_result(result):
+        outbox.settle(conn.cursor(), run.run_id, result.job[0], result.ok, result.error)
+        conn.commit()
+
+    dispatcher = CampaignDispatcher(on_send, workers=3, limiter=limiter)
+    dispatcher.run(run.iter_contacts(4), on_result)
+    conn.close()
+    run.release()
+    return dispatcher
+
+
+def test_resume_after_daily_cap_sends_each_contact_once():
+    db = make_db(20)
+    sent = []
+    run = outbox.Outbox.create('email', 'Promo', range(1, 21), {'subject': 'S'}, db_file=db)
+    send_all(run, db, lambda c: sent.append(c[0]), limiter=RateLimiter(1000, 1000, daily_cap=7))
+    assert len(sent) == 7
+    counts = run.counts()
+    assert counts[outbox.SENT] == 7 and counts[outbox.PENDING] == 13 and counts[outbox.IN_FLIGHT] == 0
+
+    resumed = outbox.Outbox.find_unfinished('email', 'Promo', db_file=db)
+    assert resumed.run_id == run.run_id and resumed.payload == {'subject': 'S'}
+    send_all(resumed, db, lambda c: sent.append(c[0]))
+    assert sorted(sent) == list(range(1, 21))
+    os.remove(db)
+
+
+def test_crash_leaves_unleased_rows_pending():
+    db = make_db(20)
+    run = outbox.Outbox.create('sms', 'Alert', range(1, 21), db_file=db)
+    run.lease_seconds = 0
+    # Simulate a process that leased a batch, settled one row and died
+    contacts = run.iter_contacts(5)
+    first = next(contacts)
+    conn = sqlite3.connect(db)
+    outbox.settle(conn.cursor(), run.run_id, first[0], True)
+    conn.commit()
+    conn.close()
+    del contacts
+    time.sleep(0.01)
+
+    assert run.recover() == 4
+    counts = run.counts()
+    assert counts[outbox.SENT] == 1 and counts[outbox.FAILED] == 4 and counts[outbox.PENDING] == 15
+    states = run.contact_states()
+    assert states[2] == (outbox.FAILED, outbox.INTERRUPTED_ERROR)
+    os.remove(db)
+
+
+def test_resume_within_lease_seconds_does_not_resend():
+    db = make_db(20)
+    run = outbox.Outbox.create('email', 'Quick', range(1, 21), db_file=db)
+    # A process leased 1-4 and died; the app is restarted before the lease runs out
+    contacts = run.iter_contacts(4)
+    next(contacts)
+    del contacts
+
+    sent = []
+    resumed = outbox.Outbox.find_unfinished('email', 'Quick', db_file=db)
+    assert resumed.recover() == 0
+    send_all(resumed, db, lambda c: sent.append(c[0]))
+    assert sorted(sent) == list(range(5, 21))
+    # release() left the crashed process's leases alone
+    assert resumed.counts()[outbox.IN_FLIGHT] == 4
+
+    conn = sqlite3.connect(db)
+    conn.execute("UPDATE send_outbox SET lease_until=0 WHERE state=?", (outbox.IN_FLIGHT,))
+    conn.commit()
+    conn.close()
+    later = outbox.Outbox.find_unfinished('email', 'Quick', db_file=db)
+    assert later.recover() == 4
+    send_all(later, db, lambda c: sent.append(c[0]))
+    assert sorted(sent) == list(range(5, 21))
+    assert later.contact_states()[1] == (outbox.FAILED, outbox.INTERRUPTED_ERROR)
+    os.remove(db)
+
+
+def test_deleted_contact_is_failed_not_sent():
+    db = make_db(5)
+    run = outbox.Outbox.create('email', 'X', [1, 2, 99], db_file=db)
+    assert [row[0] for row in run.iter_contacts(10)] == [1, 2]
+    assert run.contact_states()[99][0] == outbox.FAILED
+    os.remove(db)
+
+
+def test_finished_run_not_offered():
+    db = make_db(2)
+    run = outbox.Outbox.create('email', 'Done', [1, 2], db_file=db)
+    run.finish()
+    assert outbox.Outbox.find_unfinished('email', 'Done', db_file=db) is None
+    os.remove(db)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the thread-safe progress bus used by the send dialogs
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from features.progress import ProgressBus
+
+
+class FakeWidget:
+    """Collects after() callbacks instead of running a Tk main loop"""
+
+    def __init__(self):
+        self.scheduled = []
+
+    def after(self, ms, func):
+        self.scheduled.append(func)
+
+    def run_frame(self):
+        func = self.scheduled.pop(0)
+        func()
+
+
+def test_updates_coalesced_per_frame():
+    frames = []
+    widget = FakeWidget()
+    bus = ProgressBus(widget, lambda updates, closing: frames.append((dict(updates), closing)))
+    bus.start()
+    for i in range(100):
+        bus.post("counts", i)
+        bus.post(("row", i % 3), f"status {i}")
+    widget.run_frame()
+    updates, closing = frames[0]
+    assert updates == {"counts": 99, ("row", 0): "status 99", ("row", 1): "status 97", ("row", 2): "status 98"}
+    assert not closing
+    # The drain reschedules itself
+    assert len(widget.scheduled) == 1
+
+
+def test_posting_from_threads_never_touches_widget():
+    applied = []
+    widget = FakeWidget()
+    bus = ProgressBus(widget, lambda updates, closing: applied.append(updates))
+    bus.start()
+    threads = [threading.Thread(target=lambda n=n: [bus.post(("row", n), j) for j in range(1000)]) for n in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # Nothing ran until the main loop drained
+    assert applied == []
+    widget.run_frame()
+    assert applied[0] == {("row", n): 999 for n in range(8)}
+
+
+def test_close_stops_after_final_frame():
+    frames = []
+    widget = FakeWidget()
+    bus = ProgressBus(widget, lambda updates, closing: frames.append((dict(updates), closing)))
+    bus.start()
+    bus.post("counts", 1)
+    bus.close()
+    widget.run_frame()
+    assert frames == [({"counts": 1}, True)]
+    assert widget.scheduled == []
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
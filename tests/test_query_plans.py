@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Query-plan regression test: history, dashboard and dedup queries must use an
+index when the history tables hold a million rows
+"""
+
+import sys
+import os
+import re
+import sqlite3
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import db, history
+from services.db import init_db
+
+BIG = 1000000
+# Tables that stay small however much is sent; scanning them is fine
+SMALL = {"campaigns": 50, "email_campaigns": 50, "sms_campaigns": 50, "outbox_runs": 200,
+         "groups": 20, "history_counts": 3}
+
+DATES = history.parse_date_range("2024-01-01 00:00", "2024-01-31 23:59")
+# A paging cursor's ts_ms, mid-range
+CURSOR_MS = history.parse_date_range("2024-01-05 10:00", "2024-01-05 10:00")[0]
+
+DASHBOARD_QUERIES = [
+    # messagehub list
+    ("SELECT c.name, COUNT(cc.contact_id) FROM email_campaigns c "
+     "LEFT JOIN email_campaign_contacts cc ON cc.campaign_id = c.id GROUP BY c.id ORDER BY c.name", ()),
+    ("SELECT c.name, COUNT(cc.contact_id) FROM sms_campaigns c "
+     "LEFT JOIN sms_campaign_contacts cc ON cc.campaign_id = c.id GROUP BY c.id ORDER BY c.name", ()),
+    # Send progress
+    ("SELECT state, COUNT(*) FROM send_outbox WHERE run_id=? GROUP BY state", (1,)),
+    ("SELECT status, COUNT(*) FROM email_campaign_history WHERE campaign_id=? GROUP BY status", (1,)),
+    ("SELECT COUNT(*) FROM sms_history WHERE status=?", ("Sent",)),
+]
+
+DEDUP_QUERIES = [
+    ("SELECT id FROM contacts WHERE email=?", ("a@b.c",)),
+    ("SELECT 1 FROM email_campaign_history WHERE campaign_id=? AND contact_id=? AND status='Sent'", (1, 2)),
+    ("SELECT 1 FROM email_history WHERE email=? AND subject=?", ("a@b.c", "Hi")),
+    ("SELECT 1 FROM sms_history WHERE recipient=? AND body=?", ("01711000001", "Hi")),
+    ("SELECT contact_id FROM send_outbox WHERE run_id=? AND state=? ORDER BY id LIMIT ?", (1, "pending", 100)),
+    ("DELETE FROM group_members WHERE contact_id=?", (1,)),
+]
+
+
+def make_db():
+    """A fresh database whose planner statistics describe 1M-row tables."""
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    init_db(path)
+    conn = sqlite3.connect(path)
+    conn.execute("ANALYZE")
+    conn.execute("DELETE FROM sqlite_stat1")
+    tables = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND sql NOT LIKE 'CREATE VIRTUAL%' "
+        "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE '%_fts%'")]
+    for table in tables:
+        rows = SMALL.get(table, BIG)
+        conn.execute("INSERT INTO sqlite_stat1 VALUES (?, NULL, ?)", (table, str(rows)))
+        for _, index, unique, *_ in conn.execute(f"PRAGMA index_list({table})").fetchall():
+            width = len(conn.execute(f"PRAGMA index_info({index})").fetchall())
+            # Unique indexes narrow to one row; others to a handful, except
+            # status columns which only hold a few distinct values
+            per_value = "1" if unique else ("100000" if index.endswith("_status") else "10")
+            conn.execute("INSERT INTO sqlite_stat1 VALUES (?, ?, ?)",
+                         (table, index, " ".join([str(rows)] + [per_value] * width)))
+    conn.commit()
+    conn.close()
+    return path
+
+
+def full_scans(conn, sql, params=()):
+    """Tables the plan reads end to end without an index."""
+    aliases = dict((alias, table) for table, alias in
+                   re.findall(r"(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(\w+)", sql, re.IGNORECASE))
+    scans = []
+    for _, _, _, detail in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+        if not detail.startswith("SCAN ") or "USING" in detail or "VIRTUAL TABLE" in detail:
+            continue
+        name = detail.split()[1]
+        if name.startswith("(") or name.startswith("main.") or aliases.get(name, name) in SMALL:
+            continue
+        scans.append(detail)
+    return scans
+
+
+def history_statements(path):
+    """The SELECTs the history service runs while paging, counting and searching."""
+    captured = []
+    conn = db.connect(path)
+    conn.set_trace_callback(captured.append)
+    try:
+        for channel in ("email", "sms"):
+            history.history_page(channel, db_file=path)
+            history.history_page(channel, DATES, db_file=path)
+            history.history_page(channel, before=(CURSOR_MS, 1, 10), db_file=path)
+            history.history_page(channel, DATES, after=(CURSOR_MS, 0, 10), db_file=path)
+            history.history_total(channel, db_file=path)
+            history.history_total(channel, DATES, db_file=path)
+        history.email_history("invoice", DATES, db_file=path)
+        history.sms_history("order", db_file=path)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in captured if sql.lstrip().upper().startswith("SELECT")]
+
+
+def test_history_queries_use_indexes():
+    path = make_db()
+    try:
+        statements = history_statements(path)
+        assert len(statements) >= 16
+        conn = sqlite3.connect(path)
+        for sql in statements:
+            assert full_scans(conn, sql) == [], sql
+        conn.close()
+    finally:
+        os.remove(path)
+
+
+def test_dashboard_and_dedup_queries_use_indexes():
+    path = make_db()
+    try:
+        conn = sqlite3.connect(path)
+        for sql, params in DASHBOARD_QUERIES + DEDUP_QUERIES:
+            assert full_scans(conn, sql, params) == [], sql
+        conn.close()
+    finally:
+        os.remove(path)
+
+
+def test_check_catches_a_missing_index():
+    path = make_db()
+    try:
+        conn = sqlite3.connect(path)
+        conn.execute("DROP INDEX idx_sms_history_ts_ms")
+        assert full_scans(conn, "SELECT COUNT(*) FROM sms_history WHERE ts_ms BETWEEN ? AND ?", DATES)
+        conn.close()
+    finally:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    for test in (test_history_queries_use_indexes, test_dashboard_and_dedup_queries_use_indexes,
+                 test_check_catches_a_missing_index):
+        test()
+        print(f"✅ {test.__name__}")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the token-bucket rate limiter and provider profiles
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import db, rate_limit
+from services.rate_limit import TokenBucket, RateLimiter, DailyCapExceeded
+
+
+def test_burst_is_immediate_then_rate_applies():
+    bucket = TokenBucket(rate=20, burst=5)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    assert time.monotonic() - start < 0.05
+    for _ in range(5):
+        bucket.acquire()
+    # 5 tokens beyond the burst at 20/s take about 0.25 s
+    assert time.monotonic() - start >= 0.2
+
+
+def test_daily_cap():
+    limiter = RateLimiter(rate=1000, burst=1000, daily_cap=3)
+    for _ in range(3):
+        limiter.acquire()
+    try:
+        limiter.acquire()
+        assert False, "expected DailyCapExceeded"
+    except DailyCapExceeded:
+        pass
+    assert limiter.sent_today == 3
+
+
+def test_daily_cap_survives_restart():
+    fd, path = tempfile.mkstemp(suffix=".db")
+    os.close(fd)
+    try:
+        limiter = RateLimiter(rate=1000, burst=1000, daily_cap=5, key="ses", db_file=path)
+        limiter.acquire(3)
+        # A new process (or headless run) starts from today's stored count
+        restarted = RateLimiter(rate=1000, burst=1000, daily_cap=5, key="ses", db_file=path)
+        assert restarted.sent_today == 3
+        restarted.acquire(2)
+        try:
+            restarted.acquire()
+            assert False, "expected DailyCapExceeded"
+        except DailyCapExceeded:
+            pass
+        assert limiter.sent_today == 5
+        # Other providers have their own count
+        assert RateLimiter(1000, 1000, daily_cap=5, key="smtp:a", db_file=path).sent_today == 0
+    finally:
+        db.close_connections()
+        os.remove(path)
+
+
+def test_profile_overrides_from_settings():
+    settings = {"rate_limits": {"ses": {"rate": 50, "daily_cap": None}, "smtp.example.com": {"rate": 1}}}
+    assert rate_limit.get_profile("ses", settings) == {"rate": 50, "burst": 14, "daily_cap": None}
+    assert rate_limit.get_profile("smtp", settings, host="smtp.example.com")["rate"] == 1
+    assert rate_limit.get_profile("smtp", settings, host="other.example.com")["rate"] == rate_limit.DEFAULT_PROFILES["smtp"]["rate"]
+
+
+def test_limiter_shared_per_provider():
+    settings = {}
+    assert rate_limit.get_limiter("sendgrid", settings) is rate_limit.get_limiter("sendgrid", settings)
+    assert rate_limit.get_limiter("smtp", settings, host="a") is not rate_limit.get_limiter("smtp", settings, host="b")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
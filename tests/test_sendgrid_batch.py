@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled SendGrid session and batched personalizations
+"""
+
+import sys
+import os
+from unittest import mock
+
+import requests
+import urllib3.exceptions
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services import email_utils
+
+
+class FakeResponse:
+    def __init__(self, status_code, text=""):
+        self.status_code = status_code
+        self.text = text
+
+
+def test_session_shared_between_sends():
+    assert email_utils.get_sendgrid_session() is email_utils.get_sendgrid_session()
+
+
+def test_batch_builds_one_personalization_per_recipient():
+    session = email_utils.get_sendgrid_session()
+    with mock.patch.object(session, "post", return_value=FakeResponse(202)) as post:
+        results = email_utils.send_bulk_email_sendgrid(
+            "key", "me@example.com",
+            [("a@example.com", "Ann", "017"), ("b@example.com", None, None)],
+            "Hi {{ name }}", "Dear {{name}} ({{ mobile }})", "Me"
+        )
+    assert results == [(True, ""), (True, "")]
+    assert post.call_count == 1
+    data = post.call_args.kwargs["json"]
+    first, second = data["personalizations"]
+    assert first["to"] == [{"email": "a@example.com"}]
+    assert first["subject"] == "Hi Ann"
+    assert first["substitutions"] == {"{{name}}": "Ann", "{{email}}": "a@example.com", "{{mobile}}": "017"}
+    assert second["substitutions"]["{{name}}"] == ""
+    assert data["content"][0]["value"] == "Dear {{name}} ({{mobile}})"
+    assert data["from"] == {"email": "me@example.com", "name": "Me"}
+
+
+def test_batch_error_raised_for_whole_request():
+    session = email_utils.get_sendgrid_session()
+    with mock.patch.object(session, "post", return_value=FakeResponse(400, "bad request")) as post, \
+            mock.patch("time.sleep"):
+        try:
+            email_utils.send_bulk_email_sendgrid("key", "me@example.com", [("a@example.com", "", "")], "S", "B")
+            assert False, "expected SendGrid error"
+        except Exception as e:
+            assert "400" in str(e)
+    # A client error is not retried
+    assert post.call_count == 1
+
+
+def test_only_unsent_or_throttled_requests_are_retried():
+    session = email_utils.get_sendgrid_session()
+    recipients = [("a@example.com", "", "")]
+    refused = requests.ConnectionError(urllib3.exceptions.MaxRetryError(
+        None, "/v3/mail/send", urllib3.exceptions.NewConnectionError(None, "Connection refused")))
+    with mock.patch.object(session, "post", side_effect=[refused, FakeResponse(429), FakeResponse(503),
+                                                         FakeResponse(202)]) as post, \
+            mock.patch("time.sleep"):
+        try:
+            email_utils.send_bulk_email_sendgrid("key", "me@example.com", recipients, "S", "B")
+            assert False, "expected the third failure to be raised"
+        except email_utils.SendGridTransientError as e:
+            assert "503" in str(e)
+        assert post.call_count == 3
+        assert email_utils.send_bulk_email_sendgrid("key", "me@example.com", recipients, "S", "B") == [(True, "")]
+
+    # SendGrid may have accepted a request whose reply never came: no resend
+    for error in (requests.ReadTimeout("read timed out"), requests.ConnectionError("Connection aborted")):
+        with mock.patch.object(session, "post", side_effect=error) as post, mock.patch("time.sleep"):
+            try:
+                email_utils.send_bulk_email_sendgrid("key", "me@example.com", recipients, "S", "B")
+                assert False, "expected the error to be raised"
+            except Exception as e:
+                assert "no response" in str(e)
+            assert post.call_count == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test script for the cached SES client and the bulk templated send path
+"""
+
+import sys
+import os
+import json
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from botocore.exceptions import ClientError, ReadTimeoutError
+from services import email_utils
+
+
+class FakeSES:
+    """Stand-in for a boto3 SES client"""
+
+    def __init__(self):
+        self.templates = {}
+        self.bulk_calls = []
+
+    def create_template(self, Template):
+        if Template['TemplateName'] in self.templates:
+            raise ClientError({'Error': {'Code': 'AlreadyExists', 'Message': 'exists'}}, 'CreateTemplate')
+        self.templates[Template['TemplateName']] = Template
+
+    def delete_template(self, TemplateName):
+        self.templates.pop(TemplateName, None)
+
+    def send_bulk_templated_email(self, **kwargs):
+        if kwargs['Template'] not in self.templates:
+            raise ClientError({'Error': {'Code': 'TemplateDoesNotExist', 'Message': 'missing'}},
+                              'SendBulkTemplatedEmail')
+        self.bulk_calls.append(kwargs)
+        status = []
+        for dest in kwargs['Destinations']:
+            email = dest['Destination']['ToAddresses'][0]
+            if email.startswith("bad"):
+                status.append({'Status': 'MessageRejected', 'Error': 'Address blacklisted'})
+            else:
+                status.append({'Status': 'Success', 'MessageId': email})
+        return {'Status': status}
+
+
+def test_client_built_once_per_credentials():
+    email_utils._ses_clients.clear()
+    with mock.patch("boto3.session.Session") as session:
+        first = email_utils.get_ses_client("AK", "SK", "us-east-1")
+        second = email_utils.get_ses_client("AK", "SK", "us-east-1")
+        assert first is second
+        assert session.call_count == 1
+        email_utils.get_ses_client("AK", "SK2", "us-east-1")
+        assert session.call_count == 2
+
+
+def test_placeholder_detection():
+    assert email_utils.uses_only_contact_placeholders("Hi {{name}}", "Mail {{ email }} / {{mobile}}")
+    assert email_utils.uses_only_contact_placeholders("No placeholders")
+    assert not email_utils.uses_only_contact_placeholders("Hi {{name}}", "Code {{coupon}}")
+
+
+def test_bulk_send_reports_per_recipient():
+    fake = FakeSES()
+    email_utils._ses_templates.clear()
+    with mock.patch.object(email_utils, "get_ses_client", return_value=fake):
+        results = email_utils.send_bulk_email_ses(
+            "AK", "SK", "us-east-1", "me@example.com",
+            [("a@example.com", "Tom & Jerry", None), ("bad@example.com", "B", "017")],
+            "Hello {{name}}", "Hi {{name}}, your number is {{mobile}}",
+        )
+    assert results[0] == (True, "")
+    assert not results[1][0] and "blacklisted" in results[1][1]
+    call = fake.bulk_calls[0]
+    template = fake.templates[call['Template']]
+    # Triple braces keep Handlebars from escaping "&"
+    assert template['TextPart'] == "Hi {{{name}}}, your number is {{{mobile}}}"
+    assert json.loads(call['Destinations'][0]['ReplacementTemplateData'])['name'] == "Tom & Jerry"
+    assert json.loads(call['Destinations'][0]['ReplacementTemplateData'])['mobile'] == ""
+
+
+def test_existing_template_is_reused():
+    fake = FakeSES()
+    email_utils._ses_templates.clear()
+    name = email_utils.ensure_ses_template(fake, "AK", "us-east-1", "S", "B {{name}}")
+    email_utils._ses_templates.clear()
+    assert email_utils.ensure_ses_template(fake, "AK", "us-east-1", "S", "B {{name}}") == name
+    assert len(fake.templates) == 1
+
+
+def test_spaced_placeholders_fill_the_same_on_every_path():
+    assert email_utils.personalize("Hi {{ name }}, {{email}} {{ mobile}}", "Ann", "a@x.com", None) == "Hi Ann, a@x.com "
+    assert email_utils.personalize("Code {{ coupon }}", "Ann", "a@x.com", "") == "Code {{ coupon }}"
+    fake = FakeSES()
+    email_utils._ses_templates.clear()
+    name = email_utils.ensure_ses_template(fake, "AK", "us-east-1", "Hi {{ name }}", "B")
+    assert fake.templates[name]['SubjectPart'] == "Hi {{{name}}}"
+
+
+def test_template_deleted_after_send_and_recreated_if_needed():
+    fake = FakeSES()
+    email_utils._ses_templates.clear()
+    args = ("AK", "SK", "us-east-1")
+    with mock.patch.object(email_utils, "get_ses_client", return_value=fake), mock.patch("time.sleep"):
+        email_utils.send_bulk_email_ses(*args, "me@example.com", [("a@example.com", "A", "")], "S", "B {{name}}")
+        assert len(fake.templates) == 1
+        email_utils.delete_ses_template(*args, "S", "B {{name}}")
+        assert fake.templates == {}
+        # Another send of the same content had the template deleted under it
+        email_utils._ses_templates.add(("AK", "us-east-1", email_utils.ses_template_name("S", "B {{name}}")))
+        results = email_utils.send_bulk_email_ses(*args, "me@example.com", [("b@example.com", "B", "")],
+                                                  "S", "B {{name}}")
+        assert results == [(True, "")] and len(fake.templates) == 1
+
+
+def test_templates_are_tracked_per_account_and_region():
+    first, second = FakeSES(), FakeSES()
+    email_utils._ses_templates.clear()
+    name = email_utils.ensure_ses_template(first, "AK", "us-east-1", "S", "B")
+    assert email_utils.ensure_ses_template(second, "AK", "eu-west-1", "S", "B") == name
+    assert name in second.templates
+
+
+def test_bulk_send_retries_only_refused_calls():
+    class FlakySES(FakeSES):
+        def __init__(self, errors):
+            super().__init__()
+            self.errors = list(errors)
+            self.attempts = 0
+
+        def send_bulk_templated_email(self, **kwargs):
+            self.attempts += 1
+            if self.errors:
+                raise self.errors.pop(0)
+            return super().send_bulk_templated_email(**kwargs)
+
+    throttled = ClientError({'Error': {'Code': 'Throttling', 'Message': 'slow down'}}, 'SendBulkTemplatedEmail')
+    unavailable = ClientError({'Error': {'Code': 'ServiceUnavailable', 'Message': 'down'},
+                               'ResponseMetadata': {'HTTPStatusCode': 503}}, 'SendBulkTemplatedEmail')
+    recipients = [("a@example.com", "A", "")]
+    email_utils._ses_templates.clear()
+    fake = FlakySES([throttled, unavailable])
+    with mock.patch.object(email_utils, "get_ses_client", return_value=fake), mock.patch("time.sleep"):
+        assert email_utils.send_bulk_email_ses("AK", "SK", "us-east-1", "me@example.com", recipients,
+                                               "S", "B") == [(True, "")]
+    assert fake.attempts == 3
+
+    # SES may have accepted a batch whose reply was lost: no resend
+    for error in (ReadTimeoutError(endpoint_url="https://email"),
+                  ClientError({'Error': {'Code': 'MessageRejected', 'Message': 'no'}}, 'SendBulkTemplatedEmail')):
+        fake = FlakySES([error])
+        with mock.patch.object(email_utils, "get_ses_client", return_value=fake), mock.patch("time.sleep"):
+            try:
+                email_utils.send_bulk_email_ses("AK", "SK", "us-east-1", "me@example.com", recipients, "S", "B")
+                assert False, "expected the error to be raised"
+            except Exception as e:
+                assert not isinstance(e, email_utils.SESTransientError)
+        assert fake.attempts == 1
+
+
+def test_bulk_send_rejects_oversized_batch():
+    recipients = [(f"u{i}@example.com", "", "") for i in range(email_utils.SES_BULK_MAX_DESTINATIONS + 1)]
+    try:
+        email_utils.send_bulk_email_ses("AK", "SK", "us-east-1", "me@example.com", recipients, "S", "B")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled SMS gateway client, run against a local HTTP stand-in
+"""
+
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.sms_gateway import SmsGatewayClient
+
+
+class FakeGateway(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests_seen = []
+    connections = set()
+    fail_first = 0
+    delay = 0
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        self.respond(parse_qs(self.rfile.read(length).decode()))
+
+    def do_GET(self):
+        self.respond(parse_qs(urlparse(self.path).query))
+
+    def respond(self, query):
+        cls = FakeGateway
+        with cls.lock:
+            cls.requests_seen.append(query)
+            cls.connections.add(self.client_address)
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+            fail = cls.fail_first > 0
+            cls.fail_first -= 1
+        time.sleep(cls.delay)
+        number = query["number"][0]
+        if fail:
+            status, body = 503, "busy"
+        elif number.startswith("000"):
+            status, body = 200, "Invalid number"
+        else:
+            status, body = 200, "SMS Send Success"
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        with cls.lock:
+            cls.in_flight -= 1
+
+    def log_message(self, *args):
+        pass
+
+
+def start_gateway(fail_first=0, delay=0):
+    FakeGateway.requests_seen = []
+    FakeGateway.connections = set()
+    FakeGateway.fail_first = fail_first
+    FakeGateway.delay = delay
+    FakeGateway.in_flight = FakeGateway.max_in_flight = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeGateway)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/api/smsapi"
+
+
+def test_connection_kept_alive():
+    server, url = start_gateway()
+    try:
+        client = SmsGatewayClient("key", "SENDER", url, max_in_flight=1)
+        results = [client.send(f"0171000000{i}", "hi") for i in range(5)]
+        assert all(r.ok for r in results)
+        assert len(FakeGateway.connections) == 1
+        assert FakeGateway.requests_seen[0]["senderid"] == ["SENDER"]
+    finally:
+        server.shutdown()
+
+
+def test_5xx_retried_then_succeeds():
+    server, url = start_gateway(fail_first=2)
+    try:
+        client = SmsGatewayClient("key", "SENDER", url)
+        with mock.patch("time.sleep"):
+            result = client.send("01710000000", "hi")
+        assert result.ok
+        assert len(FakeGateway.requests_seen) == 3
+    finally:
+        server.shutdown()
+
+
+def test_rejection_not_retried():
+    server, url = start_gateway()
+    try:
+        result = SmsGatewayClient("key", "SENDER", url).send("0001", "hi")
+        assert not result.ok and result.detail == "Invalid number"
+        assert len(FakeGateway.requests_seen) == 1
+    finally:
+        server.shutdown()
+
+
+def test_send_many_bounded_concurrency():
+    server, url = start_gateway(delay=0.05)
+    try:
+        client = SmsGatewayClient("key", "SENDER", url, max_in_flight=4)
+        seen = []
+        jobs = [(i, f"0000{i}" if i == 3 else f"0171{i}", f"hi {i}") for i in range(16)]
+        start = time.monotonic()
+        success, failed = client.send_many(jobs, seen.append)
+        elapsed = time.monotonic() - start
+        assert (success, failed) == (15, 1), [r.error for r in seen if not r.ok]
+        assert FakeGateway.max_in_flight <= 4
+        # 16 requests x 50 ms serially would take 0.8 s
+        assert elapsed < 0.6, elapsed
+        assert [r.job[0][0] for r in seen if not r.ok] == [3]
+    finally:
+        server.shutdown()
+
+
+def test_identical_messages_grouped():
+    server, url = start_gateway()
+    try:
+        client = SmsGatewayClient("key", "SENDER", url)
+        jobs = [(i, f"0171{i}", "Sale today") for i in range(5)] + [(9, "01799", "Hi Ann")]
+        seen = []
+        client.send_many(jobs, seen.append, batch_size=3)
+        # 5 identical messages in batches of 3, plus one unique message
+        assert len(FakeGateway.requests_seen) == 3
+        assert sorted(len(r.job) for r in seen) == [1, 2, 3]
+        assert sorted(job[0] for r in seen for job in r.job) == [0, 1, 2, 3, 4, 9]
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
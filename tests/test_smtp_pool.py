@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled SMTP session manager
+"""
+
+import sys
+import os
+import smtplib
+from unittest import mock
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.smtp_pool import SMTPConnectionPool
+
+
+class FakeSMTP:
+    """Stand-in for smtplib.SMTP that records handshakes and sends"""
+    instances = []
+
+    def __init__(self, host, port, timeout=None):
+        self.sent = []
+        self.logins = 0
+        self.noops = 0
+        self.fail_next = None
+        self.closed = False
+        FakeSMTP.instances.append(self)
+
+    def starttls(self):
+        pass
+
+    def login(self, user, password):
+        self.logins += 1
+
+    def noop(self):
+        self.noops += 1
+        return (250, b"OK")
+
+    def sendmail(self, sender, recipient, message):
+        if self.fail_next:
+            error, self.fail_next = self.fail_next, None
+            raise error
+        self.sent.append(recipient)
+
+    def quit(self):
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    FakeSMTP.instances = []
+    return SMTPConnectionPool("smtp.example.com", 587, "me@example.com", "secret", **kwargs)
+
+
+def test_connection_reused_between_sends():
+    with mock.patch("smtplib.SMTP", FakeSMTP):
+        pool = make_pool(size=2)
+        for i in range(10):
+            pool.sendmail(f"user{i}@example.com", "body")
+        assert len(FakeSMTP.instances) == 1
+        assert FakeSMTP.instances[0].logins == 1
+        assert len(FakeSMTP.instances[0].sent) == 10
+
+
+def test_connection_recycled_after_max_messages():
+    with mock.patch("smtplib.SMTP", FakeSMTP):
+        pool = make_pool(size=1, max_messages=3)
+        for i in range(7):
+            pool.sendmail(f"user{i}@example.com", "body")
+        assert len(FakeSMTP.instances) == 3
+        assert FakeSMTP.instances[0].closed and FakeSMTP.instances[1].closed
+
+
+def test_reconnect_on_421():
+    with mock.patch("smtplib.SMTP", FakeSMTP):
+        pool = make_pool(size=1)
+        pool.sendmail("first@example.com", "body")
+        FakeSMTP.instances[0].fail_next = smtplib.SMTPResponseException(421, b"closing")
+        pool.sendmail("second@example.com", "body")
+        assert len(FakeSMTP.instances) == 2
+        assert FakeSMTP.instances[1].sent == ["second@example.com"]
+
+
+def test_refused_recipient_keeps_connection():
+    with mock.patch("smtplib.SMTP", FakeSMTP):
+        pool = make_pool(size=1)
+        FakeSMTP.instances = []
+        pool.sendmail("ok@example.com", "body")
+        FakeSMTP.instances[0].fail_next = smtplib.SMTPRecipientsRefused({"bad@example.com": (550, b"no")})
+        try:
+            pool.sendmail("bad@example.com", "body")
+            assert False, "expected SMTPRecipientsRefused"
+        except smtplib.SMTPRecipientsRefused:
+            pass
+        pool.sendmail("ok2@example.com", "body")
+        assert len(FakeSMTP.instances) == 1
+
+
+def test_idle_connection_health_checked():
+    with mock.patch("smtplib.SMTP", FakeSMTP):
+        pool = make_pool(size=1, idle_check=0)
+        pool.sendmail("a@example.com", "body")
+        pool.sendmail("b@example.com", "body")
+        assert FakeSMTP.instances[0].noops == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_"):
+            func()
+            print(f"✅ {name}")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test the virtualized Treeview: large row sets only create the visible items
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import tkinter as tk
+from features.virtual_table import VirtualTreeview
+from features.common import apply_striped_rows
+
+
+def _table(root, height=20):
+    table = VirtualTreeview(root, columns=("S.No.", "Name", "Status"), height=height)
+    table.pack()
+    return table
+
+
+def test_only_visible_rows_are_created():
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        table = _table(root)
+        iids = table.set_rows([(i, f"Contact {i}", "Pending") for i in range(100000)])
+        apply_striped_rows(table)
+        root.update()
+        assert len(table.get_children()) == 100000
+        assert len(table.tree.get_children()) <= 20
+
+        table.set(iids[75000], column="Status", value="Sent")
+        table.see(iids[75000])
+        root.update()
+        assert iids[75000] in table.tree.get_children()
+        assert table.tree.set(iids[75000], "Status") == "Sent"
+        assert table.item(iids[75000], "tags") == ("evenrow",)
+    finally:
+        root.destroy()
+
+
+def test_treeview_calls_keep_working():
+    root = tk.Tk()
+    root.withdraw()
+    try:
+        table = _table(root)
+        a = table.insert("", tk.END, values=(1, "Alice", "Pending"), tags=("unchecked",))
+        b = table.insert("", tk.END, values=(2, "Bob", "Pending"), tags=("checked",))
+        c = table.insert("", tk.END, values=(3, "Carol", "Pending"), tags=("checked",))
+        assert table.tag_has("checked") == (b, c)
+        table.selection_set(c)
+        assert table.selection() == (c,)
+        table.delete(a, b)
+        root.update()
+        assert table.get_children() == (c,)
+        assert table.index(c) == 0
+        assert table.item(c, "values") == (3, "Carol", "Pending")
+        assert table.tree.get_children() == (c,)
+    finally:
+        root.destroy()
+
+
+if __name__ == "__main__":
+    for test in (test_only_visible_rows_are_created, test_treeview_calls_keep_working):
+        test()
+        print(f"✅ {test.__name__}")